@@ -0,0 +1,142 @@
+"""
+Concurrency of sync app and async app serving the same GET requests.
+Every round sends a burst of requests at once: sync app handles them by a fixed number of worker threads,
+like threads of sync workers, async app by one event loop. Database round trip latency of a networked
+database is simulated by sleeping before every statement, while the connection is held.
+Responses of both apps are checked to be identical.
+
+    python -m benchmarks.bench_async --students 10000 --concurrency 10 100 1000 --db-latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from benchmarks.common import seed
+from school_api.aio import create_async_app
+from school_api.aio.testing import call
+from school_api.app import create_app
+from school_api.db import create_tables
+from school_api.models.models import db
+
+URLS = ['/api/v1/students/{id}', '/api/v1/groups/{group}', '/api/v1/students/{id}/courses']
+
+
+class LatentDriver:
+    def __init__(self, driver, seconds):
+        self.driver = driver
+        self.seconds = seconds
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    async def fetch(self, connection, sql, parameters):
+        await asyncio.sleep(self.seconds)
+        return await self.driver.fetch(connection, sql, parameters)
+
+
+def urls(count, number_of_students):
+    return [URLS[number % len(URLS)].format(id=number % number_of_students + 1, group=number % 1000 + 1)
+            for number in range(count)]
+
+
+def summary(latencies, wall):
+    latencies = sorted(latencies)
+    return (len(latencies) / wall,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000)
+
+
+def run_sync(app, workers, bursts):
+    local = threading.local()
+
+    def get(url, start):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.get(url)
+        return time.perf_counter() - start, response.data
+
+    latencies = []
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        for burst in bursts:
+            start = time.perf_counter()
+            latencies += [latency for latency, _ in executor.map(get, burst, [start] * len(burst))]
+    return summary(latencies, time.perf_counter() - wall_start)
+
+
+def run_async(app, bursts):
+    async def get(url, start):
+        await call(app, url)
+        return time.perf_counter() - start
+
+    async def run():
+        latencies = []
+        wall_start = time.perf_counter()
+        for burst in bursts:
+            start = time.perf_counter()
+            latencies += await asyncio.gather(*(get(url, start) for url in burst))
+        wall = time.perf_counter() - wall_start
+        await app.database.close()
+        return summary(latencies, wall)
+
+    return asyncio.run(run())
+
+
+def check_identical(sync_app, async_app, burst):
+    async def run():
+        try:
+            return [await call(async_app, url) for url in burst]
+        finally:
+            await async_app.database.close()
+
+    client = sync_app.test_client()
+    for url, response in zip(burst, asyncio.run(run())):
+        if client.get(url).data != response.data:
+            raise SystemExit(f'async app response of {url} differs from sync app')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--sync-workers', type=int, default=8, help='worker threads of sync app')
+    parser.add_argument('--pool-size', type=int, default=8, help='database connections of async app')
+    parser.add_argument('--db-latency-ms', type=float, default=5)
+    args = parser.parse_args()
+    latency = args.db_latency_ms / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f'sqlite:///{os.path.join(directory, "bench.db")}'
+        sync_app = create_app('test', SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_QUERY_BUDGET=None,
+                              RESPONSE_CACHE_ENABLED=False, ETAG_ENABLED=False, SERVER_TIMING_ENABLED=False)
+        create_tables(sync_app)
+        with sync_app.app_context():
+            seed(args.students)
+            event.listen(db.engine, 'before_cursor_execute', lambda *_: time.sleep(latency))
+        async_app = create_async_app('test', SQLALCHEMY_DATABASE_URI=uri,
+                                     DB_POOL_SIZE=args.pool_size, DB_MAX_OVERFLOW=0)
+        async_app.database.driver = LatentDriver(async_app.database.driver, latency)
+        check_identical(sync_app, async_app, urls(len(URLS), args.students))
+
+        print(f'db latency {args.db_latency_ms} ms, {args.sync_workers} sync worker threads, '
+              f'{args.pool_size} async connections')
+        print(f'{"concurrency":>11} {"sync req/s":>11} {"p50 ms":>8} {"p99 ms":>8} '
+              f'{"async req/s":>12} {"p50 ms":>8} {"p99 ms":>8}')
+        for concurrency in args.concurrency:
+            bursts = [urls(concurrency, args.students) for _ in range(args.rounds)]
+            sync_result = run_sync(sync_app, args.sync_workers, bursts)
+            async_result = run_async(async_app, bursts)
+            print(f'{concurrency:>11} {sync_result[0]:11.0f} {sync_result[1]:8.1f} {sync_result[2]:8.1f} '
+                  f'{async_result[0]:12.0f} {async_result[1]:8.1f} {async_result[2]:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
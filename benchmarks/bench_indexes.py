@@ -0,0 +1,82 @@
+"""
+Timing of join and filter queries from services.py as enrollments grow,
+with current indexes and with legacy student_course table (no primary key, no indexes).
+
+    python -m benchmarks.bench_indexes --students 10000 100000 1000000
+"""
+import argparse
+import random
+
+from benchmarks.common import bench_app, measure, seed
+from school_api.models.models import (StudentModel as Student,
+                                      CourseModel as Course,
+                                      student_course,
+                                      db)
+from school_api.services.pagination import paginate
+from school_api.services.services import query_students_on_course_by_name
+
+
+def make_legacy():
+    db.session.execute('DROP INDEX ix_student_group_id')
+    db.session.execute('ALTER TABLE student_model RENAME TO student_model_copy')
+    db.session.execute('CREATE TABLE student_model (student_id INTEGER, course_id INTEGER)')
+    db.session.execute('INSERT INTO student_model SELECT student_id, course_id FROM student_model_copy')
+    db.session.execute('DROP TABLE student_model_copy')
+    db.session.commit()
+
+
+def queries(number_of_students, number_of_courses):
+    rng = random.Random(7)
+    student_ids = rng.sample(range(1, number_of_students + 1), 100)
+    course_id = number_of_courses // 2
+
+    return {
+        'students on course by name, page of 50':
+            lambda: paginate(query_students_on_course_by_name(f'course-{course_id}'), Student.id, 50),
+        'enrolled check of 100 ids':
+            lambda: (db.session.query(student_course.c.student_id)
+                     .filter(student_course.c.course_id == course_id,
+                             student_course.c.student_id.in_(student_ids))
+                     .all()),
+        'students in group, page of 50':
+            lambda: paginate(Student.query.filter(Student.group_id == 1), Student.id, 50),
+        'courses of student':
+            lambda: (db.session.query(Course)
+                     .join(Course.students)
+                     .filter(Student.id == student_ids[0])
+                     .all()),
+    }
+
+
+def run(number_of_students, legacy, args):
+    app = bench_app()
+    with app.app_context():
+        seed(number_of_students, args.groups, args.courses, args.courses_per_student)
+        if legacy:
+            make_legacy()
+        return {name: measure(query, args.repeat)
+                for name, query in queries(number_of_students, args.courses).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=100)
+    parser.add_argument('--courses-per-student', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    print(f'{"students":>10} {"enrollments":>12}  {"query":<40} {"indexed ms":>11} {"legacy ms":>10}')
+    for number_of_students in args.students:
+        indexed = run(number_of_students, False, args)
+        legacy = {} if args.skip_legacy else run(number_of_students, True, args)
+        for name, timing in indexed.items():
+            legacy_timing = f'{legacy[name]:10.2f}' if name in legacy else f'{"-":>10}'
+            print(f'{number_of_students:>10} {number_of_students * args.courses_per_student:>12}  '
+                  f'{name:<40} {timing:11.2f} {legacy_timing}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Serialization time of loaded students by marshmallow schema and by compiled serializer.
+Rows are loaded once, only dump is timed, output of both is checked to be identical.
+
+    python -m benchmarks.bench_serializer --students 1000 10000 100000
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.common import bench_app, seed
+from school_api.models.models import StudentModel as Student
+from school_api.schema.school_schema import StudentSchema
+from school_api.schema.serializer import serializer
+from school_api.services.loading import eager_options
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"students":>10} {"marshmallow ms":>15} {"compiled ms":>12} {"speedup":>8}')
+    for number_of_students in args.students:
+        app = bench_app()
+        with app.app_context():
+            seed(number_of_students)
+            students = Student.query.options(*eager_options(StudentSchema)).order_by(Student.id).all()
+
+            marshmallow_dump = lambda: StudentSchema().dump(students, many=True)
+            compiled_dump = lambda: serializer(StudentSchema).dump(students, many=True)
+            if json.dumps(marshmallow_dump()) != json.dumps(compiled_dump()):
+                raise SystemExit('compiled serializer output differs from schema output')
+
+            marshmallow_ms = timed(marshmallow_dump, args.repeat)
+            compiled_ms = timed(compiled_dump, args.repeat)
+            print(f'{number_of_students:>10} {marshmallow_ms:15.1f} {compiled_ms:12.1f} '
+                  f'{marshmallow_ms / compiled_ms:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Time to first byte and peak Python memory of GET /api/v1/students
+as one buffered response and streamed, for growing tables.
+
+    python -m benchmarks.bench_streaming --students 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import bench_app, seed
+
+
+def consume(client, url, headers=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    first_chunk = next(chunks)
+    first_byte = time.perf_counter() - start
+    size = len(first_chunk) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte * 1000, total * 1000, peak / 2 ** 20, size / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, nargs='+', default=[10000, 50000, 100000])
+    args = parser.parse_args()
+
+    print(f'{"students":>10}  {"mode":<10} {"first byte ms":>14} {"total ms":>10} {"peak MiB":>9} {"body MiB":>9}')
+    for number_of_students in args.students:
+        app = bench_app()
+        app.config['PAGINATION_MAX_LIMIT'] = number_of_students
+        with app.app_context():
+            seed(number_of_students)
+            client = app.test_client()
+            modes = {'buffered': (f'/api/v1/students?limit={number_of_students}', None),
+                     'json': ('/api/v1/students?stream=true', None),
+                     'ndjson': ('/api/v1/students', {'Accept': 'application/x-ndjson'})}
+            for mode, (url, headers) in modes.items():
+                first_byte, total, peak, size = consume(client, url, headers)
+                print(f'{number_of_students:>10}  {mode:<10} {first_byte:14.1f} {total:10.1f} {peak:9.1f} {size:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import random
+import statistics
+import time
+
+from school_api.app import create_app
+from school_api.db import create_tables, recount_students
+from school_api.models.models import (StudentModel as Student,
+                                      GroupModel as Group,
+                                      CourseModel as Course,
+                                      student_course,
+                                      db)
+
+CHUNK_SIZE = 50000
+
+
+def seed(number_of_students, number_of_groups=1000, number_of_courses=100, courses_per_student=3):
+    rng = random.Random(42)
+    db.session.execute(Group.__table__.insert(),
+                       [{'id': i, 'name': f'group-{i}'} for i in range(1, number_of_groups + 1)])
+    db.session.execute(Course.__table__.insert(),
+                       [{'id': i, 'name': f'course-{i}'} for i in range(1, number_of_courses + 1)])
+    for start in range(1, number_of_students + 1, CHUNK_SIZE):
+        ids = range(start, min(start + CHUNK_SIZE, number_of_students + 1))
+        db.session.execute(Student.__table__.insert(),
+                           [{'id': i, 'first_name': 'first', 'last_name': 'last',
+                             'group_id': rng.randint(1, number_of_groups)} for i in ids])
+        db.session.execute(student_course.insert(),
+                           [{'student_id': i, 'course_id': course_id} for i in ids
+                            for course_id in rng.sample(range(1, number_of_courses + 1), courses_per_student)])
+    recount_students()
+    db.session.commit()
+
+
+def bench_app():
+    app = create_app('test')
+    app.config['SQLALCHEMY_QUERY_BUDGET'] = None
+    app.extensions['response_cache'].enabled = False
+    create_tables(app)
+    return app
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+        db.session.expire_all()
+    return statistics.median(timings) * 1000
@@ -0,0 +1,407 @@
+"""
+Benchmark suite of every function in services/services.py and every route registered in resources/v1/api.py.
+Each case is run against seeded database of every given size and reports median wall time,
+number of SQL statements and peak Python memory. Results are written as JSON, two result files
+are compared by the compare command, which exits with status 1 when any case regressed.
+
+    python -m benchmarks.suite run --students 1000 10000 --output before.json
+    python -m benchmarks.suite run --students 1000 10000 --output after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 20
+"""
+import argparse
+import inspect
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import event
+
+from benchmarks.common import bench_app, seed
+from school_api.models.models import (StudentModel as Student,
+                                      GroupModel as Group,
+                                      CourseModel as Course,
+                                      JobModel as Job,
+                                      student_course,
+                                      db)
+from school_api.services import services
+
+BATCH_SIZE = 100
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.increment)
+
+    def increment(self, *args):
+        self.count += 1
+
+
+class Fixture:
+    """
+    Fresh rows for cases that change or delete data, created before timing starts,
+    so every repetition of write case works on the same kind of data.
+    """
+    def __init__(self, number_of_students, number_of_groups, number_of_courses):
+        self.rng = random.Random(42)
+        self.number_of_students = number_of_students
+        self.number_of_groups = number_of_groups
+        self.number_of_courses = number_of_courses
+        self.counter = itertools.count()
+
+    def name(self, prefix):
+        return f'{prefix}-bench-{next(self.counter)}'
+
+    def _insert(self, table, **values):
+        row_id = db.session.execute(table.insert().values(**values)).inserted_primary_key[0]
+        db.session.commit()
+        return row_id
+
+    def group(self):
+        return self._insert(Group.__table__, name=self.name('group'))
+
+    def student(self, group_id=None):
+        return self._insert(Student.__table__, first_name='first', last_name='last', group_id=group_id)
+
+    def course(self):
+        return self._insert(Course.__table__, name=self.name('course'))
+
+    def group_with_students(self):
+        group_id = self.group()
+        db.session.execute(Student.__table__.insert(),
+                           [{'first_name': 'first', 'last_name': 'last', 'group_id': group_id}
+                            for _ in range(BATCH_SIZE)])
+        db.session.commit()
+        return group_id, [student_id for student_id, in
+                          db.session.query(Student.id).filter(Student.group_id == group_id)]
+
+    def enrolled_student(self, course_id):
+        student_id = self.student()
+        db.session.execute(student_course.insert().values(student_id=student_id, course_id=course_id))
+        db.session.commit()
+        return student_id
+
+    def job(self):
+        return self._insert(Job.__table__, operation='add_students_to_group', arguments=[1, [1]], status='succeeded',
+                            progress=1, total=1, result={'added': [1]}, created_at=datetime.utcnow())
+
+    def existing_student(self):
+        return self.rng.randint(1, self.number_of_students)
+
+    def existing_students(self):
+        return self.rng.sample(range(1, self.number_of_students + 1), min(BATCH_SIZE, self.number_of_students))
+
+    def existing_group(self):
+        return self.rng.randint(1, self.number_of_groups)
+
+    def existing_course(self):
+        return self.rng.randint(1, self.number_of_courses)
+
+    def existing_courses(self):
+        return self.rng.sample(range(1, self.number_of_courses + 1), min(BATCH_SIZE, self.number_of_courses))
+
+    def group_items(self):
+        return [{'group_name': self.name('group')} for _ in range(BATCH_SIZE)]
+
+    def student_items(self):
+        return [{'first_name': 'first', 'last_name': 'last', 'group_id': self.existing_group()}
+                for _ in range(BATCH_SIZE)]
+
+    def course_items(self):
+        return [{'course_name': self.name('course'), 'description': 'description'} for _ in range(BATCH_SIZE)]
+
+
+def service_cases(f):
+    """
+    Case name -> (setup, call), setup is not timed and returns arguments of call.
+    """
+    def with_student_in_group():
+        student_id = f.student(f.group())
+        return db.session.query(Student).get(student_id), db.session.query(Student).get(student_id).group_id
+
+    def course_with_student():
+        course_id = f.course()
+        return course_id, [f.enrolled_student(course_id)]
+
+    def student_with_course():
+        course_id = f.existing_course()
+        return f.enrolled_student(course_id), [course_id]
+
+    return {
+        'add_group': (lambda: (f.name('group'),), services.add_group),
+        'edit_group': (lambda: (f.group(), f.name('group')), services.edit_group),
+        'del_group': (lambda: (f.group(),), services.del_group),
+        'add_student': (lambda: ('first', 'last'), services.add_student),
+        'edit_student': (lambda: (f.existing_student(), 'first', 'last'), services.edit_student),
+        'del_student': (lambda: (f.student(),), services.del_student),
+        'add_course': (lambda: (f.name('course'), 'description'), services.add_course),
+        'edit_course': (lambda: (f.course(), f.name('course'), 'description'), services.edit_course),
+        'del_course': (lambda: (f.course(),), services.del_course),
+        'add_student_to_group': (lambda: (f.student(), f.existing_group()), services.add_student_to_group),
+        'remove_student_from_group': (with_student_in_group, services.remove_student_from_group),
+        'query_group_with_less_students': (lambda: (10,), lambda n: services.query_group_with_less_students(n).all()),
+        'select_group_with_less_students': (lambda: (10,), services.select_group_with_less_students),
+        'query_students_on_course_by_name': (lambda: (f'course-{f.existing_course()}',),
+                                             lambda name: services.query_students_on_course_by_name(name).all()),
+        'select_students_on_course_by_name': (lambda: (f'course-{f.existing_course()}',),
+                                              services.select_students_on_course_by_name),
+        'collect_stats': (lambda: (), services.collect_stats),
+        'validate_ids': (lambda: (f.existing_students(), 'students'), services.validate_ids),
+        'add_students_to_course': (lambda: (f.course(), f.existing_students()), services.add_students_to_course),
+        'add_courses_to_student': (lambda: (f.student(), f.existing_courses()), services.add_courses_to_student),
+        'check_students_on_course': (course_with_student, services.check_students_on_course),
+        'check_courses_of_student': (student_with_course, services.check_courses_of_student),
+        'remove_students_from_course': (course_with_student, services.remove_students_from_course),
+        'remove_courses_from_student': (student_with_course, services.remove_courses_from_student),
+        'add_students_to_group': (lambda: (f.group(), f.existing_students()), services.add_students_to_group),
+        'remove_students_from_group': (f.group_with_students, services.remove_students_from_group),
+        'transfer_group_students': (lambda: (f.group_with_students()[0], f.group()), services.transfer_group_students),
+        'add_groups': (lambda: (f.group_items(),), services.add_groups),
+        'add_students': (lambda: (f.student_items(),), services.add_students),
+        'add_courses': (lambda: (f.course_items(),), services.add_courses),
+    }
+
+
+def route_cases(f):
+    """
+    (method, route) -> setup, setup is not timed and returns url and json body of request.
+    """
+    def remove_from_group():
+        group_id, student_ids = f.group_with_students()
+        return f'/api/v1/groups/{group_id}/students', {'students': student_ids}
+
+    def remove_from_student():
+        course_id = f.existing_course()
+        return f'/api/v1/students/{f.enrolled_student(course_id)}/courses', {'courses': [course_id]}
+
+    def remove_from_course():
+        course_id = f.course()
+        return f'/api/v1/courses/{course_id}/students', {'students': [f.enrolled_student(course_id)]}
+
+    def group_screen():
+        # group details, its roster and courses of its students, as one screen of an admin UI loads them
+        group_id = f.existing_group()
+        paths = [f'/api/v1/groups/{group_id}', f'/api/v1/groups/{group_id}/students',
+                 *(f'/api/v1/students/{student_id}/courses' for student_id in f.existing_students()[:30])]
+        return '/api/v1/batch', {'requests': [{'method': 'GET', 'path': path} for path in paths]}
+
+    return {
+        ('GET', '/api/v1/groups'): lambda: ('/api/v1/groups', None),
+        ('GET', '/api/v1/groups?max_students'): lambda: ('/api/v1/groups?max_students=10', None),
+        ('GET', '/api/v1/groups?q'): lambda: ('/api/v1/groups?q=a', None),
+        ('POST', '/api/v1/groups'): lambda: ('/api/v1/groups', f.group_items()),
+        ('GET', '/api/v1/groups/<group_id>'): lambda: (f'/api/v1/groups/{f.existing_group()}', None),
+        ('PUT', '/api/v1/groups/<group_id>'): lambda: (f'/api/v1/groups/{f.group()}',
+                                                       {'group_name': f.name('group')}),
+        ('DELETE', '/api/v1/groups/<group_id>'): lambda: (f'/api/v1/groups/{f.group()}', None),
+        ('GET', '/api/v1/groups/<group_id>/students'): lambda: (f'/api/v1/groups/{f.existing_group()}/students',
+                                                                None),
+        ('POST', '/api/v1/groups/<group_id>/students'): lambda: (f'/api/v1/groups/{f.group()}/students',
+                                                                 {'students': f.existing_students()}),
+        ('DELETE', '/api/v1/groups/<group_id>/students'): remove_from_group,
+        ('POST', '/api/v1/groups/<group_id>/students/transfer'): lambda: (
+            f'/api/v1/groups/{f.group_with_students()[0]}/students/transfer', {'to_group_id': f.group()}),
+        ('GET', '/api/v1/students'): lambda: ('/api/v1/students', None),
+        ('GET', '/api/v1/students?course_name'): lambda: (
+            f'/api/v1/students?course_name=course-{f.existing_course()}', None),
+        ('GET', '/api/v1/students?group_id&course_id'): lambda: (
+            f'/api/v1/students?group_id={f.existing_group()}&course_id={f.existing_course()}'
+            f'&course_id={f.existing_course()}', None),
+        ('GET', '/api/v1/students?course_id&course_match=all'): lambda: (
+            f'/api/v1/students?course_id={f.existing_course()}&course_id={f.existing_course()}&course_match=all', None),
+        ('GET', '/api/v1/students?unassigned'): lambda: ('/api/v1/students?unassigned=true', None),
+        ('GET', '/api/v1/students?q'): lambda: ('/api/v1/students?q=ann', None),
+        ('GET', '/api/v1/students?q=words'): lambda: ('/api/v1/students?q=ann%20son', None),
+        ('POST', '/api/v1/students'): lambda: ('/api/v1/students', f.student_items()),
+        ('GET', '/api/v1/students/export'): lambda: ('/api/v1/students/export', None),
+        ('GET', '/api/v1/students/export?since'): lambda: (
+            f'/api/v1/students/export?since={datetime.utcnow().isoformat()}', None),
+        ('GET', '/api/v1/students/<student_id>'): lambda: (f'/api/v1/students/{f.existing_student()}', None),
+        ('PUT', '/api/v1/students/<student_id>'): lambda: (
+            f'/api/v1/students/{f.student()}', {'first_name': 'first', 'group_id': f.existing_group()}),
+        ('DELETE', '/api/v1/students/<student_id>'): lambda: (f'/api/v1/students/{f.student()}', None),
+        ('GET', '/api/v1/students/<student_id>/courses'): lambda: (
+            f'/api/v1/students/{f.existing_student()}/courses', None),
+        ('POST', '/api/v1/students/<student_id>/courses'): lambda: (
+            f'/api/v1/students/{f.student()}/courses', {'courses': f.existing_courses()}),
+        ('DELETE', '/api/v1/students/<student_id>/courses'): remove_from_student,
+        ('GET', '/api/v1/courses'): lambda: ('/api/v1/courses', None),
+        ('GET', '/api/v1/courses?q'): lambda: ('/api/v1/courses?q=math', None),
+        ('POST', '/api/v1/courses'): lambda: ('/api/v1/courses', f.course_items()),
+        ('GET', '/api/v1/courses/<course_id>'): lambda: (f'/api/v1/courses/{f.existing_course()}', None),
+        ('PUT', '/api/v1/courses/<course_id>'): lambda: (f'/api/v1/courses/{f.course()}',
+                                                         {'course_name': f.name('course')}),
+        ('DELETE', '/api/v1/courses/<course_id>'): lambda: (f'/api/v1/courses/{f.course()}', None),
+        ('GET', '/api/v1/courses/<course_id>/students'): lambda: (
+            f'/api/v1/courses/{f.existing_course()}/students', None),
+        ('POST', '/api/v1/courses/<course_id>/students'): lambda: (
+            f'/api/v1/courses/{f.course()}/students', {'students': f.existing_students()}),
+        ('DELETE', '/api/v1/courses/<course_id>/students'): remove_from_course,
+        ('GET', '/api/v1/stats'): lambda: ('/api/v1/stats', None),
+        ('GET', '/api/v1/jobs/<job_id>'): lambda: (f'/api/v1/jobs/{f.job()}', None),
+        ('GET', '/api/v1/internal/cache'): lambda: ('/api/v1/internal/cache', None),
+        ('GET', '/api/v1/internal/pool'): lambda: ('/api/v1/internal/pool', None),
+        ('POST', '/api/v1/batch'): group_screen,
+    }
+
+
+def check_coverage(app, services_cases, routes_cases):
+    functions = {name for name, function in inspect.getmembers(services, inspect.isfunction)
+                 if function.__module__ == services.__name__ and not name.startswith('_')}
+    routes = {(method, rule.rule) for rule in app.url_map.iter_rules() if rule.endpoint.startswith('api_v1.')
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    covered_routes = {(method, route.split('?')[0]) for method, route in routes_cases}
+    missing = sorted(functions - set(services_cases)) + [' '.join(route) for route in sorted(routes - covered_routes)]
+    if missing:
+        raise SystemExit(f'no benchmark case for: {", ".join(missing)}')
+
+
+def profile(setup, call, repeat, counter):
+    timings = []
+    statements = 0
+    for _ in range(repeat):
+        args = setup()
+        counter.count = 0
+        start = time.perf_counter()
+        call(*args)
+        timings.append(time.perf_counter() - start)
+        statements = max(statements, counter.count)
+        db.session.expire_all()
+
+    # separate run, tracing allocations slows down the timed ones
+    args = setup()
+    tracemalloc.start()
+    call(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.expire_all()
+
+    return {'wall_ms': round(statistics.median(timings) * 1000, 3),
+            'statements': statements,
+            'peak_kib': round(peak / 1024, 1)}
+
+
+def request(client, method):
+    def call(url, body):
+        response = client.open(url, method=method, json=body)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {url} returned {response.status_code}: {response.get_data(as_text=True)}')
+        response.close()
+    return call
+
+
+def run_size(number_of_students, args):
+    app = bench_app()
+    results = {}
+    with app.app_context():
+        seed(number_of_students, args.groups, args.courses, args.courses_per_student)
+        fixture = Fixture(number_of_students, args.groups, args.courses)
+        counter = StatementCounter(db.engine)
+        services_cases = service_cases(fixture)
+        routes_cases = route_cases(fixture)
+        check_coverage(app, services_cases, routes_cases)
+
+        for name, (setup, call) in services_cases.items():
+            if args.filter and args.filter not in f'service {name}':
+                continue
+            results[f'service {name}'] = profile(setup, call, args.repeat, counter)
+            print(f'{number_of_students:>10}  {"service " + name:<55} {results[f"service {name}"]}', file=sys.stderr)
+
+        client = app.test_client()
+        for (method, route), setup in routes_cases.items():
+            name = f'{method} {route}'
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = profile(setup, request(client, method), args.repeat, counter)
+            print(f'{number_of_students:>10}  {name:<55} {results[name]}', file=sys.stderr)
+
+        event.remove(db.engine, 'before_cursor_execute', counter.increment)
+    return results
+
+
+def run(args):
+    report = {'meta': {'created': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'groups': args.groups,
+                       'courses': args.courses,
+                       'courses_per_student': args.courses_per_student,
+                       'repeat': args.repeat},
+              'results': {str(number_of_students): run_size(number_of_students, args)
+                          for number_of_students in args.students}}
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+
+def regressions(before, after, threshold, min_ms, min_kib):
+    found = []
+    if after['wall_ms'] > before['wall_ms'] * (1 + threshold / 100) and after['wall_ms'] - before['wall_ms'] >= min_ms:
+        found.append('wall_ms')
+    if after['statements'] > before['statements']:
+        found.append('statements')
+    if (after['peak_kib'] > before['peak_kib'] * (1 + threshold / 100)
+            and after['peak_kib'] - before['peak_kib'] >= min_kib):
+        found.append('peak_kib')
+    return found
+
+
+def compare(args):
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file)['results'], json.load(after_file)['results']
+
+    regressed = 0
+    print(f'{"students":>10}  {"case":<55} {"ms before":>10} {"ms after":>10} {"change":>8} '
+          f'{"sql":>10} {"KiB before":>11} {"KiB after":>10}  regressions')
+    for size in sorted(before.keys() & after.keys(), key=int):
+        for name in sorted(before[size].keys() & after[size].keys()):
+            old, new = before[size][name], after[size][name]
+            found = regressions(old, new, args.threshold, args.min_ms, args.min_kib)
+            regressed += bool(found)
+            change = (new['wall_ms'] / old['wall_ms'] - 1) * 100 if old['wall_ms'] else 0
+            print(f'{size:>10}  {name:<55} {old["wall_ms"]:10.2f} {new["wall_ms"]:10.2f} {change:+7.1f}% '
+                  f'{old["statements"]:>4}->{new["statements"]:<4} {old["peak_kib"]:11.1f} {new["peak_kib"]:10.1f}  '
+                  f'{", ".join(found)}')
+        for name in sorted(before[size].keys() ^ after[size].keys()):
+            print(f'{size:>10}  {name:<55} only in {"before" if name in before[size] else "after"}')
+
+    print(f'{regressed} regressed cases, threshold {args.threshold}%')
+    return 1 if regressed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and write results as JSON')
+    run_parser.add_argument('--students', type=int, nargs='+', default=[1000, 10000])
+    run_parser.add_argument('--groups', type=int, default=100)
+    run_parser.add_argument('--courses', type=int, default=100)
+    run_parser.add_argument('--courses-per-student', type=int, default=3)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--filter', help='run only cases which name contains this text')
+    run_parser.add_argument('--output', default='benchmark.json')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files, exit with 1 on regressions')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=20, help='allowed slowdown in percent')
+    compare_parser.add_argument('--min-ms', type=float, default=1,
+                                help='smaller slowdown in milliseconds is treated as noise')
+    compare_parser.add_argument('--min-kib', type=float, default=64,
+                                help='smaller memory growth in KiB is treated as noise')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
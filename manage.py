@@ -1,8 +1,11 @@
-from flask_script import Manager, prompt_bool
+from flask_script import Manager, Command, Option, prompt_bool
 # from flask_migrate import Migrate, MigrateCommand
 from school_api.app import create_app
-from school_api.db import create_tables, drop_tables
-from school_api.data_generator import test_db
+from school_api.db import create_tables, drop_tables, upgrade_tables, check_student_counts, rebuild_student_counts
+from school_api.data_generator import test_db, COURSE_POPULARITY
+import sys
+from school_api.importer import import_file, ImportFailed, IMPORT_KINDS, IMPORT_FORMATS
+from school_api.exporter import write_export, parse_since, EXPORT_FORMATS
 """
 Refused flask_migration because it was overkill for this project
 """
@@ -20,11 +23,99 @@ def createtables():
     create_tables(app)
 
 
-@manager.command
-def testdb():
+@manager.option('--groups', type=int, default=10, help='number of groups')
+@manager.option('--students', type=int, default=200, help='number of students')
+@manager.option('--courses', type=int, default=10, help='number of courses')
+@manager.option('--group-size', type=int, nargs=2, default=(10, 30), metavar=('MIN', 'MAX'),
+                help='range of students in group, students over all groups stay without group')
+@manager.option('--courses-per-student', type=int, nargs=2, default=(1, 3), metavar=('MIN', 'MAX'),
+                help='range of courses of every student')
+@manager.option('--course-popularity', choices=COURSE_POPULARITY, default='uniform',
+                help='uniform or zipf, where course number n is chosen 1/n as often as the first one')
+@manager.option('--seed', type=int, default=42, help='same seed generates same data')
+@manager.option('--chunk-size', type=int, default=10000, help='students generated and inserted at once')
+@manager.option('--processes', type=int, default=1, help='processes generating chunks')
+def testdb(groups, students, courses, group_size, courses_per_student, course_popularity, seed, chunk_size,
+           processes):
     drop_tables(app)
     create_tables(app)
-    test_db(app)
+    test_db(app, groups, students, courses, tuple(group_size), tuple(courses_per_student), course_popularity, seed,
+            chunk_size, processes, progress=lambda inserted, total: print(f'{inserted}/{total} students'))
+
+
+@manager.command
+def upgradetables():
+    upgrade_tables(app)
+
+
+@manager.command
+def checkcounts():
+    """
+    Lists groups which student_count is not number of their students
+    """
+    wrong = check_student_counts(app)
+    for group_id, stored, actual in wrong:
+        print(f'group {group_id}: student_count {stored}, students {actual}')
+    print(f'{len(wrong)} groups with wrong student_count')
+    return 1 if wrong else 0
+
+
+@manager.command
+def rebuildcounts():
+    """
+    Recounts students of every group
+    """
+    print(f'{rebuild_student_counts(app)} groups fixed')
+
+
+class Import(Command):
+    """
+    Imports groups, courses, students or enrollments from CSV or NDJSON file.
+    Fields: groups - name; courses - name, description; students - first_name, last_name, optional group name
+    and id; enrollments - student_id, course name. Failed or stopped import of the file continues where it ended.
+    """
+    option_list = (
+        Option('kind', choices=IMPORT_KINDS),
+        Option('path', help='CSV file with header row or NDJSON file'),
+        Option('--format', dest='file_format', choices=IMPORT_FORMATS,
+               help='format of file, by default csv for .csv files and ndjson for others'),
+        Option('--chunk-size', type=int, default=10000, help='records inserted in one transaction'),
+        Option('--restart', action='store_true', help='import the whole file again instead of resuming'),
+    )
+
+    def run(self, kind, path, file_format, chunk_size, restart):
+        def report(records, imported, bytes_read, size, seconds):
+            print(f'{records} records, {bytes_read * 100 / max(size, 1):.1f}% of file, '
+                  f'{imported / seconds:.0f} records/s')
+
+        try:
+            result = import_file(app, kind, path, file_format, chunk_size, restart, progress=report)
+        except ImportFailed as error:
+            print(f'import failed, {error}')
+            return 1
+        print(f'{result["imported"]} of {result["records"]} {kind} imported')
+        return 0
+
+
+manager.add_command('import', Import())
+
+
+@manager.option('--format', dest='file_format', choices=EXPORT_FORMATS, default='ndjson', help='format of export')
+@manager.option('--since', type=parse_since,
+                help='only students created or changed at or after this UTC time, e.g. 2020-11-30T22:00:00')
+@manager.option('--output', help='file to write, standard output by default')
+@manager.option('--chunk-size', type=int, default=10000, help='students fetched and written at once')
+def export(file_format, since, output, chunk_size):
+    """
+    Exports students with group name and course ids
+    """
+    file = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        with app.app_context():
+            write_export(file, file_format, since, chunk_size)
+    finally:
+        if output:
+            file.close()
 
 
 @manager.command
@@ -0,0 +1,2 @@
+from .app import create_async_app, AsyncApp
+from .database import AsyncDatabase, PoolTimeout
@@ -0,0 +1,354 @@
+import json
+import logging
+from urllib.parse import urlencode
+from flask import Config
+from flask_restful import inputs
+from sqlalchemy import and_
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import HTTPException, InternalServerError, MethodNotAllowed, NotFound
+from werkzeug.http import parse_accept_header
+from werkzeug.routing import Map, Rule
+from werkzeug.urls import url_decode
+from ..config import config_by_name, basedir
+from ..models import GroupModel, StudentModel, CourseModel, student_course
+from ..schema.school_schema import GroupSchema, StudentSchema, CourseSchema
+from ..schema.serializer import serializer
+from ..services.pagination import encode_cursor, after_criterion, cursor_position, ordering
+from ..services.search import search_words, search_criteria, indexed_search
+from ..services.filters import student_criteria
+from ..services.stats import stats_statements, stats_document
+from ..streaming import JSON, NDJSON
+from .database import AsyncDatabase, PoolTimeout
+from .loading import plan, load_records
+
+log = logging.getLogger(__name__)
+
+PREFIX = '/api/v1'
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = url_decode(scope.get('query_string', b''))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        host = self.headers.get('host') or '%s:%s' % scope['server']
+        self.base_url = f'{scope.get("scheme", "http")}://{host}{scope.get("root_path", "")}{self.path}'
+
+    def parse_args(self, *arguments):
+        # the same messages as reqparse of sync app
+        values = []
+        for name, type_ in arguments:
+            value = self.args.get(name)
+            if value is not None:
+                try:
+                    value = type_(value)
+                except (TypeError, ValueError) as error:
+                    raise ApiError(400, {name: str(error)})
+            values.append(value)
+        return values
+
+    def parse_list(self, name, type_):
+        # repeated argument, as action='append' of reqparse
+        try:
+            return [type_(value) for value in self.args.getlist(name)]
+        except (TypeError, ValueError) as error:
+            raise ApiError(400, {name: str(error)})
+
+    def media_type(self):
+        return parse_accept_header(self.headers.get('accept'), MIMEAccept).best_match([JSON, NDJSON], default=JSON)
+
+    def streaming_requested(self):
+        return self.args.get('stream', '').lower() == 'true' or self.media_type() == NDJSON
+
+
+class AsyncApp:
+    """
+    ASGI application serving GET routes of api v1 with the same JSON as sync app,
+    database is read through async driver, so a request waiting for database does not hold a worker.
+    Responses are not cached and carry no ETag, writes stay with sync app.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.database = AsyncDatabase(config['SQLALCHEMY_DATABASE_URI'],
+                                      pool_size=config['DB_POOL_SIZE'] + config['DB_MAX_OVERFLOW'],
+                                      timeout=config['DB_POOL_TIMEOUT'],
+                                      root_path=basedir)
+        self.url_map = Map([Rule(PREFIX + rule, endpoint=endpoint, methods=['GET']) for rule, endpoint in (
+            ('/groups', self.groups),
+            ('/groups/<int:group_id>', self.group),
+            ('/groups/<int:group_id>/students', self.students_by_group),
+            ('/students', self.students),
+            ('/students/<int:student_id>', self.student),
+            ('/students/<int:student_id>/courses', self.courses_by_student),
+            ('/courses', self.courses),
+            ('/courses/<int:course_id>', self.course),
+            ('/courses/<int:course_id>/students', self.students_by_course),
+            ('/stats', self.stats),
+        )])
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        request = Request(scope)
+        try:
+            endpoint, arguments = self.url_map.bind('').match(request.path, request.method)
+            response = await endpoint(request, **arguments)
+        except ApiError as error:
+            response = {'message': error.message}, error.status, {}
+        except MethodNotAllowed as error:
+            response = {'message': error.description}, error.code, {'Allow': ', '.join(sorted(error.valid_methods))}
+        except HTTPException as error:
+            response = {'message': error.description}, error.code, {}
+        except PoolTimeout as error:
+            response = {'message': str(error)}, 503, {}
+        except Exception:
+            log.exception('%s %s failed', request.method, request.path)
+            response = {'message': InternalServerError.description}, 500, {}
+
+        if callable(response):
+            return await response(send)
+        data, status, headers = response
+        await self.send_json(send, request, data, status, headers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def dumps(self, data):
+        # formatted like output_json of flask-restful
+        return json.dumps(data, indent=4 if self.config['DEBUG'] else None) + '\n'
+
+    async def send_json(self, send, request, data, status, headers):
+        body = self.dumps(data).encode()
+        headers = {'Content-Type': JSON, 'Content-Length': str(len(body)), **headers}
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]})
+        await send({'type': 'http.response.body', 'body': b'' if request.method == 'HEAD' else body})
+
+    def requested_fields(self, request, schema_cls):
+        fields = request.args.get('fields')
+        if not fields:
+            return None
+
+        fields = tuple(sorted({name.strip() for name in fields.split(',') if name.strip()}))
+        unknown = set(fields) - set(schema_cls._declared_fields)
+        if unknown:
+            raise ApiError(400, f'unknown fields: {", ".join(sorted(unknown))}')
+
+        return fields
+
+    def page_limit(self, limit):
+        if limit is None:
+            return self.config['PAGINATION_DEFAULT_LIMIT']
+        if limit < 1:
+            raise ApiError(400, 'limit must be positive integer')
+        return min(limit, self.config['PAGINATION_MAX_LIMIT'])
+
+    def statement(self, load_plan, criteria, join, rank):
+        statement = load_plan.statement().where(and_(*criteria)) if criteria else load_plan.statement()
+        if join is not None:
+            statement = statement.select_from(join)
+        if rank is not None:
+            statement = statement.column(rank)
+        return statement.order_by(*ordering(rank, load_plan.primary_key))
+
+    async def select(self, schema_cls, fields, *criteria, join=None, limit=None, rank=None):
+        load_plan = plan(schema_cls, fields)
+        statement = self.statement(load_plan, criteria, join, rank)
+        if limit is not None:
+            statement = statement.limit(limit)
+        async with self.database.connection() as connection:
+            rows = await connection.fetch(statement)
+            records = await load_records(connection, load_plan, rows)
+        if rank is not None:
+            # rank of the record is in the cursor of the next page
+            for record, row in zip(records, rows):
+                record.rank = row[len(load_plan.selected)]
+        return records
+
+    async def one(self, schema_cls, fields, object_id):
+        records = await self.select(schema_cls, fields, plan(schema_cls, fields).primary_key == object_id)
+        if not records:
+            raise NotFound()
+        return serializer(schema_cls, fields).dump(records[0]), 200, {}
+
+    async def all(self, schema_cls, fields, *criteria, join=None):
+        records = await self.select(schema_cls, fields, *criteria, join=join)
+        return serializer(schema_cls, fields).dump(records, many=True), 200, {}
+
+    async def search_positions(self, search, limit, after):
+        # the same statements as search_positions of sync app
+        after_rank, after_id = cursor_position(after, ranked=True) if after is not None else (None, None)
+        positions = []
+        async with self.database.connection() as connection:
+            names = [await connection.fetch(*statement) for statement in search.names_statements()]
+            for rank in search.ranks(after_rank):
+                statement = search.rank_statement(rank, names, limit + 1 - len(positions),
+                                                  after_id if rank == after_rank else None)
+                if statement is not None:
+                    positions += [(rank, row[0]) for row in await connection.fetch(*statement)]
+                if len(positions) > limit:
+                    break
+        return positions
+
+    async def collection(self, request, schema_cls, fields, limit, after, *criteria, join=None, rank=None,
+                         search=None):
+        if request.streaming_requested():
+            return self.stream(request, schema_cls, fields, *criteria, join=join, rank=rank)
+
+        limit = self.page_limit(limit)
+        primary_key = plan(schema_cls, fields).primary_key
+        if search is not None:
+            positions = await self.search_positions(search, limit, after)
+            page = {record.id: record for record in await self.select(
+                schema_cls, fields, primary_key.in_([item_id for _, item_id in positions[:limit]]))}
+            # rows deleted since their ids were read are skipped
+            records = [page[item_id] for _, item_id in positions[:limit] if item_id in page]
+            last = positions[limit - 1] if len(positions) > limit else None
+        else:
+            if after is not None:
+                criteria = (*criteria, after_criterion(after, primary_key, rank))
+            records = await self.select(schema_cls, fields, *criteria, join=join, limit=limit + 1, rank=rank)
+            last = None
+            if len(records) > limit:
+                records = records[:limit]
+                last = (records[-1].rank if rank is not None else None), records[-1].id
+
+        headers = {}
+        if last is not None:
+            last_rank, last_id = last
+            position = {'id': last_id} if last_rank is None else {'id': last_id, 'rank': last_rank}
+            args = request.args.to_dict(flat=False)
+            args['after'] = encode_cursor(position)
+            headers['Link'] = f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+
+        return serializer(schema_cls, fields).dump(records, many=True), 200, headers
+
+    def stream(self, request, schema_cls, fields, *criteria, join=None, rank=None):
+        """
+        Response sending collection in chunks of STREAM_CHUNK_SIZE rows, as JSON array or NDJSON.
+        """
+        chunk_size = self.config['STREAM_CHUNK_SIZE']
+        media_type = request.media_type()
+        load_plan = plan(schema_cls, fields)
+        statement = self.statement(load_plan, criteria, join, rank)
+        schema = serializer(schema_cls, fields)
+
+        async def send_chunks(send):
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', media_type.encode())]})
+            separator, end = ('', '\n') if media_type == NDJSON else ('[', '')
+            async with self.database.connection() as connection:
+                async for rows in connection.iterate(statement, chunk_size):
+                    buffer = []
+                    for record in await load_records(connection, load_plan, rows):
+                        buffer.append(separator + json.dumps(schema.dump(record)) + end)
+                        if media_type == JSON:
+                            separator = ','
+                    await send({'type': 'http.response.body', 'body': ''.join(buffer).encode(), 'more_body': True})
+            closing = (separator if separator == '[' else '') + ']' if media_type == JSON else ''
+            await send({'type': 'http.response.body', 'body': closing.encode()})
+
+        return send_chunks
+
+    def search(self, request, model, q, criteria):
+        """
+        Criteria with search of q and rank to order by, or IndexedSearch of q when a page of one word
+        without other criteria is requested, as search_page of sync app.
+        """
+        dialect_name = self.database.driver.dialect.name
+        indexed = not criteria and not request.streaming_requested()
+        search = indexed_search(model, q, dialect_name) if indexed else None
+        if search is not None:
+            return criteria, None, search
+        words = search_words(q or '')
+        if not words:
+            return criteria, None, None
+        criterion, rank = search_criteria(model, words, dialect_name)
+        return [*criteria, criterion], rank, None
+
+    async def groups(self, request):
+        limit, after, max_students, q = request.parse_args(('limit', int), ('after', str), ('max_students', int),
+                                                           ('q', str))
+        fields = self.requested_fields(request, GroupSchema)
+        criteria = [GroupModel.student_count <= max_students] if max_students is not None else []
+        criteria, rank, search = self.search(request, GroupModel, q, criteria)
+        return await self.collection(request, GroupSchema, fields, limit, after, *criteria, rank=rank, search=search)
+
+    async def group(self, request, group_id):
+        return await self.one(GroupSchema, self.requested_fields(request, GroupSchema), group_id)
+
+    async def students_by_group(self, request, group_id):
+        fields = self.requested_fields(request, StudentSchema)
+        criteria = [StudentModel.group_id == group_id]
+        if request.streaming_requested():
+            return self.stream(request, StudentSchema, fields, *criteria)
+        return await self.all(StudentSchema, fields, *criteria)
+
+    async def students(self, request):
+        limit, after, group_id, unassigned, course_match, q = request.parse_args(
+            ('limit', int), ('after', str), ('group_id', int), ('unassigned', inputs.boolean), ('course_match', str),
+            ('q', str))
+        fields = self.requested_fields(request, StudentSchema)
+        criteria = student_criteria(group_id, unassigned, request.parse_list('course_id', int),
+                                    request.parse_list('course_name', str), course_match or 'any')
+        criteria, rank, search = self.search(request, StudentModel, q, criteria)
+        return await self.collection(request, StudentSchema, fields, limit, after, *criteria, rank=rank, search=search)
+
+    async def student(self, request, student_id):
+        return await self.one(StudentSchema, self.requested_fields(request, StudentSchema), student_id)
+
+    async def courses_by_student(self, request, student_id):
+        fields = self.requested_fields(request, CourseSchema)
+        criteria = [student_course.c.student_id == student_id]
+        join = CourseModel.__table__.join(student_course, student_course.c.course_id == CourseModel.id)
+        if request.streaming_requested():
+            return self.stream(request, CourseSchema, fields, *criteria, join=join)
+        return await self.all(CourseSchema, fields, *criteria, join=join)
+
+    async def courses(self, request):
+        limit, after, q = request.parse_args(('limit', int), ('after', str), ('q', str))
+        fields = self.requested_fields(request, CourseSchema)
+        criteria, rank, search = self.search(request, CourseModel, q, [])
+        return await self.collection(request, CourseSchema, fields, limit, after, *criteria, rank=rank, search=search)
+
+    async def course(self, request, course_id):
+        return await self.one(CourseSchema, self.requested_fields(request, CourseSchema), course_id)
+
+    async def students_by_course(self, request, course_id):
+        fields = self.requested_fields(request, StudentSchema)
+        criteria = [student_course.c.course_id == course_id]
+        join = StudentModel.__table__.join(student_course, student_course.c.student_id == StudentModel.id)
+        if request.streaming_requested():
+            return self.stream(request, StudentSchema, fields, *criteria, join=join)
+        return await self.all(StudentSchema, fields, *criteria, join=join)
+
+    async def stats(self, request):
+        async with self.database.connection() as connection:
+            rows = [await connection.fetch(statement) for statement in stats_statements()]
+        return stats_document(*rows), 200, {}
+
+
+def create_async_app(config_name='dev', **config):
+    """
+    Async read-only counterpart of create_app, serve it by any ASGI server, e.g.
+    uvicorn --factory school_api.aio:create_async_app
+    """
+    app_config = Config(basedir)
+    app_config.from_object(config_by_name[config_name])
+    app_config.update(config)
+    return AsyncApp(app_config)
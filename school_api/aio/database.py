@@ -0,0 +1,166 @@
+import asyncio
+import os
+import re
+from contextlib import asynccontextmanager
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.util import LRUCache
+from ..models.models import unicode_lower
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class SQLiteDriver:
+    dialect = sqlite.dialect()
+
+    def __init__(self, url, root_path):
+        if url.database in (None, '', ':memory:'):
+            raise ValueError('in-memory SQLite database is private to its connection, async app needs a file')
+        self.database = url.database
+        if not os.path.isabs(self.database):
+            # relative to application like the sqlite database of flask-sqlalchemy
+            self.database = os.path.join(root_path, self.database)
+
+    def placeholders(self, sql):
+        return sql
+
+    async def connect(self):
+        import aiosqlite
+        connection = await aiosqlite.connect(self.database)
+        # the same lower() as connections of the sync app, expression indexes of search are built with it
+        await connection.create_function('lower', 1, unicode_lower, deterministic=True)
+        return connection
+
+    async def close(self, connection):
+        await connection.close()
+
+    async def fetch(self, connection, sql, parameters):
+        async with connection.execute(sql, parameters) as cursor:
+            return await cursor.fetchall()
+
+    async def iterate(self, connection, sql, parameters, size):
+        async with connection.execute(sql, parameters) as cursor:
+            rows = await cursor.fetchmany(size)
+            while rows:
+                yield rows
+                rows = await cursor.fetchmany(size)
+
+
+class PostgresDriver:
+    dialect = postgresql.dialect(paramstyle='numeric')
+
+    def __init__(self, url, root_path):
+        # asyncpg takes plain postgresql:// DSN, without sqlalchemy driver name
+        self.dsn = 'postgresql' + str(url)[len(url.drivername):]
+
+    def placeholders(self, sql):
+        # numeric paramstyle of the dialect is :1, asyncpg expects $1
+        return re.sub(r':(\d+)', r'$\1', sql)
+
+    async def connect(self):
+        import asyncpg
+        return await asyncpg.connect(self.dsn)
+
+    async def close(self, connection):
+        await connection.close()
+
+    async def fetch(self, connection, sql, parameters):
+        return await connection.fetch(sql, *parameters)
+
+    async def iterate(self, connection, sql, parameters, size):
+        async with connection.transaction():
+            cursor = await connection.cursor(sql, *parameters)
+            rows = await cursor.fetch(size)
+            while rows:
+                yield rows
+                rows = await cursor.fetch(size)
+
+
+DRIVERS = {'sqlite': SQLiteDriver, 'postgresql': PostgresDriver}
+
+
+class Connection:
+    def __init__(self, database, connection):
+        self.database = database
+        self.connection = connection
+
+    async def fetch(self, statement, parameters=None):
+        sql, parameters = self.database.compile(statement, parameters)
+        return await self.database.driver.fetch(self.connection, sql, parameters)
+
+    async def iterate(self, statement, size):
+        """
+        Rows of statement in lists of at most size rows, read through a cursor.
+        Other statements may run on the connection between the lists.
+        """
+        sql, parameters = self.database.compile(statement)
+        async for rows in self.database.driver.iterate(self.connection, sql, parameters, size):
+            yield rows
+
+
+class AsyncDatabase:
+    """
+    Pool of async driver connections (aiosqlite, asyncpg) executing SQLAlchemy Core selects.
+    Statements are compiled by dialect of the backend, so they are the SQL sync app runs.
+    Connections are opened on demand up to pool_size, callers wait for a free one at most timeout seconds.
+    """
+    def __init__(self, uri, pool_size=5, timeout=30, root_path=''):
+        url = make_url(uri)
+        backend = url.get_backend_name()
+        if backend not in DRIVERS:
+            raise ValueError(f'no async driver for {backend} database')
+        self.driver = DRIVERS[backend](url, root_path)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = None
+        self._opened = 0
+        self._compiled = LRUCache(1024)
+
+    def compile(self, statement, parameters=None):
+        """
+        SQL and positional parameters of statement. Statements given parameters are reused with new ones,
+        their compiled form is cached.
+        """
+        if parameters is None:
+            compiled = statement.compile(dialect=self.driver.dialect)
+        else:
+            compiled = self._compiled.get(statement)
+            if compiled is None:
+                compiled = self._compiled[statement] = statement.compile(dialect=self.driver.dialect)
+        parameters = compiled.construct_params(parameters)
+        return self.driver.placeholders(str(compiled)), [parameters[name] for name in compiled.positiontup]
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+        if self._idle.empty() and self._opened < self.pool_size:
+            self._opened += 1
+            try:
+                connection = await self.driver.connect()
+            except BaseException:
+                self._opened -= 1
+                raise
+        else:
+            try:
+                connection = await asyncio.wait_for(self._idle.get(), self.timeout)
+            except asyncio.TimeoutError:
+                raise PoolTimeout(f'no database connection got free in {self.timeout} seconds') from None
+
+        try:
+            yield Connection(self, connection)
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def fetch(self, statement):
+        async with self.connection() as connection:
+            return await connection.fetch(statement)
+
+    async def close(self):
+        if self._idle is not None:
+            while not self._idle.empty():
+                await self.driver.close(self._idle.get_nowait())
+        self._idle = None
+        self._opened = 0
@@ -0,0 +1,86 @@
+from functools import lru_cache
+from types import SimpleNamespace
+from sqlalchemy import inspect, select
+from ..schema.serializer import serializer
+
+IN_CHUNK_SIZE = 500
+
+
+class Plan:
+    """
+    What to select for dump of schema with `only` fields: columns of the model,
+    collections loaded by primary keys of rows and many-to-one references taken from foreign key columns.
+    """
+    def __init__(self, schema_cls, only):
+        mapper = inspect(schema_cls.Meta.model)
+        self.primary_key = mapper.primary_key[0]
+        self.key = _key_name(mapper)
+        self.columns = {self.key: self.primary_key}
+        self.collections = {}
+        self.references = {}
+
+        for name, field in serializer(schema_cls, only).schema.dump_fields.items():
+            attribute = field.attribute or name
+            if attribute in mapper.column_attrs:
+                self.columns[attribute] = mapper.column_attrs[attribute].columns[0]
+            elif attribute in mapper.relationships:
+                relationship = mapper.relationships[attribute]
+                if relationship.uselist:
+                    self.collections[attribute] = relationship
+                else:
+                    self.references[attribute] = relationship
+
+        self.reference_columns = {attribute: next(iter(relationship.local_columns))
+                                  for attribute, relationship in self.references.items()}
+        self.selected = list({column: None for column in [*self.columns.values(),
+                                                          *self.reference_columns.values()]})
+
+    def statement(self):
+        return select(self.selected)
+
+
+@lru_cache()
+def plan(schema_cls, only=None):
+    return Plan(schema_cls, only)
+
+
+def _key_name(mapper):
+    return mapper.get_property_by_column(mapper.primary_key[0]).key
+
+
+def _collection_statement(relationship, ids):
+    parent, child = relationship.synchronize_pairs[0][1], relationship.mapper.primary_key[0]
+    if relationship.secondary is not None:
+        child = relationship.secondary_synchronize_pairs[0][1]
+    return select([parent, child]).where(parent.in_(ids)).order_by(parent, child)
+
+
+async def load_records(connection, plan, rows):
+    """
+    Objects with attributes serializer of the plan reads, built from rows of plan statement.
+    Every collection costs one more SELECT per IN_CHUNK_SIZE rows on the connection, like selectinload of sync app.
+    """
+    positions = {column: number for number, column in enumerate(plan.selected)}
+    records = []
+    for row in rows:
+        record = SimpleNamespace(**{attribute: row[positions[column]] for attribute, column in plan.columns.items()})
+        for attribute, column in plan.reference_columns.items():
+            value = row[positions[column]]
+            key = _key_name(plan.references[attribute].mapper)
+            setattr(record, attribute, None if value is None else SimpleNamespace(**{key: value}))
+        records.append(record)
+
+    for attribute, relationship in plan.collections.items():
+        by_id = {}
+        for record in records:
+            items = []
+            setattr(record, attribute, items)
+            by_id[getattr(record, plan.key)] = items
+        related_key = _key_name(relationship.mapper)
+        ids = list(by_id)
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            for parent_id, child_id in await connection.fetch(_collection_statement(relationship,
+                                                                                  ids[start:start + IN_CHUNK_SIZE])):
+                by_id[parent_id].append(SimpleNamespace(**{related_key: child_id}))
+
+    return records
@@ -0,0 +1,42 @@
+import json
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+
+
+class Response(namedtuple('Response', 'status_code headers data')):
+    @property
+    def json(self):
+        return json.loads(self.data)
+
+
+async def call(app, url, method='GET', headers=None):
+    """
+    Sends request to ASGI app in process, without server, returns Response with complete body.
+    """
+    parts = urlsplit(url)
+    scope = {'type': 'http',
+             'asgi': {'version': '3.0'},
+             'http_version': '1.1',
+             'method': method,
+             'scheme': 'http',
+             'path': unquote(parts.path),
+             'raw_path': parts.path.encode(),
+             'query_string': parts.query.encode(),
+             'root_path': '',
+             'headers': [(b'host', b'localhost')] + [(name.lower().encode(), value.encode())
+                                                     for name, value in (headers or {}).items()],
+             'server': ('localhost', 80),
+             'client': ('127.0.0.1', 0)}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    headers = {name.decode().lower(): value.decode() for name, value in start['headers']}
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return Response(start['status'], headers, body)
@@ -4,13 +4,30 @@ from flasgger import Swagger
 import os
 
 
-def create_app(config_name='dev'):
+def create_app(config_name='dev', **config):
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
+    app.config.update(config)
+
+    from .pool import engine_options
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config),
+                                               **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
 
     from .models import db
     db.init_app(app)
 
+    from . import routing
+    routing.init_app(app, lambda uri: engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': uri}))
+
+    from . import instrumentation
+    instrumentation.init_app(app)
+
+    from .cache import ResponseCache
+    ResponseCache(app)
+
+    from .jobs import JobQueue
+    JobQueue(app)
+
     from .resources.v1.api import api_bp as api_v1
     app.register_blueprint(api_v1, url_prefix='/api/v1')
 
@@ -0,0 +1,125 @@
+from flask import abort, current_app, g, request
+from flask_restful import abort as restful_abort
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import HTTPException
+from .models import db
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+BATCH_ENDPOINT = 'api_v1.batch'
+# headers of the body, not of what the client asked for
+OMITTED_HEADERS = ('Content-Type', 'Content-Length', 'Server-Timing')
+
+
+def _check_requests(items, atomic):
+    if not isinstance(items, list):
+        abort(400, 'list of requests expected')
+    max_requests = current_app.config['BATCH_MAX_REQUESTS']
+    if len(items) > max_requests:
+        abort(413, f'at most {max_requests} requests can be sent in one batch')
+
+    adapter = current_app.create_url_adapter(request)
+    errors = {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors[index] = {'_item': ['object expected']}
+            continue
+        method, path, headers = item.get('method', 'GET'), item.get('path'), item.get('headers', {})
+        if method not in BATCH_METHODS:
+            item_errors['method'] = [f'one of {", ".join(BATCH_METHODS)} required']
+        if not isinstance(path, str) or not path.startswith('/'):
+            item_errors['path'] = ['absolute path required']
+        elif method in BATCH_METHODS:
+            try:
+                endpoint, _ = adapter.match(path.split('?')[0], method)
+            except HTTPException:
+                endpoint = None
+            if endpoint is None or not endpoint.startswith('api_v1.') or endpoint == BATCH_ENDPOINT:
+                item_errors['path'] = [f'no {method} route of API v1 matches {path}']
+        if not isinstance(headers, dict) or not all(isinstance(value, str) for value in headers.values()):
+            item_errors['headers'] = ['object of string values required']
+        elif atomic and 'respond-async' in {value.lower() for key, value in headers.items() if key.lower() == 'prefer'}:
+            # job would be queued before the transaction queuing it commits
+            item_errors['headers'] = ['respond-async requests can not run in transaction']
+        if item_errors:
+            errors[index] = item_errors
+    if errors:
+        restful_abort(400, message='invalid requests, nothing was run', errors=errors)
+
+
+def _dispatch(item):
+    """
+    Runs request of the batch through the whole request handling of the app, in the app context of the batch,
+    so it shares the database session. Attributes of g it sets are dropped after it.
+    """
+    state = dict(vars(g))
+    g.nested_request = True
+    try:
+        with current_app.test_request_context(item['path'], base_url=request.host_url,
+                                              method=item.get('method', 'GET'), json=item.get('body'),
+                                              headers=item.get('headers'),
+                                              environ_base={'REMOTE_ADDR': request.remote_addr}):
+            response = current_app.full_dispatch_request()
+            body = response.get_json() if response.is_json else response.get_data(as_text=True) or None
+    finally:
+        vars(g).clear()
+        vars(g).update(state)
+
+    headers = {key: value for key, value in response.headers.items() if key not in OMITTED_HEADERS}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def _begin(session):
+    connection = session.connection()
+    # pysqlite begins transaction only before data changes, a savepoint outside of one is committed by its release
+    if connection.dialect.name == 'sqlite' and not connection.connection.in_transaction:
+        connection.execute('BEGIN')
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def restart_savepoint(session, transaction):
+    # commit of a request in transaction of batch releases its savepoint, the next one keeps following writes
+    if session.info.get('batch_savepoint') and transaction.nested and not transaction.parent.nested:
+        session.expire_all()
+        session.begin_nested()
+
+
+def run_batch(items, atomic=False):
+    """
+    Results of requests to API v1 run one by one in this request, each with status, headers and body.
+    Requests are checked first, none runs when any of them is invalid.
+    Atomic batch runs them in one transaction, their commits release savepoints of it,
+    the first failed request rolls back everything and is the error of the batch.
+    """
+    _check_requests(items, atomic)
+    if not atomic:
+        results = []
+        for item in items:
+            results.append(_dispatch(item))
+            if results[-1]['status'] >= 400:
+                # session would be removed with the failed request, changes it left are not committed by the next one
+                db.session.rollback()
+        return results
+
+    session = db.session()
+    transaction = session.transaction
+    _begin(session)
+    session.info['batch_savepoint'] = True
+    try:
+        session.begin_nested()
+        results = []
+        for index, item in enumerate(items):
+            result = _dispatch(item)
+            if result['status'] >= 400:
+                session.info.pop('batch_savepoint')
+                # savepoint first, closed unreleased it leaves the connection to the pool in a broken transaction
+                session.rollback()
+                transaction.rollback()
+                restful_abort(400, message=f'request {index} failed, nothing was changed', errors={index: result})
+            results.append(result)
+        session.info.pop('batch_savepoint')
+        transaction.commit()
+    finally:
+        session.info.pop('batch_savepoint', None)
+    return results
@@ -0,0 +1,235 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.http import quote_etag
+from .models import db, DataVersionModel
+from .streaming import streaming_requested, streaming_media_type
+
+
+DATA_TAGS = ('groups', 'students', 'courses', 'enrollments')
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of GET responses keyed by path with query string.
+    Every entry is tagged with data it was built from ('groups', 'students', 'courses', 'enrollments'),
+    committed writes drop entries of tags they touched, TTL bounds staleness of other workers.
+    """
+    def __init__(self, app=None):
+        self.entries = OrderedDict()
+        self.keys_by_tag = defaultdict(set)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.enabled = True
+        self.max_size = 1024
+        self.ttl = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        self.max_size = app.config['RESPONSE_CACHE_SIZE']
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        app.extensions['response_cache'] = self
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags, generation):
+        with self.lock:
+            # data was invalidated while response was being built, it may be stale already
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self.keys_by_tag[tag].add(key)
+            while len(self.entries) > self.max_size:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self.keys_by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.keys_by_tag.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'size': len(self.entries),
+                    'max_size': self.max_size,
+                    'ttl': self.ttl}
+
+    def _drop(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            self.keys_by_tag[tag].discard(key)
+            if not self.keys_by_tag[tag]:
+                del self.keys_by_tag[tag]
+
+
+def _split_response(rv):
+    if not isinstance(rv, tuple):
+        return rv, 200, {}
+    if len(rv) == 2:
+        return rv[0], rv[1], {}
+    data, status, headers = rv
+    return data, status, dict(headers or {})
+
+
+def _seed_version():
+    # versions start from current time, so tables recreated from scratch never repeat old ETags
+    return int(time.time() * 1000)
+
+
+def seed_versions():
+    existing = {name for name, in db.session.query(DataVersionModel.name)}
+    missing = [tag for tag in DATA_TAGS if tag not in existing]
+    if missing:
+        db.session.execute(DataVersionModel.__table__.insert(),
+                           [{'name': tag, 'version': _seed_version()} for tag in missing])
+    db.session.commit()
+
+
+def current_etag(tags):
+    versions = (db.session.query(DataVersionModel.name, DataVersionModel.version)
+                .filter(DataVersionModel.name.in_(tags))
+                .order_by(DataVersionModel.name)
+                .all())
+    representation = streaming_media_type() if streaming_requested() else ''
+    digest = hashlib.sha1(f'{request.full_path}|{representation}|{versions}'.encode()).hexdigest()
+    # weak, key order of serialized objects may differ between workers
+    return quote_etag(digest, weak=True)
+
+
+def _not_modified(etag):
+    return request.if_none_match.contains_weak(etag.split('"')[1])
+
+
+def cached(*tags):
+    """
+    Conditional and cached GET.
+    ETag is built from versions of data response depends on, matching If-None-Match is answered
+    with 304 before handler runs, other responses are served from the response cache when possible.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            # session with uncommitted writes has to see them, not cached data
+            if db.session.info.get('touched_tags'):
+                return method(*args, **kwargs)
+
+            cache = current_app.extensions.get('response_cache')
+            # streamed responses are never built in memory, so they are not cached either
+            if cache is not None and (not cache.enabled or streaming_requested()):
+                cache = None
+            key = request.full_path
+
+            rv = cache.get(key) if cache is not None else None
+            if rv is not None:
+                data, status, headers = rv
+                if 'ETag' in headers and _not_modified(headers['ETag']):
+                    return None, 304, {'ETag': headers['ETag'], 'X-Cache': 'HIT'}
+                return data, status, {**headers, 'X-Cache': 'HIT'}
+
+            etag_headers = {}
+            if current_app.config['ETAG_ENABLED']:
+                etag = current_etag(tags)
+                if _not_modified(etag):
+                    return None, 304, {'ETag': etag}
+                etag_headers['ETag'] = etag
+
+            generation = cache.generation if cache is not None else None
+            rv = method(*args, **kwargs)
+            if isinstance(rv, current_app.response_class):
+                rv.headers.extend(etag_headers)
+                return rv
+            data, status, headers = _split_response(rv)
+            if status != 200:
+                return rv
+            headers.update(etag_headers)
+            if cache is None:
+                return data, status, headers
+            cache.set(key, (data, status, headers), tags, generation)
+            return data, status, {**headers, 'X-Cache': 'MISS'}
+
+        return wrapper
+    return decorator
+
+
+def touch(*tags):
+    db.session.info.setdefault('touched_tags', set()).update(tags)
+
+
+def invalidates(*tags):
+    """
+    Marks data changed by decorated write function,
+    cached responses built from it are dropped once the session commits.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            touch(*tags)
+            return function(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, 'before_commit')
+def bump_versions(session):
+    tags = session.info.get('touched_tags')
+    if not tags:
+        return
+
+    table = DataVersionModel.__table__
+    result = session.execute(table.update()
+                             .where(table.c.name.in_(tags))
+                             .values(version=table.c.version + 1))
+    if result.rowcount < len(tags):
+        existing = {name for name, in session.execute(db.select([table.c.name]).where(table.c.name.in_(tags)))}
+        session.execute(table.insert(), [{'name': tag, 'version': _seed_version()} for tag in tags - existing])
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed(session):
+    if session.transaction.nested:
+        # released savepoint, data is committed with the transaction it is part of
+        return
+    tags = session.info.pop('touched_tags', None)
+    if tags and has_app_context():
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            cache.invalidate(tags)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def forget_rolled_back(session, previous_transaction):
+    # changes before the savepoint may still commit, their tags are kept
+    if not previous_transaction.nested:
+        session.info.pop('touched_tags', None)
@@ -10,18 +10,55 @@ test_local_base = 'sqlite://'
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+def optional_float(name, default):
+    # set but empty variable is None
+    value = os.getenv(name, str(default))
+    return float(value) if value.strip() else None
+
+
 class Config:
     DEBUG = False
     TESTING = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'this-really-needs-to-be-changed')
     SQLALCHEMY_DATABASE_URI = postgres_db
     SWAGGER = {'doc_dir': './docs/'}
+    PAGINATION_DEFAULT_LIMIT = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 500))
+    PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 1000))
+    SQLALCHEMY_QUERY_BUDGET = None
+    BULK_CREATE_MAX_ITEMS = int(os.getenv('BULK_CREATE_MAX_ITEMS', 1000))
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 100))
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 30))
+    ETAG_ENABLED = os.getenv('ETAG_ENABLED', 'true').lower() == 'true'
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 1000))
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    # /api/v1/internal statistics of cache and pool of a worker, 404 unless enabled
+    INTERNAL_ENDPOINTS_ENABLED = os.getenv('INTERNAL_ENDPOINTS_ENABLED', 'false').lower() == 'true'
+    # statements running longer are logged to school_api.slow_query logger, None (empty variable) disables the log
+    SLOW_QUERY_THRESHOLD_MS = optional_float('SLOW_QUERY_THRESHOLD_MS', 100)
+    # connection pool, pool size and overflow are per worker process
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    # comma separated, reads of GET requests are spread over them round-robin
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+    # background jobs, 0 workers runs job within the request that submitted it
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', 1000))
+    # running job without progress for so many seconds is taken as lost with its worker and queued again
+    JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', 300))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     DEVELOPMENT = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 2))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 3))
+    INTERNAL_ENDPOINTS_ENABLED = os.getenv('INTERNAL_ENDPOINTS_ENABLED', 'true').lower() == 'true'
 
 
 class TestingConfig(Config):
@@ -30,10 +67,16 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = test_local_base
     PRESERVE_CONTEXT_ON_EXCEPTION = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_QUERY_BUDGET = 20
+    JOB_WORKERS = 0
+    INTERNAL_ENDPOINTS_ENABLED = True
 
 
 class ProductionConfig(Config):
     DEBUG = False
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
 
 
 config_by_name = dict(
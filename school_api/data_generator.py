@@ -1,102 +1,173 @@
-import string
+import bisect
 import itertools
+import multiprocessing
 import random
+import string
+from .db import recount_students, reset_sequences
 from .models.models import (StudentModel as Student,
                             GroupModel as Group,
                             CourseModel as Course,
                             student_course,
                             db)
 
-
-random.seed(42)
-
-
-def create_random_groups():
-    alphabetic_pairs = list(itertools.combinations_with_replacement(string.digits, 2))
-    digit_pairs = list(itertools.combinations_with_replacement(string.ascii_uppercase, 2))
-
-    alphabetic_pairs = [''.join(pair) for pair in alphabetic_pairs]
-    digit_pairs = [''.join(pair) for pair in digit_pairs]
-
-    groups = random.sample(list(itertools.product(digit_pairs, alphabetic_pairs)), 10)
-
-    groups = ['-'.join(s) for s in groups]
+FIRST_NAMES = ['Cristen', 'Kara', 'Fausto', 'Elizbeth', 'Marinda', 'Buddy', 'Lyla', 'Jeremiah', 'Raeann',
+               'Micheline', 'Sylvester', 'Cortez', 'Cherly', 'Angel', 'Ramona', 'Raul', 'Olympia', 'Zulma',
+               'Lourie', 'Alba']
+LAST_NAMES = ['Forrest', 'Stewart', 'Molina', 'Rowe', 'Harrison', 'Humphreys', 'Lewis', 'Harmon', 'Oliver',
+              'Whelan', 'Glover', 'Castillo', 'Guerrero', 'Briggs', 'Richardson', 'Gonzalez', 'Baker', 'Wilson',
+              'Duncan', 'Black']
+COURSES = [('English', 'Study of literature (especially novels, plays, short stories, and poetry)'),
+           ('Math', 'Includes the study of such topics as quantity (number theory), structure (algebra),'
+                    ' space (geometry), and change (mathematical analysis).'),
+           ('Biology', 'Natural science that studies life and living organisms, including their physical structure,'
+                       ' chemical processes, molecular interactions, physiological mechanisms,'
+                       ' development and evolution.'),
+           ('Chemistry', 'Scientific discipline involved with elements and compounds composed of atoms, '
+                         'molecules and ions: their composition, structure, properties, behavior and the changes'
+                         ' they undergo during a reaction with other substances.'),
+           ('Physics', 'Natural science that studies matter, its motion and behavior through space and time, '
+                       'and the related entities of energy and force.'),
+           ('Economics', 'Social science that studies how people interact with things of value; in particular, '
+                         'the production, distribution, and consumption of goods and services.'),
+           ('Geography', 'Science devoted to the study of the lands, features, inhabitants, and phenomena '
+                         'of the Earth and planets.'),
+           ('History', 'Study of the past.'),
+           ('Arts', 'Refers to the theory, human application and physical expression of creativity found in'
+                    ' human cultures and societies through skills and imagination in order to produce objects,'
+                    ' environments and experiences.'),
+           ('Computer science', 'Study of algorithmic processes and computational machines.')]
+
+COURSE_POPULARITY = ('uniform', 'zipf')
+
+
+def create_random_groups(rng, number_of_groups):
+    letter_pairs = [''.join(pair) for pair in itertools.combinations_with_replacement(string.ascii_uppercase, 2)]
+    digit_pairs = [''.join(pair) for pair in itertools.combinations_with_replacement(string.digits, 2)]
+    names = list(itertools.product(letter_pairs, digit_pairs))
+
+    groups = ['-'.join(name) for name in rng.sample(names, min(number_of_groups, len(names)))]
+    # there are 19305 short names, groups over them get numbered ones
+    groups.extend(f'{rng.choice(letter_pairs)}-{number}' for number in range(len(groups) + 1, number_of_groups + 1))
 
     return groups
 
 
-def create_random_students():
-    first_names = ['Cristen', 'Kara', 'Fausto', 'Elizbeth', 'Marinda', 'Buddy', 'Lyla', 'Jeremiah', 'Raeann',
-                   'Micheline', 'Sylvester', 'Cortez', 'Cherly', 'Angel', 'Ramona', 'Raul', 'Olympia', 'Zulma',
-                   'Lourie', 'Alba']
-    last_names = ['Forrest', 'Stewart', 'Molina', 'Rowe', 'Harrison', 'Humphreys', 'Lewis', 'Harmon', 'Oliver',
-                  'Whelan', 'Glover', 'Castillo', 'Guerrero', 'Briggs', 'Richardson', 'Gonzalez', 'Baker', 'Wilson',
-                  'Duncan', 'Black']
-
-    students = random.sample(list(itertools.product(first_names, last_names)), 200)
-
-    return students
-
+def create_courses(number_of_courses):
+    courses = COURSES[:number_of_courses]
+    courses.extend((f'Course {number}', f'Elective course number {number}.')
+                   for number in range(len(courses) + 1, number_of_courses + 1))
+
+    return courses
+
+
+def group_bounds(rng, number_of_groups, number_of_students, group_size):
+    """
+    Last student id of every group, students are put into groups in id order,
+    students left after every group got its size stay without group.
+    """
+    bounds = []
+    last_id = 0
+    for _ in range(number_of_groups):
+        last_id = min(last_id + rng.randint(*group_size), number_of_students)
+        bounds.append(last_id)
+
+    return bounds
+
+
+_chunk_params = None
+
+
+def _init_chunk_worker(params):
+    global _chunk_params
+    _chunk_params = params
+
+
+def generate_chunk(chunk):
+    """
+    Students and enrollments of ids [start, stop).
+    Every chunk has its own random generator seeded by seed and chunk number,
+    so data does not depend on number of processes or order chunks are generated in.
+    """
+    number, start, stop = chunk
+    seed, bounds, number_of_courses, courses_per_student, cum_weights = _chunk_params
+    rng = random.Random(f'{seed}-{number}')
+    courses = range(1, number_of_courses + 1)
+
+    students = []
+    enrollments = []
+    for student_id in range(start, stop):
+        group = bisect.bisect_left(bounds, student_id)
+        students.append({'id': student_id,
+                         'first_name': rng.choice(FIRST_NAMES),
+                         'last_name': rng.choice(LAST_NAMES),
+                         'group_id': group + 1 if group < len(bounds) else None})
+
+        k = min(rng.randint(*courses_per_student), number_of_courses)
+        if cum_weights is None:
+            student_courses = rng.sample(courses, k)
+        else:
+            student_courses = set()
+            while len(student_courses) < k:
+                student_courses.update(rng.choices(courses, cum_weights=cum_weights, k=k - len(student_courses)))
+        enrollments.extend({'student_id': student_id, 'course_id': course_id} for course_id in student_courses)
+
+    return students, enrollments
+
+
+def test_db(app, groups=10, students=200, courses=10, group_size=(10, 30), courses_per_student=(1, 3),
+            course_popularity='uniform', seed=42, chunk_size=10000, processes=1, progress=None):
+    """
+    Inserts generated groups, students, courses and enrollments.
+    Students are generated and inserted in chunks of executemany Core inserts, chunks can be generated
+    by several processes. Same seed, sizes and chunk size give same data whatever number of processes is.
+    """
+    if course_popularity not in COURSE_POPULARITY:
+        raise ValueError(f'course_popularity must be one of {", ".join(COURSE_POPULARITY)}')
+
+    rng = random.Random(seed)
+    group_names = create_random_groups(rng, groups)
+    bounds = group_bounds(rng, groups, students, group_size)
+    cum_weights = None
+    if course_popularity == 'zipf':
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, courses + 1)))
+    params = (seed, bounds, courses, courses_per_student, cum_weights)
+
+    chunks = [(number, start, min(start + chunk_size, students + 1))
+              for number, start in enumerate(range(1, students + 1, chunk_size))]
 
-def assign_students_to_courses(app):
     with app.app_context():
-        students = Student.query.all()
-        courses = Course.query.all()
-        for student in students:
-            for course in random.sample(courses, k=random.randint(1, 3)):
-                db.session.execute(student_course.insert().values(student_id=student.id, course_id=course.id))
-
-        db.session.commit()
-
-
-def test_db(app):
-    courses = [('English', 'Study of literature (especially novels, plays, short stories, and poetry)'),
-               ('Math', 'Includes the study of such topics as quantity (number theory), structure (algebra),'
-                        ' space (geometry), and change (mathematical analysis).'),
-               ('Biology', 'Natural science that studies life and living organisms, including their physical structure,'
-                           ' chemical processes, molecular interactions, physiological mechanisms,'
-                           ' development and evolution.'),
-               ('Chemistry', 'Scientific discipline involved with elements and compounds composed of atoms, '
-                             'molecules and ions: their composition, structure, properties, behavior and the changes'
-                             ' they undergo during a reaction with other substances.'),
-               ('Physics', 'Natural science that studies matter, its motion and behavior through space and time, '
-                           'and the related entities of energy and force.'),
-               ('Economics', 'Social science that studies how people interact with things of value; in particular, '
-                             'the production, distribution, and consumption of goods and services.'),
-               ('Geography', 'Science devoted to the study of the lands, features, inhabitants, and phenomena '
-                             'of the Earth and planets.'),
-               ('History', 'Study of the past.'),
-               ('Arts', 'Refers to the theory, human application and physical expression of creativity found in'
-                        ' human cultures and societies through skills and imagination in order to produce objects,'
-                        ' environments and experiences.'),
-               ('Computer science', 'Study of algorithmic processes and computational machines.')]
-
-    students = create_random_students()
-    groups = create_random_groups()
-
-    with app.app_context():
-        for group in groups:
-            group = Group(name=group)
-            for _ in range(random.randint(10, 30)):
-                try:
-                    first_name, last_name = students.pop()
-                except IndexError:
-                    break
-                Student(first_name=first_name, last_name=last_name, group=group)
-            db.session.add(group)
-
+        if group_names:
+            db.session.execute(Group.__table__.insert(),
+                               [{'id': group_id, 'name': name} for group_id, name in enumerate(group_names, 1)])
+        if courses:
+            db.session.execute(Course.__table__.insert(),
+                               [{'id': course_id, 'name': name, 'description': description}
+                                for course_id, (name, description) in enumerate(create_courses(courses), 1)])
         db.session.commit()
 
-        if students:
-            for student in students:
-                first_name, last_name = student
-                db.session.add(Student(first_name=first_name, last_name=last_name))
-            db.session.commit()
-
-        for course in courses:
-            name, description = course
-            db.session.add(Course(name=name, description=description))
-
+        if processes > 1:
+            pool = multiprocessing.Pool(processes, initializer=_init_chunk_worker, initargs=(params,))
+            generated = pool.imap(generate_chunk, chunks)
+        else:
+            pool = None
+            _init_chunk_worker(params)
+            generated = map(generate_chunk, chunks)
+
+        try:
+            inserted = 0
+            for chunk_students, chunk_enrollments in generated:
+                db.session.execute(Student.__table__.insert(), chunk_students)
+                if chunk_enrollments:
+                    db.session.execute(student_course.insert(), chunk_enrollments)
+                db.session.commit()
+                inserted += len(chunk_students)
+                if progress is not None:
+                    progress(inserted, students)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        recount_students()
+        reset_sequences()
         db.session.commit()
-
-        assign_students_to_courses(app)
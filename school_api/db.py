@@ -1,6 +1,12 @@
+import warnings
+from datetime import datetime
+from sqlalchemy.exc import SAWarning
+from .cache import seed_versions, touch
 from .models.models import (StudentModel as Student,
                             GroupModel as Group,
                             CourseModel as Course,
+                            SEARCHED_COLUMNS,
+                            search_ddl,
                             student_course,
                             db)
 
@@ -8,8 +14,119 @@ from .models.models import (StudentModel as Student,
 def create_tables(app):
     with app.app_context():
         db.create_all()
+        seed_versions()
+        app.extensions['response_cache'].clear()
 
 
 def drop_tables(app):
     with app.app_context():
         db.drop_all()
+        app.extensions['response_cache'].clear()
+
+
+def actual_student_count():
+    return (db.select([db.func.count(Student.id)])
+            .where(Student.group_id == Group.id)
+            .correlate(Group.__table__)
+            .as_scalar())
+
+
+def recount_students():
+    """
+    Sets student_count of every group from student table, returns number of groups that were wrong.
+    """
+    fixed = (Group.query
+             .filter(Group.student_count != actual_student_count())
+             .update({Group.student_count: actual_student_count()}, synchronize_session=False))
+    if fixed:
+        touch('groups')
+    return fixed
+
+
+def check_student_counts(app):
+    """
+    Groups which student_count differs from number of their students, as (group id, stored, actual).
+    """
+    with app.app_context():
+        return (db.session.query(Group.id, Group.student_count, actual_student_count())
+                .filter(Group.student_count != actual_student_count())
+                .order_by(Group.id)
+                .all())
+
+
+def rebuild_student_counts(app):
+    with app.app_context():
+        fixed = recount_students()
+        db.session.commit()
+        return fixed
+
+
+def reset_sequences():
+    # ids were inserted explicitly, sequences of postgres have to continue after them
+    if db.engine.dialect.name == 'postgresql':
+        for table in (Group.__table__, Student.__table__, Course.__table__):
+            db.session.execute(f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                               f"coalesce(max(id), 0) + 1, false) FROM \"{table.name}\"")
+
+
+def _rebuild_student_course(connection):
+    # primary key can not be added to existing table on every database,
+    # so rows are copied without duplicates and orphans to a new table that replaces the old one
+    upgraded = student_course.tometadata(db.metadata, name=f'{student_course.name}_upgrade')
+    try:
+        upgraded.create(connection)
+        rows = (db.select([student_course.c.student_id, student_course.c.course_id])
+                .where(student_course.c.student_id.in_(db.select([Student.id])))
+                .where(student_course.c.course_id.in_(db.select([Course.id])))
+                .distinct())
+        connection.execute(upgraded.insert().from_select(['student_id', 'course_id'], rows))
+        student_course.drop(connection)
+        quote = connection.dialect.identifier_preparer.quote
+        connection.execute(f'ALTER TABLE {quote(upgraded.name)} RENAME TO {quote(student_course.name)}')
+    finally:
+        db.metadata.remove(upgraded)
+
+
+def upgrade_tables(app):
+    """
+    Brings tables created by older versions up to current models: missing tables,
+    primary key of student_course, student_count of groups, updated_at of students, missing indexes
+    and search structures. Safe to run repeatedly.
+    """
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            if not db.inspect(connection).get_pk_constraint(student_course.name)['constrained_columns']:
+                _rebuild_student_course(connection)
+
+            group_columns = {column['name'] for column in db.inspect(connection).get_columns(Group.__tablename__)}
+            if 'student_count' not in group_columns:
+                quote = connection.dialect.identifier_preparer.quote
+                connection.execute(f'ALTER TABLE {quote(Group.__tablename__)} '
+                                   f'ADD COLUMN student_count INTEGER NOT NULL DEFAULT 0')
+
+            student_columns = db.inspect(connection).get_columns(Student.__tablename__)
+            if 'updated_at' not in {column['name'] for column in student_columns}:
+                # default of added column has to be constant, existing students count as changed now
+                quote = connection.dialect.identifier_preparer.quote
+                column_type = Student.__table__.c.updated_at.type.compile(dialect=connection.dialect)
+                connection.execute(f'ALTER TABLE {quote(Student.__tablename__)} '
+                                   f"ADD COLUMN updated_at {column_type} NOT NULL DEFAULT '1970-01-01 00:00:00'")
+                connection.execute(Student.__table__.update().values(updated_at=datetime.utcnow()))
+
+            for table in (Student.__table__, Group.__table__, student_course):
+                with warnings.catch_warnings():
+                    # expression indexes of search are not reflected by sqlite dialect, they are created below
+                    warnings.filterwarnings('ignore', 'Skipped unsupported reflection', SAWarning)
+                    existing = {index['name'] for index in db.inspect(connection).get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(connection)
+
+            for table, columns in SEARCHED_COLUMNS.items():
+                for ddl in search_ddl(table, columns):
+                    ddl.execute(connection, table)
+        recount_students()
+        db.session.commit()
+        seed_versions()
+        app.extensions['response_cache'].clear()
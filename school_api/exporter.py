@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import groupby
+from .routing import reading_only
+from .models.models import (StudentModel as Student,
+                            GroupModel as Group,
+                            student_course,
+                            db)
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_FIELDS = ('id', 'first_name', 'last_name', 'group', 'courses', 'updated_at')
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def parse_since(value):
+    """
+    Time of ISO 8601 value as UTC without zone, as updated_at of students, ValueError when it is not one.
+    """
+    if not value:
+        return None
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def export_statement(since=None):
+    """
+    One ordered join of students, their group names and enrollments, a row per enrollment,
+    students of since filter are the ones created or changed at or after it.
+    """
+    statement = (db.select([Student.id, Student.first_name, Student.last_name, Group.name.label('group'),
+                            Student.updated_at, student_course.c.course_id])
+                 .select_from(Student.__table__
+                              .outerjoin(Group.__table__, Student.group_id == Group.id)
+                              .outerjoin(student_course, student_course.c.student_id == Student.id))
+                 .order_by(Student.id, student_course.c.course_id))
+    if since is not None:
+        statement = statement.where(Student.updated_at >= since)
+    return statement
+
+
+def export_records(since=None, chunk_size=1000):
+    """
+    Students as dicts with group name and list of course ids, rows are fetched in chunks
+    through server-side cursor, so memory does not grow with number of students.
+    """
+    result = db.session.execute(export_statement(since).execution_options(stream_results=True))
+    rows = (row for chunk in iter(lambda: result.fetchmany(chunk_size), []) for row in chunk)
+    for student_id, student_rows in groupby(rows, key=lambda row: row.id):
+        first = next(student_rows)
+        courses = [row.course_id for row in student_rows]
+        if first.course_id is not None:
+            courses.insert(0, first.course_id)
+        yield {'id': student_id,
+               'first_name': first.first_name,
+               'last_name': first.last_name,
+               'group': first.group,
+               'courses': courses,
+               'updated_at': first.updated_at.isoformat()}
+
+
+def export_chunks(file_format='ndjson', since=None, chunk_size=1000):
+    """
+    Text of export in chunks of chunk_size students. NDJSON has one student object per line,
+    CSV has header row and course ids separated by spaces.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'format must be one of {", ".join(EXPORT_FORMATS)}')
+
+    buffer = io.StringIO()
+    if file_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+
+        def write(record):
+            writer.writerow([*(record[field] for field in EXPORT_FIELDS[:4]),
+                             ' '.join(map(str, record['courses'])), record['updated_at']])
+    else:
+        def write(record):
+            buffer.write(json.dumps(record) + '\n')
+
+    for number, record in enumerate(export_records(since, chunk_size), 1):
+        write(record)
+        if number % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_export(file, file_format='ndjson', since=None, chunk_size=1000):
+    """
+    Writes export to file, reading it from replicas when there are ones.
+    """
+    # read_only flag has to stay set while the generator runs its queries
+    with reading_only():
+        for chunk in export_chunks(file_format, since, chunk_size):
+            file.write(chunk)
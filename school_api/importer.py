@@ -0,0 +1,253 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.exc import SQLAlchemyError
+from .cache import touch
+from .db import reset_sequences
+from .jobs import RUNNING, SUCCEEDED, FAILED
+from .models.models import (StudentModel as Student,
+                            GroupModel as Group,
+                            CourseModel as Course,
+                            JobModel as Job,
+                            student_course,
+                            db)
+from .services.services import _change_student_counts, _mark_students_changed
+
+IMPORT_KINDS = ('groups', 'courses', 'students', 'enrollments')
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class ImportFailed(Exception):
+    pass
+
+
+class FilePosition:
+    def __init__(self):
+        self.bytes = 0
+
+
+def _lines(file, position):
+    for number, raw in enumerate(file, 1):
+        position.bytes += len(raw)
+        try:
+            line = raw.decode('utf-8-sig')
+        except UnicodeDecodeError as error:
+            raise ImportFailed(f'line {number}: file has to be UTF-8, {error}')
+        yield line
+
+
+def read_records(file, file_format, position):
+    """
+    Records of binary file as dicts, read line by line, so memory does not grow with file.
+    CSV has header row with field names, NDJSON has one JSON object per line.
+    """
+    if file_format == 'csv':
+        number = 0
+        try:
+            for number, record in enumerate(csv.DictReader(_lines(file, position)), 1):
+                yield record
+        except csv.Error as error:
+            raise ImportFailed(f'record {number + 1}: invalid CSV, {error}')
+        return
+
+    for number, line in enumerate(_lines(file, position), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ImportFailed(f'line {number}: invalid JSON, {error}')
+        if not isinstance(record, dict):
+            raise ImportFailed(f'line {number}: every line has to be JSON object')
+        yield record
+
+
+def _value(record, field, required=True):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip() or None
+    if value is None and required:
+        raise ImportFailed(f'{field} is required')
+    return value
+
+
+def _integer(record, field, required=True):
+    value = _value(record, field, required)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ImportFailed(f'{field} must be integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ImportFailed(f'{field} must be integer')
+
+
+def _rows(chunk, row):
+    rows = []
+    for number, record in chunk:
+        try:
+            rows.append(row(record))
+        except ImportFailed as error:
+            raise ImportFailed(f'record {number}: {error}')
+    return rows
+
+
+def _import_groups(chunk, ids_by_name):
+    db.session.execute(Group.__table__.insert(), _rows(chunk, lambda record: {'name': _value(record, 'name')}))
+    touch('groups')
+
+
+def _import_courses(chunk, ids_by_name):
+    db.session.execute(Course.__table__.insert(),
+                       _rows(chunk, lambda record: {'name': _value(record, 'name'),
+                                                    'description': _value(record, 'description', required=False)}))
+    touch('courses')
+
+
+def _import_students(chunk, group_ids):
+    def row(record):
+        group = _value(record, 'group', required=False)
+        if group is not None and group not in group_ids:
+            raise ImportFailed(f'unknown group {group}')
+        student_id = _integer(record, 'id', required=False)
+        return {**({'id': student_id} if student_id is not None else {}),
+                'first_name': _value(record, 'first_name'),
+                'last_name': _value(record, 'last_name'),
+                'group_id': group_ids.get(group)}
+
+    rows = _rows(chunk, row)
+    # executemany needs the same columns in every row
+    for with_id in (True, False):
+        same_columns = [row for row in rows if ('id' in row) == with_id]
+        if same_columns:
+            db.session.execute(Student.__table__.insert(), same_columns)
+    _change_student_counts(Counter(row['group_id'] for row in rows))
+    touch('students', 'groups')
+
+
+def _import_enrollments(chunk, course_ids):
+    def row(record):
+        course = _value(record, 'course')
+        if course not in course_ids:
+            raise ImportFailed(f'unknown course {course}')
+        return _integer(record, 'student_id'), course_ids[course]
+
+    pairs = _rows(chunk, row)
+    student_ids = {student_id for student_id, _ in pairs}
+    known = {student_id for student_id, in db.session.query(Student.id).filter(Student.id.in_(student_ids))}
+    for (student_id, _), (number, _) in zip(pairs, chunk):
+        if student_id not in known:
+            raise ImportFailed(f'record {number}: unknown student {student_id}')
+
+    # enrollments already in database are skipped, so the same file can be imported again
+    enrolled = set(db.session.query(student_course.c.student_id, student_course.c.course_id)
+                   .filter(student_course.c.student_id.in_(student_ids)))
+    added = sorted(set(pairs) - enrolled)
+    if added:
+        db.session.execute(student_course.insert(),
+                           [{'student_id': student_id, 'course_id': course_id} for student_id, course_id in added])
+        _mark_students_changed(Student.id.in_({student_id for student_id, _ in added}))
+    touch('enrollments')
+
+
+def _no_ids():
+    return None
+
+
+def _group_ids():
+    return {name: group_id for group_id, name in db.session.query(Group.id, Group.name)}
+
+
+def _course_ids():
+    return {name: course_id for course_id, name in db.session.query(Course.id, Course.name)}
+
+
+# kind -> (function inserting chunk of numbered records, map of names to ids it needs)
+IMPORTERS = {
+    'groups': (_import_groups, _no_ids),
+    'courses': (_import_courses, _no_ids),
+    'students': (_import_students, _group_ids),
+    'enrollments': (_import_enrollments, _course_ids),
+}
+
+
+def _unfinished_import(operation, arguments):
+    for job in (Job.query
+                .filter(Job.operation == operation, Job.status != SUCCEEDED)
+                .order_by(Job.id.desc())):
+        if job.arguments == arguments:
+            return job
+    return None
+
+
+def import_file(app, kind, path, file_format=None, chunk_size=10000, restart=False, progress=None):
+    """
+    Streams groups, courses, students or enrollments from CSV or NDJSON file into database.
+    Names of groups and courses are resolved to ids by a map built once, records are inserted
+    in chunks of chunk_size, one transaction each. Import is a row of job table, its progress is committed
+    with every chunk, so import of the same file that failed or was stopped continues after the last
+    committed chunk, unless restart is set. Memory holds the map and one chunk whatever the file size is.
+    progress is called after every chunk with (records done, records imported by this call, bytes read,
+    file size, seconds).
+    Returns numbers of records in the file and of records imported by this call,
+    raises ImportFailed when a record is invalid or database rejects a chunk.
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f'kind must be one of {", ".join(IMPORT_KINDS)}')
+    path = os.path.abspath(path)
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f'format must be one of {", ".join(IMPORT_FORMATS)}')
+    import_chunk, build_map = IMPORTERS[kind]
+
+    with app.app_context():
+        operation, arguments = f'import_{kind}', [path, file_format]
+        job = None if restart else _unfinished_import(operation, arguments)
+        now = datetime.utcnow()
+        if job is None:
+            job = Job(operation=operation, arguments=arguments, total=0, created_at=now)
+            db.session.add(job)
+        job.status, job.error, job.started_at, job.heartbeat_at, job.finished_at = RUNNING, None, now, now, None
+        db.session.commit()
+
+        ids_by_name = build_map()
+        size = os.path.getsize(path)
+        position = FilePosition()
+        start = time.perf_counter()
+        resumed_at = job.progress
+        with open(path, 'rb') as file:
+            records = enumerate(read_records(file, file_format, position), 1)
+            try:
+                # records of committed chunks are read again but not imported
+                for _ in islice(records, job.progress):
+                    pass
+                chunk = list(islice(records, chunk_size))
+                while chunk:
+                    try:
+                        import_chunk(chunk, ids_by_name)
+                    except SQLAlchemyError as error:
+                        raise ImportFailed(f'records {chunk[0][0]}-{chunk[-1][0]}: {getattr(error, "orig", error)}')
+                    job.progress = job.total = chunk[-1][0]
+                    job.heartbeat_at = datetime.utcnow()
+                    db.session.commit()
+                    if progress is not None:
+                        progress(job.progress, job.progress - resumed_at, position.bytes, size,
+                                 time.perf_counter() - start)
+                    chunk = list(islice(records, chunk_size))
+            except ImportFailed as error:
+                db.session.rollback()
+                job.status, job.error, job.finished_at = FAILED, {'message': str(error)}, datetime.utcnow()
+                db.session.commit()
+                raise
+
+        if kind == 'students':
+            reset_sequences()
+        result = {'records': job.progress, 'imported': job.progress - resumed_at}
+        job.status, job.result, job.finished_at = SUCCEEDED, result, datetime.utcnow()
+        db.session.commit()
+        return result
@@ -0,0 +1,115 @@
+import logging
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_log = logging.getLogger('school_api.slow_query')
+
+MAX_LOGGED_PARAMETERS = 1000
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'statements', 'sql_time', 'serialize_time', 'requests', 'parent')
+
+    def __init__(self, parent=None):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        # the request and those run within it by a batch
+        self.requests = 1
+        self.parent = parent
+
+    def add(self, metrics):
+        self.statements += metrics.statements
+        self.sql_time += metrics.sql_time
+        self.serialize_time += metrics.serialize_time
+        self.requests += metrics.requests
+
+
+def current_metrics():
+    if has_request_context():
+        return g.get('request_metrics')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    context.query_start_time = time.perf_counter()
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.statements += 1
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def time_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_start_time
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.sql_time += elapsed
+
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS') if has_app_context() else None
+    if threshold is not None and elapsed * 1000 >= threshold:
+        parameters = repr(parameters)
+        if len(parameters) > MAX_LOGGED_PARAMETERS:
+            parameters = parameters[:MAX_LOGGED_PARAMETERS] + '...'
+        endpoint = request.endpoint if has_request_context() else None
+        slow_query_log.warning('%.1f ms, endpoint %s%s: %s; parameters: %s', elapsed * 1000, endpoint,
+                               ' (executemany)' if executemany else '', statement, parameters)
+
+
+@contextmanager
+def timed_serialization():
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+
+
+def server_timing(metrics):
+    total = time.perf_counter() - metrics.start
+    return (f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.statements} statements", '
+            f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}')
+
+
+def init_app(app):
+    """
+    Collects statement count, time spent in database, in serialization and in whole request.
+    They are sent in Server-Timing header, statements slower than SLOW_QUERY_THRESHOLD_MS are logged.
+    With SQLALCHEMY_QUERY_BUDGET set, request that issues more statements fails,
+    so N+1 regressions show up in tests instead of production.
+    Metrics of requests run by a batch are added to the batch ones, it has the budget of every request it ran.
+    """
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = RequestMetrics(g.get('request_metrics') if g.get('nested_request') else None)
+
+    @app.after_request
+    def finish_request_metrics(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        if metrics.parent is not None:
+            metrics.parent.add(metrics)
+
+        budget = app.config.get('SQLALCHEMY_QUERY_BUDGET')
+        if budget is not None:
+            budget *= metrics.requests
+        if budget is not None and metrics.statements > budget:
+            raise QueryBudgetExceeded(f'{request.method} {request.full_path} issued {metrics.statements} '
+                                      f'SQL statements, budget is {budget}')
+        if app.config['SERVER_TIMING_ENABLED']:
+            response.headers['Server-Timing'] = server_timing(metrics)
+        return response
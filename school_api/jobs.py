@@ -0,0 +1,162 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.exceptions import HTTPException, InternalServerError
+from .models import JobModel, db
+from .services import services
+
+log = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+def _merge_reports(merged, report):
+    if merged is None:
+        return report
+    return {key: sorted(merged[key] + value) if isinstance(value, list) else merged[key] + value
+            for key, value in report.items()}
+
+
+def _run_service(service, *arguments):
+    """
+    Report of service run in a savepoint, commit of the service only releases it,
+    so its work is committed together with progress and result of the job.
+    """
+    # flush of the changed heartbeat begins the transaction, pysqlite commits a savepoint outside of one
+    db.session.begin_nested()
+    try:
+        return service(*arguments)
+    except Exception:
+        # savepoint, the runner rolls back the transaction
+        db.session.rollback()
+        raise
+
+
+def _chunked(service):
+    """
+    Job running service for owner and its ids in chunks of JOB_CHUNK_SIZE ids, reports of chunks are merged.
+    """
+    def run(job, owner_id, ids):
+        chunk_size = current_app.config['JOB_CHUNK_SIZE']
+        while job.progress < len(ids):
+            chunk = ids[job.progress:job.progress + chunk_size]
+            job.progress += len(chunk)
+            job.heartbeat_at = datetime.utcnow()
+            report = _run_service(service, owner_id, chunk)
+            job.result = _merge_reports(job.result, report)
+            # chunk, progress and merged result in one transaction
+            db.session.commit()
+
+    return run
+
+
+def _single(service):
+    """
+    Job running service once, in one transaction.
+    """
+    def run(job, *arguments):
+        job.progress = job.total
+        job.heartbeat_at = datetime.utcnow()
+        job.result = _run_service(service, *arguments)
+        db.session.commit()
+
+    return run
+
+
+OPERATIONS = {
+    'add_students_to_group': _chunked(services.add_students_to_group),
+    'remove_students_from_group': _chunked(services.remove_students_from_group),
+    'transfer_group_students': _single(services.transfer_group_students),
+    'add_students_to_course': _chunked(services.add_students_to_course),
+    # removals fail on the first id not enrolled, all of them are removed at once or none
+    'remove_students_from_course': _single(services.remove_students_from_course),
+    'add_courses_to_student': _chunked(services.add_courses_to_student),
+    'remove_courses_from_student': _single(services.remove_courses_from_student),
+}
+
+
+class JobQueue:
+    """
+    Runs operations of OPERATIONS in background by bounded pool of JOB_WORKERS threads,
+    each job in its own app context and session. Jobs are rows of job table: queued jobs
+    and running jobs without heartbeat for JOB_STALE_AFTER seconds are picked up again
+    by the first request after start of a worker, chunked jobs continue after their last chunk.
+    """
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config['JOB_WORKERS']:
+            self.executor = ThreadPoolExecutor(app.config['JOB_WORKERS'], thread_name_prefix='job')
+            app.before_first_request(self.resume)
+        app.extensions['job_queue'] = self
+
+    def submit(self, operation, arguments, total):
+        if operation not in OPERATIONS:
+            raise ValueError(f'unknown job operation {operation}')
+        job = JobModel(operation=operation, arguments=arguments, total=total, status=QUEUED,
+                       created_at=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+
+        if self.executor is None:
+            self.run(job.id)
+        else:
+            self.executor.submit(self.run_in_context, job.id)
+        return job
+
+    def resume(self):
+        if not db.engine.dialect.has_table(db.session.connection(), JobModel.__tablename__):
+            return
+
+        stale = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_STALE_AFTER'])
+        # other jobs of the table, like imports, are resumed by their own commands
+        jobs = JobModel.query.filter(JobModel.operation.in_(OPERATIONS))
+        (jobs
+         .filter(JobModel.status == RUNNING, db.func.coalesce(JobModel.heartbeat_at, JobModel.started_at) < stale)
+         .update({JobModel.status: QUEUED}, synchronize_session=False))
+        db.session.commit()
+        for job_id, in jobs.filter(JobModel.status == QUEUED).with_entities(JobModel.id).order_by(JobModel.id):
+            self.executor.submit(self.run_in_context, job_id)
+
+    def run_in_context(self, job_id):
+        with self.app.app_context():
+            self.run(job_id)
+
+    def run(self, job_id):
+        now = datetime.utcnow()
+        # only one worker claims queued job
+        claimed = (JobModel.query
+                   .filter(JobModel.id == job_id, JobModel.status == QUEUED)
+                   .update({JobModel.status: RUNNING, JobModel.started_at: now, JobModel.heartbeat_at: now},
+                           synchronize_session=False))
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = JobModel.query.get(job_id)
+        try:
+            OPERATIONS[job.operation](job, *job.arguments)
+            job.status = SUCCEEDED
+        except Exception as error:
+            db.session.rollback()
+            if not isinstance(error, HTTPException):
+                log.exception('job %s %s failed', job_id, job.operation)
+                error = InternalServerError()
+            job = JobModel.query.get(job_id)
+            job.status = FAILED
+            job.error = {'status': error.code, 'message': error.description}
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
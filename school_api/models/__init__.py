@@ -1 +1 @@
-from .models import GroupModel, StudentModel, CourseModel, student_course, db
+from .models import GroupModel, StudentModel, CourseModel, DataVersionModel, JobModel, student_course, db
@@ -1,11 +1,20 @@
-from flask_sqlalchemy import SQLAlchemy
+import logging
+import sqlite3
+from datetime import datetime
+from sqlalchemy import DDL, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from ..routing import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+log = logging.getLogger(__name__)
 
-# todo unique combination student_id course_id
+db = RoutingSQLAlchemy()
+
+# primary key serves lookups of student courses, course_id index serves course rosters
 student_course = db.Table('student_model',
-                          db.Column('student_id', db.Integer, db.ForeignKey('student.id')),
-                          db.Column('course_id', db.Integer, db.ForeignKey('course.id')))
+                          db.Column('student_id', db.Integer, db.ForeignKey('student.id'), primary_key=True),
+                          db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True),
+                          db.Index('ix_student_model_course_id_student_id', 'course_id', 'student_id'))
 
 
 class CourseModel(db.Model):
@@ -26,6 +35,8 @@ class GroupModel(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(), unique=True, nullable=False)
+    # maintained by every service that changes membership, max_students filter is a range scan of its index
+    student_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     students = db.relationship('StudentModel', backref='group')
 
@@ -40,8 +51,149 @@ class StudentModel(db.Model):
     first_name = db.Column(db.String())
     last_name = db.Column(db.String())
 
-    group_id = db.Column(db.Integer, db.ForeignKey('group.id'),  nullable=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'),  nullable=True, index=True)
+    # also set by services that change enrollments or group name of the student, incremental export reads it
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           index=True)
     courses = db.relationship('CourseModel',  secondary=student_course)
 
     def __repr__(self):
         return f'first name: {self.first_name}, last name: {self.last_name}'
+
+
+# name search of services/search.py: on SQLite external content FTS5 trigram table kept by triggers
+# and indexes of lowercased columns for prefixes too short for trigrams,
+# on PostgreSQL trigram GIN indexes of lowercased columns serving both.
+# Trigram structures are created only where the database can have them, search matches prefixes without them
+SEARCHED_COLUMNS = {StudentModel.__table__: ('first_name', 'last_name'),
+                    GroupModel.__table__: ('name',),
+                    CourseModel.__table__: ('name',)}
+
+
+def unicode_lower(value):
+    # search words are lowercased by str.lower, lower() of SQLite folds ASCII letters only
+    return value.lower() if isinstance(value, str) else value
+
+
+@event.listens_for(Engine, 'connect')
+def register_unicode_lower(dbapi_connection, connection_record):
+    """
+    Replaces lower() of every SQLite connection, so lowercased expression indexes match search words of any script.
+    Index entries written by a connection without it, e.g. of sqlite3 shell, fold ASCII only, upgradetables fixes them.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('lower', 1, unicode_lower, deterministic=True)
+
+
+def _sqlite_trigrams():
+    """
+    Whether SQLite library has FTS5 with trigram tokenizer, it is in SQLite 3.34 and later.
+    """
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute("CREATE VIRTUAL TABLE probe USING fts5(name, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+# the same library serves connections of the sync and the async app
+SQLITE_TRIGRAMS = _sqlite_trigrams()
+
+
+def _with_sqlite_trigrams(ddl, target, bind, **kw):
+    return SQLITE_TRIGRAMS
+
+
+def _with_pg_trgm(ddl, target, bind, **kw):
+    """
+    Whether pg_trgm is installed, it is created when the role may, e.g. superuser or owner of database
+    on PostgreSQL 13 and later. Without it substrings are matched by scanning names.
+    """
+    if bind.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first():
+        return True
+    savepoint = bind.begin_nested()
+    try:
+        bind.execute('CREATE EXTENSION pg_trgm')
+    except DBAPIError as error:
+        savepoint.rollback()
+        log.warning('trigram index of %s is not created, pg_trgm extension is missing: %s', target.name, error.orig)
+        return False
+    savepoint.commit()
+    return True
+
+
+def search_ddl(table, columns):
+    """
+    Statements creating search structures of table, every one runs on its dialect only. Safe to run repeatedly,
+    the FTS table is rebuilt from the table, so it also serves tables created before search.
+    Trigram ones run when SQLite has trigram tokenizer and when pg_trgm is or can be installed on PostgreSQL.
+    """
+    name, search = f'"{table.name}"', f'"{table.name}_search"'
+    listed = ', '.join(columns)
+    new, old = ', '.join(f'new.{column}' for column in columns), ', '.join(f'old.{column}' for column in columns)
+    delete = f"INSERT INTO {search}({search}, rowid, {listed}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {search}(rowid, {listed}) VALUES (new.id, {new});'
+    trigrams = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {search} USING fts5({listed}, content='{table.name}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS "{table.name}_search_insert" AFTER INSERT ON {name} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table.name}_search_delete" AFTER DELETE ON {name} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table.name}_search_update" AFTER UPDATE OF {listed} ON {name} '
+        f'BEGIN {delete} {insert} END',
+        f"INSERT INTO {search}({search}) VALUES ('rebuild')",
+    ]
+    sqlite = [
+        *(f'CREATE INDEX IF NOT EXISTS "ix_{table.name}_lower_{column}" ON {name} (lower({column}))'
+          for column in columns),
+        # indexes created before lower() was replaced hold ASCII-only lowercased names
+        *(f'REINDEX "ix_{table.name}_lower_{column}"' for column in columns),
+    ]
+    postgresql = [f'CREATE INDEX IF NOT EXISTS "ix_{table.name}_lower_{column}" ON {name} '
+                  f'((lower({column}) COLLATE "C"))' for column in columns]
+    trgm = [f'CREATE INDEX IF NOT EXISTS "ix_{table.name}_{column}_trgm" ON {name} '
+            f'USING gin (lower({column}) gin_trgm_ops)' for column in columns]
+    return ([DDL(statement).execute_if(dialect='sqlite', callable_=_with_sqlite_trigrams) for statement in trigrams] +
+            [DDL(statement).execute_if(dialect='sqlite') for statement in sqlite] +
+            [DDL(statement).execute_if(dialect='postgresql') for statement in postgresql] +
+            [DDL(statement).execute_if(dialect='postgresql', callable_=_with_pg_trgm) for statement in trgm])
+
+
+for searched_table, searched_columns in SEARCHED_COLUMNS.items():
+    for ddl in search_ddl(searched_table, searched_columns):
+        event.listen(searched_table, 'after_create', ddl)
+    event.listen(searched_table, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS "{searched_table.name}_search"').execute_if(dialect='sqlite'))
+
+
+class DataVersionModel(db.Model):
+    __tablename__ = 'data_version'
+
+    name = db.Column(db.String(), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f'{self.name} version: {self.version}'
+
+
+class JobModel(db.Model):
+    __tablename__ = 'job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    operation = db.Column(db.String(), nullable=False)
+    arguments = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(), nullable=False, default='queued', index=True)
+    # items done, committed in transaction of their work, so resumed job continues after them
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False)
+    result = db.Column(db.JSON)
+    error = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'job {self.id} {self.operation}: {self.status}'
@@ -0,0 +1,72 @@
+import threading
+import time
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class MeasuredQueuePool(QueuePool):
+    """
+    QueuePool that counts checkouts, timeouts and time callers waited for connection,
+    new connections opened within checkout are part of the wait.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+
+def engine_options(config):
+    """
+    Engine options of pool settings from config.
+    SQLite connections are cheap to open and in-memory database needs its single connection,
+    so only pre-ping and recycle apply to it.
+    """
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING'],
+               'pool_recycle': config['DB_POOL_RECYCLE']}
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        options.update(poolclass=MeasuredQueuePool,
+                       pool_size=config['DB_POOL_SIZE'],
+                       max_overflow=config['DB_MAX_OVERFLOW'],
+                       pool_timeout=config['DB_POOL_TIMEOUT'])
+    return options
+
+
+def pool_stats(engine, replicas=()):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(),
+                     checked_in=pool.checkedin(),
+                     checked_out=pool.checkedout(),
+                     overflow=pool.overflow(),
+                     max_overflow=pool._max_overflow,
+                     timeout=pool.timeout())
+    if isinstance(pool, MeasuredQueuePool):
+        with pool._stats_lock:
+            stats.update(checkouts=pool.checkouts,
+                         timeouts=pool.timeouts,
+                         wait_total_ms=round(pool.wait_total * 1000, 3),
+                         wait_avg_ms=round(pool.wait_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0,
+                         wait_max_ms=round(pool.wait_max * 1000, 3))
+    if replicas:
+        stats['replicas'] = [pool_stats(replica) for replica in replicas]
+    return stats
@@ -1,22 +1,46 @@
 from flask import Blueprint
 from flask_restful import Api
-from .group import Groups, Group, StudentsByGroup
+from flask_restful.representations.json import output_json
+from school_api.instrumentation import timed_serialization
+from .group import Groups, Group, StudentsByGroup, TransferStudentsByGroup
 from .student import Students, Student, CoursesByStudent
 from .course import Courses, Course, StudentsByCourse
+from .export import StudentsExport
+from .stats import Stats
+from .job import Job
+from .internal import CacheStats, PoolStats
+from .batch import Batch
 
 
 api_bp = Blueprint('api_v1', __name__)
 api = Api(api_bp)
 
 
+@api.representation('application/json')
+def timed_output_json(data, code, headers=None):
+    with timed_serialization():
+        return output_json(data, code, headers)
+
+
 api.add_resource(Groups, '/groups')
 api.add_resource(Group, '/groups/<group_id>')
 api.add_resource(StudentsByGroup, '/groups/<group_id>/students')
+api.add_resource(TransferStudentsByGroup, '/groups/<group_id>/students/transfer')
 
 api.add_resource(Students, '/students')
+api.add_resource(StudentsExport, '/students/export')
 api.add_resource(Student, '/students/<student_id>')
 api.add_resource(CoursesByStudent, '/students/<student_id>/courses')
 
 api.add_resource(Courses, '/courses')
 api.add_resource(Course, '/courses/<course_id>')
 api.add_resource(StudentsByCourse, '/courses/<course_id>/students')
+
+api.add_resource(Stats, '/stats')
+
+api.add_resource(Job, '/jobs/<job_id>')
+
+api.add_resource(Batch, '/batch')
+
+api.add_resource(CacheStats, '/internal/cache')
+api.add_resource(PoolStats, '/internal/pool')
@@ -0,0 +1,73 @@
+from flask import abort, request
+from flask_restful import Resource
+from school_api.batch import run_batch
+
+
+class Batch(Resource):
+    def post(self):
+        """
+        Run several requests at once
+        ---
+        tags:
+            - Batch
+        description: "Requests to other routes of API v1 run one by one in this request, sharing its database session.
+            With transaction true their changes are committed together, the first failed request rolls back all"
+        consumes:
+            - application/json
+        parameters:
+          - name: "batch"
+            in: "body"
+            required: true
+            schema:
+              type: "object"
+              properties:
+                requests:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      method:
+                        type: string
+                        enum: ["GET", "POST", "PUT", "DELETE"]
+                        default: "GET"
+                      path:
+                        type: string
+                        description: "Path with query string, e.g. /api/v1/groups/1/students?fields=id"
+                      headers:
+                        type: object
+                        description: "Request headers, e.g. If-None-Match"
+                      body:
+                        type: object
+                        description: "JSON body"
+                transaction:
+                  type: boolean
+                  default: false
+        responses:
+          200:
+            description: results in order of requests
+            schema:
+              type: array
+              items:
+                type: object
+                properties:
+                  status:
+                    type: integer
+                  headers:
+                    type: object
+                  body:
+                    type: object
+          400:
+            description: Invalid requests, or failed request of transaction, errors are by index of request
+          413:
+            description: More requests than BATCH_MAX_REQUESTS
+        produces:
+            - application/json
+        """
+        req = request.get_json()
+        if not isinstance(req, dict):
+            abort(400, 'object with list of requests expected')
+        transaction = req.get('transaction', False)
+        if not isinstance(transaction, bool):
+            abort(400, 'transaction must be boolean')
+
+        return run_batch(req.get('requests'), atomic=transaction)
@@ -2,11 +2,20 @@ from flask import abort, request
 from flask_restful import Resource
 from school_api.models import GroupModel, StudentModel, CourseModel, student_course, db
 from school_api.services.services import *
+from school_api.services.pagination import ordering
+from school_api.services.search import search_query, search_page
+from school_api.services.loading import eager_options
+from school_api.cache import cached
+from school_api.streaming import streaming_requested, stream_collection
+from .parser import collection_parser, page_limit, next_page_headers, requested_fields, respond_async_requested
+from .job import submit_ids_job
 from ...schema.school_schema import GroupSchema, StudentSchema, CourseSchema
+from ...schema.serializer import serializer
 from sqlalchemy.orm.exc import FlushError
 
 
 class Courses(Resource):
+    @cached('courses', 'enrollments')
     def get(self):
         """
         All courses
@@ -14,9 +23,35 @@ class Courses(Resource):
         tags:
             - Courses
         description: "Returns all courses"
+        parameters:
+          - name: "q"
+            in: query
+            description: "Case-insensitive search of course names, every word matches start
+                          of a name or, from 3 characters, any part of it. Ranked, exact matches first"
+            type: "string"
+          - name: "limit"
+            in: query
+            description: "Maximum number of items in response page"
+            type: "integer"
+          - name: "after"
+            in: query
+            description: "Opaque cursor of the page, taken from the Link header of the previous response"
+            type: "string"
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: all courses
+            headers:
+              Link:
+                type: string
+                description: "URL of the next page with rel=next, absent on the last page"
             schema:
               type: array
               items:
@@ -24,10 +59,21 @@ class Courses(Resource):
         produces:
             - application/json
         """
-        courses = GroupModel.query.all()
-        courses = CourseSchema().dump(courses, many=True)
+        parser = collection_parser()
+        parser.add_argument('q', type=str)
+        args = parser.parse_args()
+        fields = requested_fields(CourseSchema)
+
+        query = CourseModel.query.options(*eager_options(CourseSchema, fields))
+
+        if streaming_requested():
+            query, rank = search_query(query, CourseModel, args['q'])
+            return stream_collection(query.order_by(*ordering(rank, CourseModel.id)), CourseSchema, fields)
+
+        courses, next_cursor = search_page(query, CourseModel, args['q'], page_limit(args['limit']), args['after'])
+        courses = serializer(CourseSchema, fields).dump(courses, many=True)
 
-        return courses
+        return courses, 200, next_page_headers(next_cursor)
 
     def post(self):
         """
@@ -35,7 +81,8 @@ class Courses(Resource):
         ---
         tags:
             - Courses
-        description: "Add new course to database"
+        description: "Add new course to database.
+            Array of courses is created in one transaction, response is array of created courses"
         consumes:
           - application/json
         parameters:
@@ -63,22 +110,29 @@ class Courses(Resource):
             schema:
               $ref: "#/definitions/course"
           400:
-            description:  Invalid input
+            description:  Invalid input, for array contains errors of every invalid item by its index
+          413:
+            description: Array is longer than BULK_CREATE_MAX_ITEMS
         produces:
             - application/json
         """
         req = request.get_json()
+        if isinstance(req, list):
+            courses = add_courses(req)
+            return serializer(CourseSchema).dump(courses, many=True), 201
+
         name = req.get('course_name')
         description = req.get('description')
         if name is None:
             abort(400)
         course = add_course(name, description)
-        course = CourseSchema().dump(course)
+        course = serializer(CourseSchema).dump(course)
 
         return course, 201
 
 
 class Course(Resource):
+    @cached('courses', 'enrollments')
     def get(self, course_id):
         """
         Get course by id
@@ -91,6 +145,10 @@ class Course(Resource):
             in: "path"
             description: "ID of course to return"
             required: true
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: course
@@ -101,8 +159,9 @@ class Course(Resource):
         produces:
             - application/json
         """
-        course = CourseModel.query.get_or_404(course_id)
-        course = CourseSchema().dump(course)
+        fields = requested_fields(CourseSchema)
+        course = CourseModel.query.options(*eager_options(CourseSchema, fields)).get_or_404(course_id)
+        course = serializer(CourseSchema, fields).dump(course)
 
         return course
 
@@ -155,7 +214,7 @@ class Course(Resource):
         description = req.get('description')
 
         course = edit_course(course_id, name, description)
-        course = CourseSchema().dump(course)
+        course = serializer(CourseSchema).dump(course)
 
         return course
 
@@ -183,6 +242,7 @@ class Course(Resource):
 
 
 class StudentsByCourse (Resource):
+    @cached('students', 'enrollments')
     def get(self, course_id):
         """
         All students on course
@@ -195,6 +255,14 @@ class StudentsByCourse (Resource):
             in: "path"
             description: "ID of course"
             required: true
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: students
@@ -207,11 +275,16 @@ class StudentsByCourse (Resource):
         produces:
             - application/json
         """
+        fields = requested_fields(StudentSchema)
         main_query = (db.session.query(StudentModel)
+                      .options(*eager_options(StudentSchema, fields))
                       .join(StudentModel.courses)
                       .filter(CourseModel.id == course_id))
+        if streaming_requested():
+            return stream_collection(main_query.order_by(StudentModel.id), StudentSchema, fields)
+
         students = main_query.all()
-        students = StudentSchema().dump(students, many=True)
+        students = serializer(StudentSchema, fields).dump(students, many=True)
         return students
 
     def post(self, course_id):
@@ -236,31 +309,46 @@ class StudentsByCourse (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
-          200:
-            description: students
+          201:
+            description: "ids of enrolled students, unknown ids and ids of students already on course"
             schema:
-              type: array
-              items:
-                $ref: "#/definitions/student"
+              type: object
+              properties:
+                added:
+                  type: array
+                  items: integer
+                unknown:
+                  type: array
+                  items: integer
+                already_enrolled:
+                  type: array
+                  items: integer
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
+          400:
+            description: bad request
           404:
             description: course does not exist
-          500:
-            description: bad request
         consumes:
             - application/json
+        produces:
+            - application/json
         """
         req = request.get_json(force=True)
         students = req.get('students')
-        course = CourseModel.query.get_or_404(course_id)
-        for student_id in students:
-            try:
-                course.students.append(StudentModel.query.get_or_404(student_id))
-            except FlushError:
-                abort(400, f'student with id={student_id} does not exist')
-        db.session.commit()
+        if respond_async_requested():
+            return submit_ids_job('add_students_to_course', CourseModel, course_id, students, 'students')
 
-        return None, 201
+        report = add_students_to_course(course_id, students)
+
+        return report, 201
 
     def delete(self, course_id):
         """
@@ -284,9 +372,17 @@ class StudentsByCourse (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
           200:
             description: students
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
           404:
             description: course does not exist
           500:
@@ -296,12 +392,10 @@ class StudentsByCourse (Resource):
         """
         req = request.get_json()
         students = req.get('students')
-        course = CourseModel.query.get_or_404(course_id)
-        for student_id in students:
-            try:
-                course.students.remove(StudentModel.query.get_or_404(student_id))
-            except ValueError:
-                abort(400, f'student with id={student_id} does not exist')
-        db.session.commit()
+        if respond_async_requested():
+            return submit_ids_job('remove_students_from_course', CourseModel, course_id, students, 'students',
+                                  check=check_students_on_course)
+
+        remove_students_from_course(course_id, students)
 
         return None, 204
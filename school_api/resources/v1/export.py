@@ -0,0 +1,50 @@
+from flask import abort, current_app, request, stream_with_context
+from flask_restful import Resource
+from school_api.exporter import EXPORT_FORMATS, MEDIA_TYPES, export_chunks, parse_since
+
+
+class StudentsExport(Resource):
+    def get(self):
+        """
+        Export all students with group name and course ids
+        ---
+        tags:
+            - Students
+        description: "Streams every student as NDJSON line or CSV row, students changed since given time
+                      when since is set. Deleted students are not part of the export"
+        parameters:
+          - name: "format"
+            in: query
+            description: "ndjson or csv, by default csv when text/csv is accepted, ndjson otherwise"
+            type: "string"
+            enum: ["ndjson", "csv"]
+          - name: "since"
+            in: query
+            description: "ISO 8601 time, only students created or changed at or after it, UTC when without zone"
+            type: "string"
+        responses:
+          200:
+            description: students, CSV course ids are separated by spaces
+            schema:
+              type: array
+              items:
+                $ref: "#/definitions/student_export"
+          400:
+            description: unknown format or invalid since
+        produces:
+            - application/x-ndjson
+            - text/csv
+        """
+        file_format = request.args.get('format')
+        if file_format is None:
+            best = request.accept_mimetypes.best_match([MEDIA_TYPES['ndjson'], MEDIA_TYPES['csv']])
+            file_format = 'csv' if best == MEDIA_TYPES['csv'] else 'ndjson'
+        if file_format not in EXPORT_FORMATS:
+            abort(400, f'format must be one of {", ".join(EXPORT_FORMATS)}')
+        try:
+            since = parse_since(request.args.get('since'))
+        except ValueError:
+            abort(400, 'since must be ISO 8601 date or time, e.g. 2020-11-30T22:00:00')
+
+        chunks = export_chunks(file_format, since, current_app.config['STREAM_CHUNK_SIZE'])
+        return current_app.response_class(stream_with_context(chunks), mimetype=MEDIA_TYPES[file_format])
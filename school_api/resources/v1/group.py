@@ -1,12 +1,21 @@
 from flask import abort, request
-from flask_restful import Resource, reqparse
+from flask_restful import Resource
 from school_api.models import GroupModel, StudentModel, CourseModel, student_course, db
 from school_api.services.services import *
+from school_api.services.pagination import ordering
+from school_api.services.search import search_query, search_page
+from school_api.services.loading import eager_options
+from school_api.cache import cached
+from school_api.streaming import streaming_requested, stream_collection
+from .parser import collection_parser, page_limit, next_page_headers, requested_fields, respond_async_requested
+from .job import submit_job, submit_ids_job
 from ...schema.school_schema import GroupSchema, StudentSchema, CourseSchema
+from ...schema.serializer import serializer
 from sqlalchemy.orm.exc import FlushError
 
 
 class Groups(Resource):
+    @cached('groups', 'students')
     def get(self):
         """
         All groups
@@ -15,13 +24,38 @@ class Groups(Resource):
             - Groups
         description: "Returns all groups"
         parameters:
+          - name: "q"
+            in: query
+            description: "Case-insensitive search of group names, every word matches start
+                          of a name or, from 3 characters, any part of it. Ranked, exact matches first"
+            type: "string"
           - name: "max_students"
             in: query
             description: "Response will contain only groups with less or equal students"
             type: "integer"
+          - name: "limit"
+            in: query
+            description: "Maximum number of items in response page"
+            type: "integer"
+          - name: "after"
+            in: query
+            description: "Opaque cursor of the page, taken from the Link header of the previous response"
+            type: "string"
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: all groups
+            headers:
+              Link:
+                type: string
+                description: "URL of the next page with rel=next, absent on the last page"
             schema:
               type: array
               items:
@@ -29,20 +63,28 @@ class Groups(Resource):
         produces:
             - application/json
         """
-        parser = reqparse.RequestParser()
+        parser = collection_parser()
         parser.add_argument('max_students', type=int)
+        parser.add_argument('q', type=str)
 
         args = parser.parse_args()
         max_students = args['max_students']
+        fields = requested_fields(GroupSchema)
 
-        if max_students:
-            groups = select_group_with_less_students(max_students)
+        if max_students is not None:
+            query = query_group_with_less_students(max_students, fields)
         else:
-            groups = GroupModel.query.all()
+            query = GroupModel.query.options(*eager_options(GroupSchema, fields))
 
-        groups = GroupSchema().dump(groups, many=True)
+        if streaming_requested():
+            query, rank = search_query(query, GroupModel, args['q'])
+            return stream_collection(query.order_by(*ordering(rank, GroupModel.id)), GroupSchema, fields)
 
-        return groups
+        groups, next_cursor = search_page(query, GroupModel, args['q'], page_limit(args['limit']), args['after'],
+                                          indexed=max_students is None)
+        groups = serializer(GroupSchema, fields).dump(groups, many=True)
+
+        return groups, 200, next_page_headers(next_cursor)
 
     def post(self):
         """
@@ -50,7 +92,8 @@ class Groups(Resource):
         ---
         tags:
             - Groups
-        description: "Add new group to database"
+        description: "Add new group to database.
+            Array of groups is created in one transaction, response is array of created groups"
         consumes:
             - application/json
         parameters:
@@ -69,20 +112,27 @@ class Groups(Resource):
             schema:
               $ref: "#/definitions/group"
           400:
-            description:  Invalid input
+            description:  Invalid input, for array contains errors of every invalid item by its index
+          413:
+            description: Array is longer than BULK_CREATE_MAX_ITEMS
         produces:
             - application/json
         """
         req = request.get_json(force=True)
+        if isinstance(req, list):
+            groups = add_groups(req)
+            return serializer(GroupSchema).dump(groups, many=True), 201
+
         name = req.get('group_name')
 
         group = add_group(name)
-        group = GroupSchema().dump(group)
+        group = serializer(GroupSchema).dump(group)
 
         return group, 201
 
 
 class Group(Resource):
+    @cached('groups', 'students')
     def get(self, group_id):
         """
         Get group by id
@@ -95,6 +145,10 @@ class Group(Resource):
             in: "path"
             description: "ID of group to return"
             required: true
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: group data
@@ -105,8 +159,9 @@ class Group(Resource):
         produces:
             - application/json
         """
-        group = GroupModel.query.get_or_404(group_id)
-        group = GroupSchema().dump(group)
+        fields = requested_fields(GroupSchema)
+        group = GroupModel.query.options(*eager_options(GroupSchema, fields)).get_or_404(group_id)
+        group = serializer(GroupSchema, fields).dump(group)
 
         return group
 
@@ -149,7 +204,7 @@ class Group(Resource):
         name = req.get('group_name')
 
         group = edit_group(group_id, name)
-        group = GroupSchema().dump(group)
+        group = serializer(GroupSchema).dump(group)
 
         return group
 
@@ -177,6 +232,7 @@ class Group(Resource):
 
 
 class StudentsByGroup (Resource):
+    @cached('groups', 'students', 'enrollments')
     def get(self, group_id):
         """
         All students in group
@@ -189,6 +245,14 @@ class StudentsByGroup (Resource):
             in: "path"
             description: "ID of course"
             required: true
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: students in group
@@ -201,12 +265,17 @@ class StudentsByGroup (Resource):
         produces:
             - application/json
         """
+        fields = requested_fields(StudentSchema)
         main_query = (db.session.query(StudentModel)
+                      .options(*eager_options(StudentSchema, fields))
                       .join(StudentModel.group)
                       .filter(GroupModel.id == group_id))
+        if streaming_requested():
+            return stream_collection(main_query.order_by(StudentModel.id), StudentSchema, fields)
+
         students = main_query.all()
 
-        students = StudentSchema().dump(students, many=True)
+        students = serializer(StudentSchema, fields).dump(students, many=True)
 
         return students
 
@@ -216,10 +285,11 @@ class StudentsByGroup (Resource):
         ---
         tags:
             - Groups
+        description: "Moves students to group with single update, students from other groups are moved too"
         parameters:
           - name: "group_id"
             in: "path"
-            description: "ID of course"
+            description: "ID of group"
             required: true
           - name: "students"
             in: "body"
@@ -232,17 +302,33 @@ class StudentsByGroup (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
-          200:
-            description: students in group
+          201:
+            description: "ids of added students, unknown ids and ids of students already in group"
             schema:
-              type: array
-              items:
-                $ref: "#/definitions/student"
+              type: object
+              properties:
+                added:
+                  type: array
+                  items: integer
+                unknown:
+                  type: array
+                  items: integer
+                already_in_group:
+                  type: array
+                  items: integer
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
+          400:
+            description: bad request
           404:
             description: group does not exist
-          500:
-            description: bad request
         consumes:
             - application/json
         produces:
@@ -250,13 +336,12 @@ class StudentsByGroup (Resource):
         """
         req = request.get_json()
         students = req.get('students')
-        group = GroupModel.query.get_or_404(group_id)
-        # todo validate students ids
-        for student_id in students:
-            group.students.append(StudentModel.query.get_or_404(student_id))
-        db.session.commit()
+        if respond_async_requested():
+            return submit_ids_job('add_students_to_group', GroupModel, group_id, students, 'students')
+
+        report = add_students_to_group(group_id, students)
 
-        return None, 201
+        return report, 201
 
     def delete(self, group_id):
         """
@@ -280,25 +365,103 @@ class StudentsByGroup (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
           200:
-            description: students ware deleted from group
+            description: "ids of removed students, unknown ids and ids of students that are not in group"
+            schema:
+              type: object
+              properties:
+                removed:
+                  type: array
+                  items: integer
+                unknown:
+                  type: array
+                  items: integer
+                not_in_group:
+                  type: array
+                  items: integer
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
+          400:
+            description: bad request
           404:
             description: group does not exist
-          500:
-            description: bad request
         consumes:
             - application/json
+        produces:
+            - application/json
         """
         req = request.get_json()
         students = req.get('students')
+        if respond_async_requested():
+            return submit_ids_job('remove_students_from_group', GroupModel, group_id, students, 'students')
+
+        report = remove_students_from_group(group_id, students)
+
+        return report
+
+
+class TransferStudentsByGroup (Resource):
+    def post(self, group_id):
+        """
+        Transfer all students of group to another group
+        ---
+        tags:
+            - Groups
+        parameters:
+          - name: "group_id"
+            in: "path"
+            description: "ID of group students are transferred from"
+            required: true
+          - name: "to_group_id"
+            in: "body"
+            description: "ID of group students are transferred to"
+            required: true
+            schema:
+              type: "object"
+              properties:
+                to_group_id:
+                  type: integer
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
+        responses:
+          200:
+            description: number of transferred students
+            schema:
+              type: object
+              properties:
+                moved:
+                  type: integer
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
+          400:
+            description: bad request
+          404:
+            description: group does not exist
+        consumes:
+            - application/json
+        produces:
+            - application/json
+        """
+        req = request.get_json(force=True)
+        to_group_id = req.get('to_group_id')
+        # JSON true and false are ints in Python
+        if not isinstance(to_group_id, int) or isinstance(to_group_id, bool):
+            abort(400, 'to_group_id must be integer')
+        if respond_async_requested():
+            group_id = GroupModel.query.get_or_404(group_id).id
+            return submit_job('transfer_group_students', [group_id, to_group_id], 1)
 
-        group = GroupModel.query.get_or_404(group_id)
-        for student_id in students:
-            try:
-                group.students.remove(StudentModel.query.get_or_404(student_id))
-            except ValueError:
-                abort(400, f'student with id={student_id} is not in group')
-        db.session.commit()
+        report = transfer_group_students(group_id, to_group_id)
 
-        return None
+        return report
@@ -0,0 +1,100 @@
+from functools import wraps
+from flask import abort, current_app
+from flask_restful import Resource
+from school_api.models import db
+from school_api.pool import pool_stats
+
+
+def internal_only(function):
+    """
+    Serves decorated handler only with INTERNAL_ENDPOINTS_ENABLED, otherwise the route does not exist for clients.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not current_app.config['INTERNAL_ENDPOINTS_ENABLED']:
+            abort(404)
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+class CacheStats(Resource):
+    @internal_only
+    def get(self):
+        """
+        Response cache statistics
+        ---
+        tags:
+            - Internal
+        description: "Hit and miss counters of in-process response cache of this worker"
+        responses:
+          200:
+            description: cache statistics
+            schema:
+              type: object
+              properties:
+                hits:
+                  type: integer
+                misses:
+                  type: integer
+                size:
+                  type: integer
+                max_size:
+                  type: integer
+                ttl:
+                  type: number
+        produces:
+            - application/json
+        """
+        return current_app.extensions['response_cache'].stats()
+
+
+class PoolStats(Resource):
+    @internal_only
+    def get(self):
+        """
+        Database connection pool statistics
+        ---
+        tags:
+            - Internal
+        description: "Connections of pool of this worker and time requests waited to check one out"
+        responses:
+          200:
+            description: pool statistics, size and wait fields are present for queue pool only
+            schema:
+              type: object
+              properties:
+                pool:
+                  type: string
+                size:
+                  type: integer
+                checked_in:
+                  type: integer
+                checked_out:
+                  type: integer
+                overflow:
+                  type: integer
+                max_overflow:
+                  type: integer
+                timeout:
+                  type: number
+                checkouts:
+                  type: integer
+                timeouts:
+                  type: integer
+                wait_total_ms:
+                  type: number
+                wait_avg_ms:
+                  type: number
+                wait_max_ms:
+                  type: number
+                replicas:
+                  type: array
+                  description: the same statistics of every replica pool
+                  items:
+                    type: object
+        produces:
+            - application/json
+        """
+        replicas = current_app.extensions.get('db_replicas')
+        return pool_stats(db.engine, replicas.engines if replicas is not None else ())
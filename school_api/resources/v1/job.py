@@ -0,0 +1,51 @@
+from flask import current_app, url_for
+from flask_restful import Resource
+from school_api.models import JobModel
+from school_api.services.services import validate_ids
+from ...schema.school_schema import JobSchema
+from ...schema.serializer import serializer
+
+
+def submit_job(operation, arguments, total):
+    job = current_app.extensions['job_queue'].submit(operation, arguments, total)
+    return (serializer(JobSchema).dump(job), 202,
+            {'Location': url_for('api_v1.job', job_id=job.id), 'Preference-Applied': 'respond-async'})
+
+
+def submit_ids_job(operation, owner_model, owner_id, ids, name, check=None):
+    """
+    Job of operation on ids of owner, ids and owner are checked before the job is queued,
+    by check of owner and ids too when given, so the job fails only when data changed since.
+    """
+    checked = sorted(validate_ids(ids, name))
+    owner_id = owner_model.query.get_or_404(owner_id).id
+    if check is not None:
+        check(owner_id, ids)
+    return submit_job(operation, [owner_id, checked], len(checked))
+
+
+class Job(Resource):
+    def get(self, job_id):
+        """
+        Get background job by id
+        ---
+        tags:
+            - Jobs
+        description: "Status, progress and result of operation submitted with Prefer: respond-async header"
+        parameters:
+          - name: "job_id"
+            in: "path"
+            description: "ID of job"
+            required: true
+        responses:
+          200:
+            description: job
+            schema:
+              $ref: "#/definitions/job"
+          404:
+            description: job does not exist
+        produces:
+            - application/json
+        """
+        job = JobModel.query.get_or_404(job_id)
+        return serializer(JobSchema).dump(job)
@@ -0,0 +1,46 @@
+from urllib.parse import urlencode
+from flask import abort, current_app, request
+from flask_restful import reqparse
+
+
+def collection_parser():
+    parser = reqparse.RequestParser()
+    parser.add_argument('limit', type=int)
+    parser.add_argument('after', type=str)
+    return parser
+
+
+def page_limit(limit):
+    if limit is None:
+        return current_app.config['PAGINATION_DEFAULT_LIMIT']
+    if limit < 1:
+        abort(400, 'limit must be positive integer')
+    return min(limit, current_app.config['PAGINATION_MAX_LIMIT'])
+
+
+def next_page_headers(next_cursor):
+    if next_cursor is None:
+        return {}
+
+    args = request.args.to_dict(flat=False)
+    args['after'] = next_cursor
+
+    return {'Link': f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'}
+
+
+def requested_fields(schema_cls):
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+
+    fields = tuple(sorted({name.strip() for name in fields.split(',') if name.strip()}))
+    unknown = set(fields) - set(schema_cls._declared_fields)
+    if unknown:
+        abort(400, f'unknown fields: {", ".join(sorted(unknown))}')
+
+    return fields
+
+
+def respond_async_requested():
+    preferences = request.headers.get('Prefer', '')
+    return 'respond-async' in {preference.split('=')[0].strip().lower() for preference in preferences.split(',')}
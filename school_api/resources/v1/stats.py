@@ -0,0 +1,65 @@
+from flask_restful import Resource
+from school_api.services.services import collect_stats
+from school_api.cache import cached
+
+
+class Stats(Resource):
+    @cached('groups', 'students', 'courses', 'enrollments')
+    def get(self):
+        """
+        Aggregated statistics
+        ---
+        tags:
+            - Statistics
+        description: "Totals, enrollment per course, group size distribution and courses per student"
+        responses:
+          200:
+            description: statistics
+            schema:
+              type: object
+              properties:
+                groups:
+                  type: integer
+                students:
+                  type: integer
+                students_without_group:
+                  type: integer
+                courses:
+                  type: integer
+                enrollments:
+                  type: integer
+                enrollment_per_course:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                      name:
+                        type: string
+                      students:
+                        type: integer
+                group_size_distribution:
+                  type: array
+                  description: number of groups of every size
+                  items:
+                    type: object
+                    properties:
+                      students:
+                        type: integer
+                      groups:
+                        type: integer
+                courses_per_student:
+                  type: array
+                  description: number of students enrolled in every number of courses
+                  items:
+                    type: object
+                    properties:
+                      courses:
+                        type: integer
+                      students:
+                        type: integer
+        produces:
+            - application/json
+        """
+        return collect_stats(), 200
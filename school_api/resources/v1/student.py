@@ -1,12 +1,21 @@
 from flask import abort, request
-from flask_restful import Resource, reqparse
+from flask_restful import Resource, reqparse, inputs
 from school_api.models import GroupModel, StudentModel, CourseModel, student_course, db
 from school_api.services.services import *
+from school_api.services.pagination import ordering
+from school_api.services.search import search_query, search_page
+from school_api.services.filters import student_criteria
+from school_api.services.loading import eager_options
+from school_api.cache import cached
+from school_api.streaming import streaming_requested, stream_collection
+from .parser import collection_parser, page_limit, next_page_headers, requested_fields, respond_async_requested
+from .job import submit_ids_job
 from ...schema.school_schema import GroupSchema, StudentSchema, CourseSchema
-from sqlalchemy.orm.exc import FlushError
+from ...schema.serializer import serializer
 
 
 class Students(Resource):
+    @cached('students', 'enrollments', 'courses')
     def get(self):
         """
         All students
@@ -15,13 +24,62 @@ class Students(Resource):
             - Students
         description: "Returns all students"
         parameters:
+          - name: "q"
+            in: query
+            description: "Case-insensitive search of first and last names, every word matches start
+                          of a name or, from 3 characters, any part of it. Ranked, exact matches first"
+            type: "string"
+          - name: "group_id"
+            in: query
+            description: "Only students of the group"
+            type: "integer"
+          - name: "unassigned"
+            in: query
+            description: "Only students without group when true"
+            type: "boolean"
+          - name: "course_id"
+            in: query
+            description: "Only students taking the course, repeat for several courses"
+            type: "array"
+            items:
+              type: "integer"
+            collectionFormat: "multi"
           - name: "course_name"
             in: query
-            description: "Response will contain only students assigned to course(by course name)"
+            description: "Response will contain only students assigned to course(by course name),
+                          repeat for several courses"
+            type: "array"
+            items:
+              type: "string"
+            collectionFormat: "multi"
+          - name: "course_match"
+            in: query
+            description: "Students taking any (default) or all of the courses given by course_id and course_name"
+            type: "string"
+            enum: ["any", "all"]
+          - name: "limit"
+            in: query
+            description: "Maximum number of items in response page"
+            type: "integer"
+          - name: "after"
+            in: query
+            description: "Opaque cursor of the page, taken from the Link header of the previous response"
+            type: "string"
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
             type: "string"
         responses:
           200:
             description: all students
+            headers:
+              Link:
+                type: string
+                description: "URL of the next page with rel=next, absent on the last page"
             schema:
               type: array
               items:
@@ -29,18 +87,29 @@ class Students(Resource):
         produces:
             - application/json
         """
-        parser = reqparse.RequestParser()
-        parser.add_argument('course_name', type=str)
+        parser = collection_parser()
+        parser.add_argument('group_id', type=int)
+        parser.add_argument('unassigned', type=inputs.boolean, default=False)
+        parser.add_argument('course_id', type=int, action='append')
+        parser.add_argument('course_name', type=str, action='append')
+        parser.add_argument('course_match', type=str, default='any')
+        parser.add_argument('q', type=str)
         args = parser.parse_args()
-        course_name = args['course_name']
+        fields = requested_fields(StudentSchema)
+
+        criteria = student_criteria(args['group_id'], args['unassigned'], args['course_id'], args['course_name'],
+                                    args['course_match'])
+        query = StudentModel.query.options(*eager_options(StudentSchema, fields)).filter(*criteria)
+
+        if streaming_requested():
+            query, rank = search_query(query, StudentModel, args['q'])
+            return stream_collection(query.order_by(*ordering(rank, StudentModel.id)), StudentSchema, fields)
 
-        if course_name:
-            students = select_students_on_course_by_name(course_name)
-        else:
-            students = StudentModel.query.all()
-        students = StudentSchema().dump(students, many=True)
+        students, next_cursor = search_page(query, StudentModel, args['q'], page_limit(args['limit']), args['after'],
+                                            indexed=not criteria)
+        students = serializer(StudentSchema, fields).dump(students, many=True)
 
-        return students
+        return students, 200, next_page_headers(next_cursor)
 
     def post(self):
         """
@@ -48,7 +117,8 @@ class Students(Resource):
         ---
         tags:
             - Students
-        description: "Add new student to database"
+        description: "Add new student to database.
+            Array of students is created in one transaction, response is array of created students"
         consumes:
             - application/json
         parameters:
@@ -85,11 +155,17 @@ class Students(Resource):
             schema:
                 $ref: "#/definitions/student"
           400:
-            description: Invalid input
+            description: Invalid input, for array contains errors of every invalid item by its index
+          413:
+            description: Array is longer than BULK_CREATE_MAX_ITEMS
         produces:
             - application/json
         """
         req = request.get_json()
+        if isinstance(req, list):
+            students = add_students(req)
+            return serializer(StudentSchema).dump(students, many=True), 201
+
         first_name = req.get('first_name')
         last_name = req.get('last_name')
         group_id = req.get('group_id')
@@ -98,12 +174,13 @@ class Students(Resource):
         if group_id:
             add_student_to_group(student.id, group_id)
 
-        student = StudentSchema().dump(student)
+        student = serializer(StudentSchema).dump(student)
 
         return student, 201
 
 
 class Student(Resource):
+    @cached('students', 'enrollments')
     def get(self, student_id):
         """
         Get student by id
@@ -116,6 +193,10 @@ class Student(Resource):
             in: "path"
             description: "ID of student to return"
             required: true
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: student
@@ -126,8 +207,9 @@ class Student(Resource):
         produces:
             - application/json
         """
-        student = StudentModel.query.get_or_404(student_id)
-        student = StudentSchema().dump(student)
+        fields = requested_fields(StudentSchema)
+        student = StudentModel.query.options(*eager_options(StudentSchema, fields)).get_or_404(student_id)
+        student = serializer(StudentSchema, fields).dump(student)
 
         return student
 
@@ -196,7 +278,7 @@ class Student(Resource):
                 remove_student_from_group(student,  student.group_id)
             add_student_to_group(student.id, group_id)
 
-        student = StudentSchema().dump(student)
+        student = serializer(StudentSchema).dump(student)
 
         return student
 
@@ -224,6 +306,7 @@ class Student(Resource):
 
 
 class CoursesByStudent (Resource):
+    @cached('courses', 'enrollments')
     def get(self, student_id):
         """
         All courses assigned to student
@@ -236,6 +319,14 @@ class CoursesByStudent (Resource):
             in: "path"
             description: "ID of student"
             required: true
+          - name: "stream"
+            in: query
+            description: "Stream whole collection in chunks, as NDJSON when application/x-ndjson is accepted"
+            type: "boolean"
+          - name: "fields"
+            in: query
+            description: "Comma separated fields to return, e.g. id,name"
+            type: "string"
         responses:
           200:
             description: courses
@@ -248,11 +339,16 @@ class CoursesByStudent (Resource):
         produces:
             - application/json
         """
+        fields = requested_fields(CourseSchema)
         main_query = (db.session.query(CourseModel)
+                      .options(*eager_options(CourseSchema, fields))
                       .join(CourseModel.students)
                       .filter(StudentModel.id == student_id))
+        if streaming_requested():
+            return stream_collection(main_query.order_by(CourseModel.id), CourseSchema, fields)
+
         courses = main_query.all()
-        courses = CourseSchema().dump(courses, many=True)
+        courses = serializer(CourseSchema, fields).dump(courses, many=True)
         return courses
 
     def post(self, student_id):
@@ -277,31 +373,46 @@ class CoursesByStudent (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
-          200:
-            description: courses
+          201:
+            description: "ids of assigned courses, unknown ids and ids of courses student already assigned to"
             schema:
-              type: array
-              items:
-                $ref: "#/definitions/course"
+              type: object
+              properties:
+                added:
+                  type: array
+                  items: integer
+                unknown:
+                  type: array
+                  items: integer
+                already_enrolled:
+                  type: array
+                  items: integer
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
+          400:
+            description: bad request
           404:
             description: student does not exist
-          500:
-            description: bad request
         consumes:
           - application/json
+        produces:
+          - application/json
         """
         req = request.get_json()
         courses = req.get('courses')
-        student = StudentModel.query.get_or_404(student_id)
-        for course_id in courses:
-            try:
-                student.courses.append(CourseModel.query.get_or_404(course_id))
-            except FlushError:
-                abort(400, f'student with id={student_id} does not exist')
-        db.session.commit()
+        if respond_async_requested():
+            return submit_ids_job('add_courses_to_student', StudentModel, student_id, courses, 'courses')
+
+        report = add_courses_to_student(student_id, courses)
 
-        return None, 201
+        return report, 201
 
     def delete(self, student_id):
         """
@@ -325,9 +436,17 @@ class CoursesByStudent (Resource):
                   type: array
                   items: integer
                   example: [1, 2, 3]
+          - name: "Prefer"
+            in: "header"
+            description: "respond-async runs operation as background job, response is 202 with the job"
+            type: "string"
         responses:
           200:
             description: courses
+          202:
+            description: "operation was queued as job, its URL is in Location header"
+            schema:
+              $ref: "#/definitions/job"
           404:
             description: student does not exist
           500:
@@ -337,14 +456,10 @@ class CoursesByStudent (Resource):
         """
         req = request.get_json(force=True)
         courses = req.get('courses')
-        student = StudentModel.query.get_or_404(student_id)
-        for course_id in courses:
-            try:
-                student.courses.remove(CourseModel.query.get_or_404(course_id))
-            except FlushError:
-                abort(400, f'student with id={student_id} does not exist')
-            except ValueError:
-                abort(400, f'student with id={student_id} is not assigned to course')
-        db.session.commit()
+        if respond_async_requested():
+            return submit_ids_job('remove_courses_from_student', StudentModel, student_id, courses, 'courses',
+                                  check=check_courses_of_student)
+
+        remove_courses_from_student(student_id, courses)
 
         return None
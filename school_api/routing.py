@@ -0,0 +1,111 @@
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql.expression import Select, CompoundSelect
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class Replicas:
+    """
+    Engines of read replicas of the application, handed out round-robin.
+    """
+    def __init__(self, engines):
+        self.engines = engines
+        self._next = itertools.cycle(engines)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            return next(self._next)
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends SELECTs of read-only work to a replica, once it writes
+    everything else in the session goes to the primary, so it reads its own writes.
+    Read-only work is GET request or function decorated with read_only.
+    One replica serves the session until the next request starts.
+    """
+    def get_bind(self, mapper=None, clause=None):
+        if clause is not None and not isinstance(clause, (Select, CompoundSelect)) or self._flushing:
+            # text statements are not inspected, they go to primary as writes
+            self.info['wrote'] = True
+        elif not self.info.get('wrote') and self._read_only():
+            replicas = self.app.extensions.get('db_replicas')
+            if replicas is not None:
+                if 'replica' not in self.info:
+                    self.info['replica'] = replicas.next()
+                return self.info['replica']
+
+        return super().get_bind(mapper, clause)
+
+    def _read_only(self):
+        if self.info.get('read_only'):
+            return True
+        return has_request_context() and g.get('db_read_only', False)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@contextmanager
+def reading_only():
+    """
+    Marks work within as only reading, its SELECTs go to a replica unless session wrote already.
+    Generators of read_only functions run after the call, they are consumed within it instead.
+    """
+    info = current_app.extensions['sqlalchemy'].db.session.info
+    info['read_only'] = info.get('read_only', 0) + 1
+    try:
+        yield
+    finally:
+        info['read_only'] -= 1
+
+
+def read_only(function):
+    """
+    Marks function that only reads, its SELECTs go to a replica unless session wrote already.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with reading_only():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def _replica_engine(app, uri, options):
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        # relative to application like the primary sqlite database of flask-sqlalchemy
+        url.database = os.path.join(app.root_path, url.database)
+    return create_engine(url, **options)
+
+
+def init_app(app, engine_options):
+    """
+    With SQLALCHEMY_REPLICA_URIS set, reads of GET requests and read_only functions go to replicas.
+    """
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS')
+    if not uris:
+        return
+
+    app.extensions['db_replicas'] = Replicas([_replica_engine(app, uri, engine_options(uri)) for uri in uris])
+
+    @app.before_request
+    def route_reads():
+        info = current_app.extensions['sqlalchemy'].db.session.info
+        # request of a batch shares the session, it still has to read writes of those before it
+        if not g.get('nested_request'):
+            info.pop('wrote', None)
+            info.pop('replica', None)
+        g.db_read_only = request.method in READ_METHODS
@@ -1,5 +1,5 @@
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from ..models.models import GroupModel, StudentModel, CourseModel
+from ..models.models import GroupModel, StudentModel, CourseModel, JobModel
 
 
 # todo relationship as url
@@ -8,6 +8,7 @@ class GroupSchema(SQLAlchemyAutoSchema):
         model = GroupModel
         load_instance = True
         include_relationships = True
+        dump_only = ('student_count',)
 
 
 class StudentSchema(SQLAlchemyAutoSchema):
@@ -15,6 +16,7 @@ class StudentSchema(SQLAlchemyAutoSchema):
         model = StudentModel
         load_instance = True
         include_relationships = True
+        exclude = ('updated_at',)
 
 
 class CourseSchema(SQLAlchemyAutoSchema):
@@ -22,3 +24,9 @@ class CourseSchema(SQLAlchemyAutoSchema):
         model = CourseModel
         load_instance = True
         include_relationships = True
+
+
+class JobSchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = JobModel
+        exclude = ('arguments', 'heartbeat_at')
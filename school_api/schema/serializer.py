@@ -0,0 +1,65 @@
+from functools import lru_cache
+from marshmallow import Schema, fields as ma_fields
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from marshmallow_sqlalchemy.fields import Related, RelatedList
+from ..instrumentation import timed_serialization
+
+
+class CompiledSchema:
+    """
+    Dump-only replacement of schema, built once per schema class and field set.
+    Fields are read with plain attribute access in one generated function instead of walking
+    marshmallow fields for every object. Values of types marshmallow would convert
+    are passed to the field itself, so output is identical to schema.dump.
+    """
+    def __init__(self, schema_cls, only=None):
+        self.schema = schema_cls(only=only)
+        self.dump_one = self._compile()
+
+    def dump(self, obj, many=False):
+        with timed_serialization():
+            if many:
+                dump_one = self.dump_one
+                return [dump_one(item) for item in obj]
+            return self.dump_one(obj)
+
+    def _compile(self):
+        schema = self.schema
+        # schemas with hooks or custom accessors are not compiled, marshmallow knows how to dump them
+        dump_hooks = [hook for (tag, _), hook in schema._hooks.items() if tag in (PRE_DUMP, POST_DUMP) and hook]
+        if dump_hooks or type(schema).get_attribute is not Schema.get_attribute:
+            return schema.dump
+
+        namespace = {'fields': schema.dump_fields}
+        lines = ['def dump(obj):']
+        items = []
+        for number, (name, field) in enumerate(schema.dump_fields.items()):
+            if '.' in (field.attribute or name):
+                return schema.dump
+            value = f'v{number}'
+            lines.append(f'    {value} = obj.{field.attribute or name}')
+            items.append(f'{field.data_key or name!r}: {self._expression(name, field, value)}')
+        lines.append(f'    return {{{", ".join(items)}}}')
+
+        exec(compile('\n'.join(lines), f'<{type(schema).__name__} serializer>', 'exec'), namespace)
+        return namespace['dump']
+
+    @staticmethod
+    def _expression(name, field, value):
+        fallback = f'fields[{name!r}]._serialize({value}, {name!r}, obj)'
+        if isinstance(field, RelatedList) and len(field.inner.related_keys) == 1:
+            key = field.inner.related_keys[0].key
+            return f'None if {value} is None else [getattr(item, {key!r}, None) for item in {value}]'
+        if isinstance(field, Related) and len(field.related_keys) == 1:
+            key = field.related_keys[0].key
+            return f'getattr({value}, {key!r}, None)'
+        if type(field) is ma_fields.Integer and not field.as_string:
+            return f'{value} if {value} is None or {value}.__class__ is int else {fallback}'
+        if type(field) is ma_fields.String:
+            return f'{value} if {value} is None or {value}.__class__ is str else {fallback}'
+        return fallback
+
+
+@lru_cache()
+def serializer(schema_cls, only=None):
+    return CompiledSchema(schema_cls, only)
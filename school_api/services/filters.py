@@ -0,0 +1,46 @@
+from flask import abort
+from school_api.models import (StudentModel as Student,
+                               CourseModel as Course,
+                               student_course,
+                               db)
+
+COURSE_MATCHES = ('any', 'all')
+
+
+def _enrolled(course_ids=(), course_names=()):
+    # semi-join of the student to its enrollments, courses are joined only when filtered by name
+    enrollments = student_course
+    criteria = []
+    if course_ids:
+        criteria.append(student_course.c.course_id.in_(course_ids))
+    if course_names:
+        enrollments = student_course.join(Course.__table__, Course.id == student_course.c.course_id)
+        criteria.append(Course.name.in_(course_names))
+    return db.exists(db.select([student_course.c.student_id])
+                     .select_from(enrollments)
+                     .where(db.and_(student_course.c.student_id == Student.id, db.or_(*criteria))))
+
+
+def student_criteria(group_id=None, unassigned=False, course_ids=(), course_names=(), course_match='any'):
+    """
+    Criteria of students in group or without one, taking any or all of courses given by ids and names.
+    Courses are EXISTS subqueries over student_course, so all filters are in one statement selecting students.
+    Shared by sync and async apps.
+    """
+    if group_id is not None and unassigned:
+        abort(400, 'group_id and unassigned exclude each other')
+    if course_match not in COURSE_MATCHES:
+        abort(400, f'course_match must be one of {", ".join(COURSE_MATCHES)}')
+
+    criteria = []
+    if group_id is not None:
+        criteria.append(Student.group_id == group_id)
+    if unassigned:
+        criteria.append(Student.group_id.is_(None))
+    course_ids, course_names = sorted(set(course_ids or ())), sorted(set(course_names or ()))
+    if course_match == 'any' and (course_ids or course_names):
+        criteria.append(_enrolled(course_ids, course_names))
+    elif course_match == 'all':
+        criteria += [_enrolled(course_ids=[course_id]) for course_id in course_ids]
+        criteria += [_enrolled(course_names=[course_name]) for course_name in course_names]
+    return criteria
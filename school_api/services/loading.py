@@ -0,0 +1,34 @@
+from functools import lru_cache
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from marshmallow_sqlalchemy.fields import Related, RelatedList
+
+
+@lru_cache()
+def eager_options(schema_cls, only=None):
+    """
+    Loader options for every relationship serialized by schema, so dump(many=True)
+    does not lazy load relationships row by row.
+    Collections are loaded with one extra SELECT ... WHERE id IN (...),
+    many-to-one relationships are joined into the main query.
+    Only primary keys of related rows are serialized, so only they are loaded.
+    With `only` fields, other columns are not selected and other relationships are not loaded at all.
+    """
+    mapper = inspect(schema_cls.Meta.model)
+    options = []
+    if only is not None:
+        primary_key = {column.key for column in mapper.primary_key}
+        columns = primary_key | {name for name in only if name in mapper.column_attrs}
+        options.append(load_only(*sorted(columns)))
+
+    for name, field in schema_cls(only=only).dump_fields.items():
+        if not isinstance(field, (Related, RelatedList)):
+            continue
+        relationship = mapper.relationships[field.attribute or name]
+        related_pk = [column.key for column in relationship.mapper.primary_key]
+        if relationship.uselist:
+            options.append(selectinload(relationship.class_attribute).load_only(*related_pk))
+        else:
+            options.append(joinedload(relationship.class_attribute).load_only(*related_pk))
+
+    return tuple(options)
@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+from flask import abort
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(position):
+    payload = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(payload)
+        if not isinstance(position, dict):
+            raise ValueError
+        return position
+    except (ValueError, binascii.Error):
+        abort(400, 'invalid cursor')
+
+
+def ordering(rank, id_column):
+    return (id_column,) if rank is None else (rank, id_column)
+
+
+def cursor_position(after, ranked=False):
+    """
+    (rank, id) of the last item seen, rank is None for unranked results.
+    """
+    try:
+        position = decode_cursor(after)
+        return (int(position['rank']) if ranked else None), int(position['id'])
+    except (KeyError, TypeError, ValueError):
+        abort(400, 'invalid cursor')
+
+
+def after_criterion(after, id_column, rank=None):
+    """
+    Criterion of rows past the cursor in order of (rank, id), or of id without rank.
+    """
+    last_rank, last_id = cursor_position(after, rank is not None)
+    if rank is None:
+        return id_column > last_id
+    return or_(rank > last_rank, and_(rank == last_rank, id_column > last_id))
+
+
+def paginate(query, id_column, limit, after=None, rank=None):
+    """
+    Keyset pagination: seeks past the last seen primary key instead of using OFFSET,
+    so every page costs the same no matter how deep the client is.
+    Ranked results, like search, are ordered and sought by (rank, id).
+    Returns page items and cursor of the next page (None on the last page).
+    """
+    if after is not None:
+        query = query.filter(after_criterion(after, id_column, rank))
+
+    if rank is None:
+        items = query.order_by(id_column).limit(limit + 1).all()
+        ranks = None
+    else:
+        rows = query.add_columns(rank).order_by(*ordering(rank, id_column)).limit(limit + 1).all()
+        items, ranks = [item for item, _ in rows], [item_rank for _, item_rank in rows]
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        position = {'id': items[-1].id}
+        if ranks is not None:
+            position['rank'] = ranks[limit - 1]
+        next_cursor = encode_cursor(position)
+
+    return items, next_cursor
@@ -0,0 +1,277 @@
+from functools import lru_cache
+from flask import abort
+from sqlalchemy import and_, or_, bindparam, except_, inspect, union, literal_column, table
+from sqlalchemy.util import LRUCache
+from school_api.models import db
+from school_api.models.models import SEARCHED_COLUMNS, SQLITE_TRIGRAMS
+from school_api.services.pagination import cursor_position, encode_cursor, paginate
+
+SEARCH_MAX_LENGTH = 100
+# shorter words have no trigram, they match prefixes of names only
+TRIGRAM_LENGTH = 3
+# distinct names of a column merged as separate index scans, a range scan sorting its rows is used past it
+MERGED_NAMES = 100
+EXACT, PREFIX, SUBSTRING = 0, 1, 2
+
+_compiled = LRUCache(1024)
+
+
+def search_words(q):
+    if len(q) > SEARCH_MAX_LENGTH:
+        abort(400, f'q must be at most {SEARCH_MAX_LENGTH} characters')
+    return q.lower().split()
+
+
+def _substrings(word, dialect_name):
+    # SQLite without trigram tokenizer has no FTS table, every word matches prefixes there
+    return len(word) >= TRIGRAM_LENGTH and (dialect_name != 'sqlite' or SQLITE_TRIGRAMS)
+
+
+def _like(word):
+    return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _next_prefix(word):
+    return word[:-1] + chr(ord(word[-1]) + 1)
+
+
+def _prefix_range(column, word):
+    # lowercased prefix as range of the expression index, LIKE can not use it
+    return and_(column >= word, column < _next_prefix(word))
+
+
+def _phrase(word):
+    return '"' + word.replace('"', '""') + '"'
+
+
+def _lowered(model, column, dialect_name):
+    # the expression of the btree index, PostgreSQL one has byte order of names as SQLite
+    lowered = db.func.lower(model.__table__.c[column])
+    return lowered.collate('C') if dialect_name == 'postgresql' else lowered
+
+
+def search_criteria(model, words, dialect_name=None):
+    """
+    Criterion of rows of model with every word in one of searched columns, case-insensitive,
+    and rank of the row to order by, for every word 0 when a column equals it, 1 when one starts with it, 2 otherwise.
+    Words of TRIGRAM_LENGTH or more match anywhere in names, through FTS5 trigram table on SQLite
+    and trigram indexes on PostgreSQL, shorter words and every word on SQLite without trigrams match prefixes.
+    """
+    dialect_name = dialect_name or db.engine.dialect.name
+    searched = model.__table__
+    columns = [db.func.lower(searched.c[name]) for name in SEARCHED_COLUMNS[searched]]
+
+    criteria = []
+    long_words = [word for word in words if _substrings(word, dialect_name)]
+    if dialect_name == 'sqlite' and long_words:
+        search = table(f'{searched.name}_search')
+        phrases = ' AND '.join(_phrase(word) for word in long_words)
+        criteria.append(searched.c.id.in_(db.select([literal_column('rowid')])
+                                          .select_from(search)
+                                          .where(literal_column(f'"{search.name}"').match(phrases))))
+    for word in words:
+        if word in long_words:
+            if dialect_name != 'sqlite':
+                criteria.append(or_(*(column.like(f'%{_like(word)}%', escape='\\') for column in columns)))
+        else:
+            criteria.append(or_(*(_prefix_range(_lowered(model, name, dialect_name), word)
+                                  for name in SEARCHED_COLUMNS[searched])))
+
+    ranks = [db.case([(or_(*(column == word for column in columns)), 0),
+                      (or_(*(column.like(f'{_like(word)}%', escape='\\') for column in columns)), 1)],
+                     else_=2)
+             for word in words]
+    return and_(*criteria), sum(ranks[1:], ranks[0])
+
+
+def search_query(query, model, q):
+    """
+    Query filtered by search of q and rank to order it by, rank is None when q has no words.
+    """
+    words = search_words(q or '')
+    if not words:
+        return query, None
+    criterion, rank = search_criteria(model, words)
+    return query.filter(criterion), rank
+
+
+def _arm_count(names, found):
+    """
+    Number of index scans merged for names, None for the range scan when more than MERGED_NAMES were found.
+    Scans are padded to a power of two repeating the last name, so statements have few shapes to cache.
+    """
+    if found > MERGED_NAMES:
+        return None
+    return 1 << (len(names) - 1).bit_length() if names else 0
+
+
+@lru_cache(maxsize=None)
+def _names_statement(model, column, dialect_name):
+    lowered, end = _lowered(model, column, dialect_name), bindparam('end')
+    names = (db.select([db.func.min(lowered).label('name')])
+             .where(and_(lowered >= bindparam('word'), lowered < end))
+             .cte(f'{column}_names', recursive=True))
+    following = db.select([db.func.min(lowered)]).where(and_(lowered > names.c.name, lowered < end))
+    names = names.union_all(db.select([following.as_scalar()]).where(names.c.name.isnot(None)))
+    return db.select([names.c.name]).where(names.c.name.isnot(None)).limit(bindparam('limit'))
+
+
+def _name_arms(model, column, dialect_name, count, after, exclude_exact=False):
+    """
+    SELECTs of ids with column equal to one of count names, or in the prefix range when count is None.
+    """
+    id_column, lowered, word = model.__table__.c.id, _lowered(model, column, dialect_name), bindparam('word')
+    criteria = [id_column > bindparam('after_id')] if after else []
+    if exclude_exact:
+        criteria += [db.func.coalesce(_lowered(model, other, dialect_name), '') != word
+                     for other in SEARCHED_COLUMNS[model.__table__] if other != column]
+    if count is None:
+        prefix = and_(lowered >= word, lowered < bindparam('end'))
+        return [db.select([id_column]).where(and_(prefix, lowered != word, *criteria) if exclude_exact
+                                             else and_(prefix, *criteria))]
+    return [db.select([id_column]).where(and_(lowered == bindparam(f'{column}_{number}'), *criteria))
+            for number in range(count)]
+
+
+def _substring_source(model, dialect_name, after):
+    searched = model.__table__
+    if dialect_name == 'sqlite':
+        search = table(f'{searched.name}_search')
+        rowid = literal_column('rowid')
+        criteria = [literal_column(f'"{search.name}"').match(bindparam('phrase'))]
+        if after:
+            criteria.append(rowid > bindparam('after_id'))
+        return db.select([rowid.label('id')]).select_from(search).where(and_(*criteria))
+    criteria = [or_(*(db.func.lower(searched.c[column]).like(bindparam('like'), escape='\\')
+                      for column in SEARCHED_COLUMNS[searched]))]
+    if after:
+        criteria.append(searched.c.id > bindparam('after_id'))
+    return db.select([searched.c.id]).where(and_(*criteria))
+
+
+@lru_cache(maxsize=1024)
+def _rank_statement(model, dialect_name, rank, counts, after):
+    columns = SEARCHED_COLUMNS[model.__table__]
+    if rank == EXACT:
+        id_column = model.__table__.c.id
+        criteria = [id_column > bindparam('after_id')] if after else []
+        arms = [db.select([id_column]).where(and_(_lowered(model, column, dialect_name) == bindparam('word'),
+                                                  *criteria))
+                for column in columns]
+    elif rank == PREFIX:
+        arms = [arm for column, count in zip(columns, counts)
+                for arm in _name_arms(model, column, dialect_name, count, after, exclude_exact=True)]
+    else:
+        excluded = [arm for column, count in zip(columns, counts)
+                    for arm in _name_arms(model, column, dialect_name, count, after)]
+        source = _substring_source(model, dialect_name, after)
+        arms = [except_(source, *excluded) if excluded else source]
+    statement = union(*arms) if len(arms) > 1 else arms[0]
+    return statement.order_by(literal_column('id')).limit(bindparam('limit'))
+
+
+class IndexedSearch:
+    """
+    Ranked search of one word without other criteria, read as ids in order of (rank, id).
+    Rows of every rank come from index scans merged in id order, one scan per distinct name
+    starting with the word, so the first rows of a page are found without sorting every match
+    and a page costs about the same for common words as for rare ones.
+    Statements with their parameters are run by the app, the sync and the async one: names_statements first,
+    then rank_statement for ranks from the cursor on, until the page is full.
+    """
+    def __init__(self, model, word, dialect_name):
+        self.model = model
+        self.word = word
+        self.dialect_name = dialect_name
+        self.columns = SEARCHED_COLUMNS[model.__table__]
+
+    def ranks(self, after_rank=None):
+        ranks = (EXACT, PREFIX, SUBSTRING) if _substrings(self.word, self.dialect_name) else (EXACT, PREFIX)
+        return [rank for rank in ranks if after_rank is None or rank >= after_rank]
+
+    def names_statements(self):
+        """
+        For every searched column distinct lowercased names starting with the word, at most MERGED_NAMES + 1,
+        each found by one seek of the index past the previous name.
+        """
+        parameters = {'word': self.word, 'end': _next_prefix(self.word), 'limit': MERGED_NAMES + 1}
+        return [(_names_statement(self.model, column, self.dialect_name), parameters) for column in self.columns]
+
+    def rank_statement(self, rank, names, limit, after_id=None):
+        """
+        Ordered ids of rank after after_id and parameters, names are rows of names_statements,
+        None when rank has no rows.
+        """
+        parameters = {'word': self.word, 'end': _next_prefix(self.word), 'limit': limit}
+        if after_id is not None:
+            parameters['after_id'] = after_id
+        if rank == SUBSTRING:
+            parameters['phrase'] = _phrase(self.word)
+            parameters['like'] = f'%{_like(self.word)}%'
+
+        counts = ()
+        if rank != EXACT:
+            for column, rows in zip(self.columns, names):
+                column_names = [row[0] for row in rows if rank == SUBSTRING or row[0] != self.word]
+                count = _arm_count(column_names, len(rows))
+                if count:
+                    column_names += column_names[-1:] * (count - len(column_names))
+                    parameters.update((f'{column}_{number}', name) for number, name in enumerate(column_names))
+                counts += (count,)
+            if rank == PREFIX and all(count == 0 for count in counts):
+                return None
+        return _rank_statement(self.model, self.dialect_name, rank, counts, after_id is not None), parameters
+
+
+def indexed_search(model, q, dialect_name=None):
+    """
+    IndexedSearch of q when it is one word, None when it has to be searched by search_criteria.
+    """
+    words = search_words(q or '')
+    if len(words) != 1:
+        return None
+    return IndexedSearch(model, words[0], dialect_name or db.engine.dialect.name)
+
+
+def _execute(model, statement, parameters):
+    # statements of IndexedSearch are reused with new parameters, so their compiled form is too,
+    # the bind is found by model as traversing the statement costs about as much as running it
+    connection = db.session.connection(mapper=inspect(model)).execution_options(compiled_cache=_compiled)
+    return connection.execute(statement, parameters).fetchall()
+
+
+def search_positions(search, limit, after=None):
+    """
+    (rank, id) of up to limit + 1 rows of indexed search after cursor, in order of the page.
+    """
+    after_rank, after_id = cursor_position(after, ranked=True) if after is not None else (None, None)
+    names = [_execute(search.model, *statement) for statement in search.names_statements()]
+    positions = []
+    for rank in search.ranks(after_rank):
+        statement = search.rank_statement(rank, names, limit + 1 - len(positions),
+                                          after_id if rank == after_rank else None)
+        if statement is not None:
+            positions += [(rank, row[0]) for row in _execute(search.model, *statement)]
+        if len(positions) > limit:
+            break
+    return positions
+
+
+def search_page(query, model, q, limit, after=None, indexed=True):
+    """
+    Page of query searched by q and cursor of the next page. One word is searched by IndexedSearch
+    when indexed, i.e. query has no other criteria, everything else by search_criteria.
+    """
+    search = indexed_search(model, q) if indexed else None
+    if search is None:
+        query, rank = search_query(query, model, q)
+        return paginate(query, model.id, limit, after, rank)
+
+    positions = search_positions(search, limit, after)
+    items = {item.id: item for item in query.filter(model.id.in_([item_id for _, item_id in positions[:limit]]))}
+    next_cursor = None
+    if len(positions) > limit:
+        rank, last_id = positions[limit - 1]
+        next_cursor = encode_cursor({'id': last_id, 'rank': rank})
+    # rows deleted since their ids were read are skipped
+    return [items[item_id] for _, item_id in positions[:limit] if item_id in items], next_cursor
@@ -1,11 +1,38 @@
+from collections import Counter
+from datetime import datetime
 from school_api.models import (StudentModel as Student,
                                GroupModel as Group,
                                CourseModel as Course,
                                student_course,
                                db)
-from flask import abort
-
-
+from school_api.schema.school_schema import GroupSchema, StudentSchema, CourseSchema
+from school_api.cache import invalidates
+from school_api.routing import read_only
+from .loading import eager_options
+from .stats import stats_statements, stats_document
+from .filters import student_criteria
+from flask import abort, current_app
+from flask_restful import abort as restful_abort
+
+
+def _change_student_counts(deltas):
+    # one UPDATE ... SET student_count = student_count + CASE id WHEN ... for every changed group
+    deltas = {group_id: delta for group_id, delta in deltas.items() if group_id is not None and delta}
+    if deltas:
+        (Group.query
+         .filter(Group.id.in_(deltas))
+         .update({Group.student_count: Group.student_count + db.case(deltas, value=Group.id)},
+                 synchronize_session=False))
+
+
+def _mark_students_changed(condition):
+    # courses and group name are part of exported student, updated_at of the students follows their changes
+    (Student.query
+     .filter(condition)
+     .update({Student.updated_at: datetime.utcnow()}, synchronize_session=False))
+
+
+@invalidates('groups')
 def add_group(name):
     # todo name validator
     group = Group(name=name)
@@ -15,17 +42,20 @@ def add_group(name):
     return group
 
 
+@invalidates('groups')
 def edit_group(group_id, name):
     # todo name validator
     if Group.query.filter_by(name=name).first() is not None:
         abort(400, f'group with name {name} already exist')
     group = Group.query.get_or_404(group_id)
     group.name = name
+    _mark_students_changed(Student.group_id == group.id)
     db.session.commit()
 
     return group
 
 
+@invalidates('groups', 'students')
 def del_group(group_id):
     group = Group.query.get_or_404(group_id)
     db.session.delete(group)
@@ -34,6 +64,7 @@ def del_group(group_id):
     return True
 
 
+@invalidates('students')
 def add_student(first_name, last_name):
     # todo first name last name  validator
     student = Student(first_name=first_name, last_name=last_name, group_id=None)
@@ -43,6 +74,7 @@ def add_student(first_name, last_name):
     return student
 
 
+@invalidates('students')
 def edit_student(student_id, first_name=None, last_name=None):
     # todo first name last name  validator
     student = Student.query.get_or_404(student_id)
@@ -55,14 +87,17 @@ def edit_student(student_id, first_name=None, last_name=None):
     return student
 
 
+@invalidates('students', 'enrollments')
 def del_student(student_id):
     student = Student.query.get_or_404(student_id)
+    _change_student_counts({student.group_id: -1})
     db.session.delete(student)
     db.session.commit()
 
     return True
 
 
+@invalidates('courses')
 def add_course(name, description=None):
     course = Course(name=name, description=description)
     db.session.add(course)
@@ -71,6 +106,7 @@ def add_course(name, description=None):
     return course
 
 
+@invalidates('courses')
 def edit_course(course_id, name=None, description=None):
     course = Course.query.get_or_404(course_id)
     if name:
@@ -84,42 +120,373 @@ def edit_course(course_id, name=None, description=None):
     return course
 
 
+@invalidates('courses', 'enrollments')
 def del_course(course_id):
     course = Course.query.get_or_404(course_id)
+    _mark_students_changed(Student.id.in_(db.select([student_course.c.student_id])
+                                          .where(student_course.c.course_id == course.id)))
     db.session.delete(course)
     db.session.commit()
 
     return True
 
 
+@invalidates('students')
 def add_student_to_group(student_id, group_id):
     # todo force param or another function for edit students group if student already assigned to group
     group = Group.query.get_or_404(group_id)
-    group.students.append(Student.query.get_or_404(student_id))
+    student = Student.query.get_or_404(student_id)
+    if student.group_id != group.id:
+        _change_student_counts({student.group_id: -1, group.id: 1})
+        group.students.append(student)
     db.session.commit()
 
     return group
 
 
+@invalidates('students')
 def remove_student_from_group(student, group_id):
     group = Group.query.get_or_404(group_id)
     group.students.remove(student)
+    _change_student_counts({group.id: -1})
     db.session.commit()
 
     return group
 
 
-def select_group_with_less_students(number_of_students):
+def query_group_with_less_students(number_of_students, only=None):
     main_query = (db.session.query(Group)
-                  .join(Group.students)
-                  .group_by(Group.id)
-                  .having(db.func.count(Group.id) <= number_of_students))
+                  .options(*eager_options(GroupSchema, only))
+                  .filter(Group.student_count <= number_of_students))
 
-    groups = main_query.all()
+    return main_query
+
+
+@read_only
+def select_group_with_less_students(number_of_students):
+    groups = query_group_with_less_students(number_of_students).all()
     return groups
 
 
+def query_students_on_course_by_name(course_name, only=None):
+    main_query = (db.session.query(Student)
+                  .options(*eager_options(StudentSchema, only))
+                  .filter(*student_criteria(course_names=[course_name])))
+    return main_query
+
+
+@read_only
 def select_students_on_course_by_name(course_name):
-    main_query = db.session.query(Student).join(Student.courses).filter(Course.name == course_name)
-    students = main_query.all()
+    students = query_students_on_course_by_name(course_name).all()
     return students
+
+
+@read_only
+def collect_stats():
+    """
+    Totals, enrollment of every course, distribution of group sizes and of courses per student,
+    each computed by one aggregate query.
+    """
+    return stats_document(*(db.session.execute(statement).fetchall() for statement in stats_statements()))
+
+
+def validate_ids(ids, name):
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        abort(400, f'{name} must be list of integer ids')
+    return set(ids)
+
+
+def _add_enrollments(owner_key, owner_id, other_key, other_model, other_ids):
+    # one IN query validates ids, one finds existing rows, one executemany inserts the rest
+    owner_column = student_course.c[owner_key]
+    other_column = student_course.c[other_key]
+
+    known = {row_id for row_id, in db.session.query(other_model.id).filter(other_model.id.in_(other_ids))}
+    enrolled = {row_id for row_id, in (db.session.query(other_column)
+                                       .filter(owner_column == owner_id, other_column.in_(known)))}
+    added = sorted(known - enrolled)
+    if added:
+        db.session.execute(student_course.insert(),
+                           [{owner_key: owner_id, other_key: other_id} for other_id in added])
+        _mark_students_changed(Student.id.in_([owner_id] if owner_key == 'student_id' else added))
+    db.session.commit()
+
+    return {'added': added,
+            'unknown': sorted(other_ids - known),
+            'already_enrolled': sorted(enrolled)}
+
+
+@invalidates('enrollments')
+def add_students_to_course(course_id, student_ids):
+    student_ids = validate_ids(student_ids, 'students')
+    course = Course.query.get_or_404(course_id)
+    return _add_enrollments('course_id', course.id, 'student_id', Student, student_ids)
+
+
+@invalidates('enrollments')
+def add_courses_to_student(student_id, course_ids):
+    course_ids = validate_ids(course_ids, 'courses')
+    student = Student.query.get_or_404(student_id)
+    return _add_enrollments('student_id', student.id, 'course_id', Course, course_ids)
+
+
+def _enrolled_to_remove(owner_key, owner_id, other_key, other_model, other_ids, name, error):
+    # the first id of request order that is unknown (404) or not enrolled (400) fails the whole request
+    owner_column = student_course.c[owner_key]
+    other_column = student_course.c[other_key]
+    requested = validate_ids(other_ids, name)
+
+    known = {row_id for row_id, in db.session.query(other_model.id).filter(other_model.id.in_(requested))}
+    enrolled = {row_id for row_id, in (db.session.query(other_column)
+                                       .filter(owner_column == owner_id, other_column.in_(known)))}
+    for other_id in other_ids:
+        if other_id not in known:
+            abort(404)
+        if other_id not in enrolled:
+            abort(400, error.format(other_id))
+    return enrolled
+
+
+def _remove_enrollments(owner_key, owner_id, other_key, enrolled):
+    owner_column = student_course.c[owner_key]
+    other_column = student_course.c[other_key]
+    if enrolled:
+        db.session.execute(student_course.delete()
+                           .where(owner_column == owner_id)
+                           .where(other_column.in_(enrolled)))
+        _mark_students_changed(Student.id.in_([owner_id] if owner_key == 'student_id' else enrolled))
+    db.session.commit()
+
+    return {'removed': sorted(enrolled)}
+
+
+def check_students_on_course(course_id, student_ids):
+    """
+    Students of course to remove from it, 404 for unknown course or student, 400 for student not on course.
+    """
+    course = Course.query.get_or_404(course_id)
+    return course.id, _enrolled_to_remove('course_id', course.id, 'student_id', Student, student_ids, 'students',
+                                          'student with id={} does not exist')
+
+
+def check_courses_of_student(student_id, course_ids):
+    """
+    Courses of student to remove, 404 for unknown student or course, 400 for course the student does not take.
+    """
+    student = Student.query.get_or_404(student_id)
+    return student.id, _enrolled_to_remove('student_id', student.id, 'course_id', Course, course_ids, 'courses',
+                                           f'student with id={student.id} is not assigned to course')
+
+
+@invalidates('enrollments')
+def remove_students_from_course(course_id, student_ids):
+    course_id, enrolled = check_students_on_course(course_id, student_ids)
+    return _remove_enrollments('course_id', course_id, 'student_id', enrolled)
+
+
+@invalidates('enrollments')
+def remove_courses_from_student(student_id, course_ids):
+    student_id, enrolled = check_courses_of_student(student_id, course_ids)
+    return _remove_enrollments('student_id', student_id, 'course_id', enrolled)
+
+
+@invalidates('students')
+def add_students_to_group(group_id, student_ids):
+    student_ids = validate_ids(student_ids, 'students')
+    group_id = Group.query.get_or_404(group_id).id
+
+    rows = db.session.query(Student.id, Student.group_id).filter(Student.id.in_(student_ids)).all()
+    added = sorted(student_id for student_id, student_group_id in rows if student_group_id != group_id)
+    if added:
+        (Student.query
+         .filter(Student.id.in_(added))
+         .update({Student.group_id: group_id}, synchronize_session=False))
+        deltas = Counter({group_id: len(added)})
+        deltas.subtract(student_group_id for _, student_group_id in rows if student_group_id != group_id)
+        _change_student_counts(deltas)
+    db.session.commit()
+
+    return {'added': added,
+            'unknown': sorted(student_ids - {student_id for student_id, _ in rows}),
+            'already_in_group': sorted(student_id for student_id, student_group_id in rows
+                                       if student_group_id == group_id)}
+
+
+@invalidates('students')
+def remove_students_from_group(group_id, student_ids):
+    student_ids = validate_ids(student_ids, 'students')
+    group_id = Group.query.get_or_404(group_id).id
+
+    rows = db.session.query(Student.id, Student.group_id).filter(Student.id.in_(student_ids)).all()
+    removed = sorted(student_id for student_id, student_group_id in rows if student_group_id == group_id)
+    if removed:
+        (Student.query
+         .filter(Student.id.in_(removed))
+         .update({Student.group_id: None}, synchronize_session=False))
+        _change_student_counts({group_id: -len(removed)})
+    db.session.commit()
+
+    return {'removed': removed,
+            'unknown': sorted(student_ids - {student_id for student_id, _ in rows}),
+            'not_in_group': sorted(student_id for student_id, student_group_id in rows
+                                   if student_group_id != group_id)}
+
+
+@invalidates('students')
+def transfer_group_students(group_id, to_group_id):
+    group_id = Group.query.get_or_404(group_id).id
+    to_group_id = Group.query.get_or_404(to_group_id).id
+    if group_id == to_group_id:
+        abort(400, 'students can not be transferred to the same group')
+
+    moved = (Student.query
+             .filter(Student.group_id == group_id)
+             .update({Student.group_id: to_group_id}, synchronize_session=False))
+    _change_student_counts({group_id: -moved, to_group_id: moved})
+    db.session.commit()
+
+    return {'moved': moved}
+
+
+INSERT_CHUNK_SIZE = 500
+
+
+def _insert_returning_ids(table, rows):
+    ids = []
+    if not rows:
+        return ids
+
+    dialect = db.session.get_bind().dialect
+    if dialect.implicit_returning:
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            insert = table.insert().values(rows[start:start + INSERT_CHUNK_SIZE]).returning(table.c.id)
+            ids.extend(row_id for row_id, in db.session.execute(insert))
+    elif dialect.name == 'sqlite':
+        # sqlite holds write lock till the end of transaction and gives every new row max(rowid) + 1,
+        # so rows of one executemany get consecutive ids
+        db.session.execute(table.insert(), rows)
+        last_id = db.session.execute(db.select([db.func.max(table.c.id)])).scalar()
+        ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    else:
+        # dialect without RETURNING, rows are inserted one by one but still in one transaction
+        for row in rows:
+            ids.append(db.session.execute(table.insert(), row).inserted_primary_key[0])
+
+    return ids
+
+
+def _check_batch(items):
+    if not isinstance(items, list):
+        abort(400, 'list of items expected')
+    max_items = current_app.config['BULK_CREATE_MAX_ITEMS']
+    if len(items) > max_items:
+        abort(413, f'at most {max_items} items can be created at once')
+
+
+def _check_text(item, key, errors, required=True):
+    value = item.get(key)
+    if value is None and not required:
+        return
+    if not isinstance(value, str) or not value.strip():
+        errors.setdefault(key, []).append('non-empty string required')
+
+
+def _check_unique_names(items, errors, key, model):
+    names = [item.get(key) for item in items]
+    existing = {name for name, in db.session.query(model.name).filter(model.name.in_(
+        [name for name in names if isinstance(name, str)]))}
+    seen = set()
+    for index, name in enumerate(names):
+        if name in existing:
+            errors.setdefault(index, {}).setdefault(key, []).append(f'{name} already exist')
+        elif name in seen:
+            errors.setdefault(index, {}).setdefault(key, []).append(f'{name} is duplicated in request')
+        seen.add(name)
+
+
+def _raise_item_errors(errors):
+    if errors:
+        restful_abort(400, message='invalid items, nothing was created', errors=errors)
+
+
+@invalidates('groups')
+def add_groups(items):
+    _check_batch(items)
+    errors = {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors[index] = {'_item': ['object expected']}
+            continue
+        _check_text(item, 'group_name', item_errors)
+        if item_errors:
+            errors[index] = item_errors
+    if not errors:
+        _check_unique_names(items, errors, 'group_name', Group)
+    _raise_item_errors(errors)
+
+    ids = _insert_returning_ids(Group.__table__, [{'name': item['group_name']} for item in items])
+    db.session.commit()
+
+    return Group.query.options(*eager_options(GroupSchema)).filter(Group.id.in_(ids)).order_by(Group.id).all()
+
+
+@invalidates('students')
+def add_students(items):
+    _check_batch(items)
+    errors = {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors[index] = {'_item': ['object expected']}
+            continue
+        _check_text(item, 'first_name', item_errors)
+        _check_text(item, 'last_name', item_errors)
+        group_id = item.get('group_id')
+        if group_id is not None and (not isinstance(group_id, int) or isinstance(group_id, bool)):
+            item_errors['group_id'] = ['integer required']
+        if item_errors:
+            errors[index] = item_errors
+    if not errors:
+        group_ids = {item['group_id'] for item in items if item.get('group_id') is not None}
+        known = {group_id for group_id, in db.session.query(Group.id).filter(Group.id.in_(group_ids))}
+        for index, item in enumerate(items):
+            if item.get('group_id') is not None and item['group_id'] not in known:
+                errors[index] = {'group_id': [f'group with id={item["group_id"]} does not exist']}
+    _raise_item_errors(errors)
+
+    ids = _insert_returning_ids(Student.__table__, [{'first_name': item['first_name'],
+                                                     'last_name': item['last_name'],
+                                                     'group_id': item.get('group_id')} for item in items])
+    _change_student_counts(Counter(item.get('group_id') for item in items))
+    db.session.commit()
+
+    return (Student.query
+            .options(*eager_options(StudentSchema))
+            .filter(Student.id.in_(ids))
+            .order_by(Student.id)
+            .all())
+
+
+@invalidates('courses')
+def add_courses(items):
+    _check_batch(items)
+    errors = {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors[index] = {'_item': ['object expected']}
+            continue
+        _check_text(item, 'course_name', item_errors)
+        _check_text(item, 'description', item_errors, required=False)
+        if item_errors:
+            errors[index] = item_errors
+    if not errors:
+        _check_unique_names(items, errors, 'course_name', Course)
+    _raise_item_errors(errors)
+
+    ids = _insert_returning_ids(Course.__table__, [{'name': item['course_name'],
+                                                    'description': item.get('description')} for item in items])
+    db.session.commit()
+
+    return Course.query.options(*eager_options(CourseSchema)).filter(Course.id.in_(ids)).order_by(Course.id).all()
@@ -0,0 +1,55 @@
+from school_api.models import (StudentModel as Student,
+                               GroupModel as Group,
+                               CourseModel as Course,
+                               student_course,
+                               db)
+
+
+def stats_statements():
+    """
+    Aggregate SELECTs of statistics: totals, enrollment of every course,
+    distribution of group sizes and of courses per student. Shared by sync and async apps.
+    """
+    count = db.func.count
+    totals = db.select([db.select([count()]).select_from(Group.__table__).as_scalar(),
+                        db.select([count()]).select_from(Student.__table__).as_scalar(),
+                        db.select([count()]).where(Student.group_id.is_(None)).as_scalar(),
+                        db.select([count()]).select_from(Course.__table__).as_scalar(),
+                        db.select([count()]).select_from(student_course).as_scalar()])
+
+    enrollment = (db.select([Course.id, Course.name, count(student_course.c.student_id)])
+                  .select_from(Course.__table__.outerjoin(student_course, student_course.c.course_id == Course.id))
+                  .group_by(Course.id, Course.name)
+                  .order_by(Course.id))
+
+    group_sizes = (db.select([Group.student_count, count()])
+                   .group_by(Group.student_count)
+                   .order_by(Group.student_count))
+
+    courses_of_student = (db.select([count(student_course.c.course_id).label('courses')])
+                          .select_from(Student.__table__.outerjoin(student_course,
+                                                                   student_course.c.student_id == Student.id))
+                          .group_by(Student.id)
+                          .alias())
+    courses_per_student = (db.select([courses_of_student.c.courses, count()])
+                           .group_by(courses_of_student.c.courses)
+                           .order_by(courses_of_student.c.courses))
+
+    return totals, enrollment, group_sizes, courses_per_student
+
+
+def stats_document(totals, enrollment, group_sizes, courses_per_student):
+    """
+    Statistics from rows of stats_statements.
+    """
+    groups, students, students_without_group, courses, enrollments = totals[0]
+    return {'groups': groups,
+            'students': students,
+            'students_without_group': students_without_group,
+            'courses': courses,
+            'enrollments': enrollments,
+            'enrollment_per_course': [{'id': course_id, 'name': name, 'students': count}
+                                      for course_id, name, count in enrollment],
+            'group_size_distribution': [{'students': size, 'groups': count} for size, count in group_sizes],
+            'courses_per_student': [{'courses': number, 'students': count}
+                                    for number, count in courses_per_student]}
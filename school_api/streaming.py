@@ -0,0 +1,46 @@
+import json
+from flask import current_app, request, stream_with_context
+from .schema.serializer import serializer
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
+
+
+def streaming_media_type():
+    return request.accept_mimetypes.best_match([JSON, NDJSON], default=JSON)
+
+
+def streaming_requested():
+    return request.args.get('stream', '').lower() == 'true' or streaming_media_type() == NDJSON
+
+
+def stream_collection(query, schema_cls, only=None):
+    """
+    Streams query rows as JSON array or NDJSON, chosen by Accept header.
+    Rows are fetched in chunks of STREAM_CHUNK_SIZE through server-side cursor and serialized one by one,
+    so neither first byte nor memory waits for the whole collection.
+    """
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    media_type = streaming_media_type()
+    rows = query.execution_options(stream_results=True).yield_per(chunk_size)
+    schema = serializer(schema_cls, only)
+
+    def generate():
+        if media_type == NDJSON:
+            buffer, separator, end = [], '', '\n'
+        else:
+            buffer, separator, end = ['['], '', ''
+
+        for number, row in enumerate(rows, 1):
+            buffer.append(separator + json.dumps(schema.dump(row)) + end)
+            if media_type == JSON:
+                separator = ','
+            if number % chunk_size == 0:
+                yield ''.join(buffer)
+                buffer.clear()
+
+        if media_type == JSON:
+            buffer.append(']')
+        yield ''.join(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=media_type)
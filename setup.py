@@ -2,4 +2,6 @@ from setuptools import setup, find_packages
 setup(
     name='school_api',
     packages=find_packages(),
+    # driver of the async app for PostgreSQL, SQLite one is in requirements.txt
+    extras_require={'postgres-async': ['asyncpg>=0.27']},
 )
\ No newline at end of file
@@ -1,4 +1,5 @@
 import unittest
+from contextlib import contextmanager
 from school_api.app import create_app
 from school_api.db import create_tables, drop_tables
 from school_api.data_generator import test_db
@@ -19,3 +20,12 @@ class BaseCase(unittest.TestCase):
 
     def tearDown(self):
         drop_tables(self.app)
+
+    @contextmanager
+    def query_budget(self, statements):
+        default_budget = self.app.config['SQLALCHEMY_QUERY_BUDGET']
+        self.app.config['SQLALCHEMY_QUERY_BUDGET'] = statements
+        try:
+            yield
+        finally:
+            self.app.config['SQLALCHEMY_QUERY_BUDGET'] = default_budget
@@ -0,0 +1,113 @@
+from tests.BaseCase import BaseCase
+from school_api.models.models import StudentModel, GroupModel
+
+
+class TestBatch(BaseCase):
+    def batch(self, requests, **body):
+        return self.client.post('api/v1/batch', json={'requests': requests, **body})
+
+    def test_batch_results_as_separate_requests(self):
+        with self.app.app_context():
+            paths = ['/api/v1/groups/1', '/api/v1/groups/1/students?fields=id,first_name',
+                     '/api/v1/students?limit=2', '/api/v1/students/1/courses', '/api/v1/students/9999']
+            response = self.batch([{'method': 'GET', 'path': path} for path in paths])
+            self.assertEqual(response.status_code, 200)
+
+            for path, result in zip(paths, response.json):
+                with self.subTest(path=path):
+                    expected = self.client.get(path)
+                    self.assertEqual(result['status'], expected.status_code)
+                    self.assertEqual(result['body'], expected.json)
+                    self.assertEqual(result['headers'].get('Link'), expected.headers.get('Link'))
+
+            # requests of a batch are counted to its own metrics
+            self.assertIn('statements', response.headers['Server-Timing'])
+
+    def test_batch_without_transaction(self):
+        with self.app.app_context():
+            response = self.batch([
+                {'method': 'POST', 'path': '/api/v1/students', 'body': {'first_name': 'Ann', 'last_name': 'Lee'}},
+                {'method': 'PUT', 'path': '/api/v1/groups/9999', 'body': {'group_name': 'none'}},
+                {'method': 'POST', 'path': '/api/v1/groups', 'body': {'group_name': 'new group'}},
+            ])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([result['status'] for result in response.json], [201, 404, 201])
+
+            # requests before and after the failed one are committed
+            self.assertEqual(StudentModel.query.filter_by(first_name='Ann', last_name='Lee').count(), 1)
+            self.assertEqual(GroupModel.query.filter_by(name='new group').count(), 1)
+
+    def test_batch_transaction_commits(self):
+        with self.app.app_context():
+            group = self.client.get('api/v1/groups/1').json
+            response = self.batch([
+                {'method': 'POST', 'path': '/api/v1/students',
+                 'body': {'first_name': 'Ann', 'last_name': 'Lee', 'group_id': 1}},
+                {'method': 'GET', 'path': '/api/v1/groups/1'},
+                {'method': 'DELETE', 'path': f'/api/v1/students/{group["students"][0]}'},
+            ], transaction=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([result['status'] for result in response.json], [201, 200, 204])
+
+            # later requests read writes of the earlier ones, not cached responses
+            student_id = response.json[0]['body']['id']
+            self.assertEqual(response.json[1]['body']['students'], group['students'] + [student_id])
+
+            group_after = self.client.get('api/v1/groups/1').json
+            self.assertEqual(group_after['students'], group['students'][1:] + [student_id])
+            self.assertEqual(group_after['student_count'], group['student_count'])
+
+    def test_batch_transaction_rolls_back(self):
+        with self.app.app_context():
+            group = self.client.get('api/v1/groups/1')
+            response = self.batch([
+                {'method': 'POST', 'path': '/api/v1/students',
+                 'body': {'first_name': 'Ann', 'last_name': 'Lee', 'group_id': 1}},
+                {'method': 'PUT', 'path': '/api/v1/groups/1', 'body': {'group_name': 'renamed'}},
+                {'method': 'GET', 'path': '/api/v1/groups/1'},
+                {'method': 'PUT', 'path': '/api/v1/students/9999', 'body': {'first_name': 'Bob'}},
+                {'method': 'POST', 'path': '/api/v1/groups', 'body': {'group_name': 'never created'}},
+            ], transaction=True)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(response.json['errors']), ['3'])
+            self.assertEqual(response.json['errors']['3']['status'], 404)
+
+            self.assertEqual(StudentModel.query.filter_by(first_name='Ann', last_name='Lee').count(), 0)
+            self.assertEqual(GroupModel.query.filter_by(name='never created').count(), 0)
+            # neither rolled back data nor its versions were cached
+            self.assertEqual(self.client.get('api/v1/groups/1').json, group.json)
+            response = self.client.get('api/v1/groups/1', headers={'If-None-Match': group.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+
+    def test_batch_query_budget(self):
+        with self.app.app_context(), self.query_budget(3):
+            # every request of the batch has the budget
+            response = self.batch([{'method': 'GET', 'path': f'/api/v1/students/{student_id}'}
+                                   for student_id in range(1, 11)])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual({result['status'] for result in response.json}, {200})
+
+    def test_batch_invalid(self):
+        with self.app.app_context():
+            self.assertEqual(self.client.post('api/v1/batch', json=[]).status_code, 400)
+            self.assertEqual(self.client.post('api/v1/batch', json={'requests': {}}).status_code, 400)
+            self.assertEqual(self.batch([], transaction='yes').status_code, 400)
+
+            response = self.batch([{'method': 'GET', 'path': '/api/v1/groups'},
+                                   'not a request',
+                                   {'method': 'PATCH', 'path': '/api/v1/groups'},
+                                   {'method': 'GET', 'path': 'api/v1/groups'},
+                                   {'method': 'GET', 'path': '/apidocs'},
+                                   {'method': 'POST', 'path': '/api/v1/batch'},
+                                   {'method': 'DELETE', 'path': '/api/v1/groups'},
+                                   {'method': 'GET', 'path': '/api/v1/groups', 'headers': {'Accept': 1}},
+                                   {'method': 'PUT', 'path': '/api/v1/groups/1/students', 'body': {'students': [1]},
+                                    'headers': {'Prefer': 'respond-async'}}], transaction=True)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(sorted(map(int, response.json['errors'])), list(range(1, 9)))
+
+            self.app.config['BATCH_MAX_REQUESTS'], default = 2, self.app.config['BATCH_MAX_REQUESTS']
+            try:
+                self.assertEqual(self.batch([{'path': '/api/v1/groups'}] * 3).status_code, 413)
+            finally:
+                self.app.config['BATCH_MAX_REQUESTS'] = default
@@ -0,0 +1,153 @@
+import json
+import time
+
+from tests.BaseCase import BaseCase
+from school_api.cache import ResponseCache
+
+
+class TestResponseCache(BaseCase):
+    def test_repeated_get_is_cached(self):
+        with self.app.app_context():
+            stats_before = self.client.get('api/v1/internal/cache').json
+
+            response = self.client.get('api/v1/groups/1/students')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+
+            with self.query_budget(0):
+                cached_response = self.client.get('api/v1/groups/1/students')
+            self.assertEqual(cached_response.headers['X-Cache'], 'HIT')
+            self.assertEqual(cached_response.json, response.json)
+
+            response = self.client.get('api/v1/groups/1/students?limit=5')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+
+            stats = self.client.get('api/v1/internal/cache').json
+            self.assertEqual(stats['hits'] - stats_before['hits'], 1)
+            self.assertEqual(stats['misses'] - stats_before['misses'], 2)
+
+    def test_cache_stats_disabled(self):
+        self.app.config['INTERNAL_ENDPOINTS_ENABLED'] = False
+        try:
+            with self.app.app_context():
+                self.assertEqual(self.client.get('api/v1/internal/cache').status_code, 404)
+        finally:
+            self.app.config['INTERNAL_ENDPOINTS_ENABLED'] = True
+
+    def test_membership_change_invalidates(self):
+        with self.app.app_context():
+            students_before = self.client.get('api/v1/groups/1/students').json
+            group_before = self.client.get('api/v1/groups/1').json
+
+            self.client.delete('api/v1/groups/1/students',
+                               data=json.dumps({'students': [students_before[0]['id']]}),
+                               content_type='application/json')
+
+            response = self.client.get('api/v1/groups/1/students')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(len(response.json), len(students_before) - 1)
+
+            response = self.client.get('api/v1/groups/1')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(len(response.json['students']), len(group_before['students']) - 1)
+
+    def test_enrollment_change_invalidates(self):
+        with self.app.app_context():
+            course = self.client.get('api/v1/courses/1').json
+            student_id = course['students'][0]
+            self.client.get(f'api/v1/students/{student_id}/courses')
+
+            self.client.delete(f'api/v1/courses/1/students',
+                               data=json.dumps({'students': [student_id]}),
+                               content_type='application/json')
+
+            response = self.client.get('api/v1/courses/1')
+            self.assertNotIn(student_id, response.json['students'])
+            response = self.client.get(f'api/v1/students/{student_id}/courses')
+            self.assertNotIn(1, [course['id'] for course in response.json])
+
+    def test_unrelated_write_keeps_entries(self):
+        with self.app.app_context():
+            self.client.get('api/v1/groups')
+            self.client.post('api/v1/courses',
+                             data=json.dumps({'course_name': 'Magic'}),
+                             content_type='application/json')
+
+            response = self.client.get('api/v1/groups')
+            self.assertEqual(response.headers['X-Cache'], 'HIT')
+
+    def test_lru_eviction_and_ttl(self):
+        cache = ResponseCache()
+        cache.max_size = 2
+        cache.set('a', 1, ('groups',), cache.generation)
+        cache.set('b', 2, ('students',), cache.generation)
+        cache.get('a')
+        cache.set('c', 3, ('groups',), cache.generation)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.invalidate(['groups'])
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('c'))
+
+        cache.ttl = 0.01
+        cache.set('d', 4, ('courses',), cache.generation)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('d'))
+
+        generation = cache.generation
+        cache.invalidate(['courses'])
+        cache.set('e', 5, ('courses',), generation)
+        self.assertIsNone(cache.get('e'))
+
+
+class TestConditionalGet(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.app.extensions['response_cache'].enabled = False
+
+    def tearDown(self):
+        self.app.extensions['response_cache'].enabled = True
+        super().tearDown()
+
+    def test_not_modified(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/groups')
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers['ETag']
+
+            # only data versions are read
+            with self.query_budget(1):
+                response = self.client.get('api/v1/groups', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(response.headers['ETag'], etag)
+
+            response = self.client.get('api/v1/groups?max_students=20', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+
+    def test_write_changes_etag(self):
+        with self.app.app_context():
+            etag = self.client.get('api/v1/groups').headers['ETag']
+
+            self.client.post('api/v1/courses',
+                             data=json.dumps({'course_name': 'Magic'}),
+                             content_type='application/json')
+            response = self.client.get('api/v1/groups', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+            self.client.post('api/v1/groups',
+                             data=json.dumps({'group_name': 'ЯЯ-99'}),
+                             content_type='application/json')
+            response = self.client.get('api/v1/groups', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+            self.assertIn('ЯЯ-99', [group['name'] for group in response.json])
+
+    def test_cached_response_not_modified(self):
+        with self.app.app_context():
+            self.app.extensions['response_cache'].enabled = True
+            etag = self.client.get('api/v1/courses').headers['ETag']
+
+            with self.query_budget(0):
+                response = self.client.get('api/v1/courses', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
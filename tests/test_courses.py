@@ -125,3 +125,70 @@ class TestCourses(BaseCase):
 
             for student_id in students_for_remove['students']:
                 self.assertNotIn((student_id,), students_on_course)
+
+    def test_get_courses_pagination(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/courses?limit=4')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([course['id'] for course in response.json], [1, 2, 3, 4])
+            self.assertIn('rel="next"', response.headers['Link'])
+
+            response = self.client.get(response.headers['Link'].split(';')[0].strip('<>'))
+            self.assertEqual([course['id'] for course in response.json], [5, 6, 7, 8])
+
+            response = self.client.get(response.headers['Link'].split(';')[0].strip('<>'))
+            self.assertEqual([course['id'] for course in response.json], [9, 10])
+            self.assertNotIn('Link', response.headers)
+
+    def test_courses_query_budget(self):
+        with self.app.app_context(), self.query_budget(3):
+            self.assertEqual(self.client.get('api/v1/courses').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/courses/1').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/courses/1/students').status_code, 200)
+
+    def test_add_students_to_course_report(self):
+        with self.app.app_context():
+            course_id = 2
+            enrolled = [student_id for student_id, in (db.session.query(StudentModel.id)
+                                                       .join(StudentModel.courses)
+                                                       .filter(CourseModel.id == course_id))]
+            not_enrolled = [student_id for student_id, in (db.session.query(StudentModel.id)
+                                                           .filter(StudentModel.id.notin_(enrolled))
+                                                           .limit(3))]
+
+            # course lookup, ids validation, enrolled lookup, one insert, updated_at of students and data version bump
+            with self.query_budget(6):
+                response = self.client.post(f'api/v1/courses/{course_id}/students',
+                                            data=json.dumps({'students': not_enrolled + enrolled[:2] + [1000000]}),
+                                            content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json, {'added': sorted(not_enrolled),
+                                             'unknown': [1000000],
+                                             'already_enrolled': sorted(enrolled[:2])})
+
+    def test_add_students_to_course_validation(self):
+        with self.app.app_context():
+            response = self.client.post('api/v1/courses/2/students',
+                                        data=json.dumps({'students': ['1']}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post('api/v1/courses/1000000/students',
+                                        data=json.dumps({'students': [1]}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 404)
+
+    def test_create_courses_bulk(self):
+        with self.app.app_context():
+            courses = [{'course_name': 'Magic', 'description': 'description'}, {'course_name': 'Alchemy'}]
+            response = self.client.post('api/v1/courses',
+                                        data=json.dumps(courses),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([(course['name'], course['description']) for course in response.json],
+                             [('Magic', 'description'), ('Alchemy', None)])
+
+            response = self.client.post('api/v1/courses',
+                                        data=json.dumps([{'course_name': 'Magic'}]),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,52 @@
+import unittest
+from school_api.app import create_app
+from school_api.db import create_tables, drop_tables
+from school_api import data_generator
+from school_api.models.models import StudentModel, GroupModel, CourseModel, student_course, db
+
+
+class TestDataGenerator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('test')
+
+    def tearDown(self):
+        drop_tables(self.app)
+
+    def generate(self, **kwargs):
+        drop_tables(self.app)
+        create_tables(self.app)
+        data_generator.test_db(self.app, **kwargs)
+        with self.app.app_context():
+            return (db.session.query(GroupModel.id, GroupModel.name).order_by(GroupModel.id).all(),
+                    db.session.query(CourseModel.id, CourseModel.name).order_by(CourseModel.id).all(),
+                    db.session.query(StudentModel.id, StudentModel.first_name, StudentModel.last_name,
+                                     StudentModel.group_id).order_by(StudentModel.id).all(),
+                    db.session.query(student_course).order_by(student_course.c.student_id,
+                                                              student_course.c.course_id).all())
+
+    def test_sizes_and_distributions(self):
+        groups, courses, students, enrollments = self.generate(groups=30, students=1000, courses=40,
+                                                               group_size=(5, 20), courses_per_student=(2, 4),
+                                                               chunk_size=300)
+        self.assertEqual(len(groups), 30)
+        self.assertEqual(len(courses), 40)
+        self.assertEqual(len(students), 1000)
+
+        with self.app.app_context():
+            sizes = dict(db.session.query(StudentModel.group_id, db.func.count(StudentModel.id))
+                         .group_by(StudentModel.group_id))
+            # at most 30 * 20 students fit into groups, others stay without group
+            self.assertGreaterEqual(sizes.pop(None), 1000 - 30 * 20)
+            self.assertTrue(all(5 <= size <= 20 for size in sizes.values()))
+
+            per_student = dict(db.session.query(student_course.c.student_id, db.func.count())
+                               .group_by(student_course.c.student_id))
+            self.assertEqual(len(per_student), 1000)
+            self.assertTrue(all(2 <= count <= 4 for count in per_student.values()))
+
+    def test_same_seed_same_data(self):
+        kwargs = dict(groups=20, students=500, courses=15, course_popularity='zipf', chunk_size=100)
+        data = self.generate(**kwargs)
+        self.assertEqual(self.generate(processes=2, **kwargs), data)
+        self.assertNotEqual(self.generate(seed=7, **kwargs), data)
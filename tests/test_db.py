@@ -0,0 +1,97 @@
+from tests.BaseCase import BaseCase
+from school_api.db import upgrade_tables, check_student_counts, rebuild_student_counts
+from school_api.models.models import StudentModel, student_course, db
+
+
+class TestUpgradeTables(BaseCase):
+    def test_upgrade_legacy_tables(self):
+        with self.app.app_context():
+            enrollments = {tuple(row) for row in db.session.execute(db.select([student_course.c.student_id,
+                                                                              student_course.c.course_id]))}
+
+            # tables as created before student_course got primary key and indexes
+            db.session.execute('DROP INDEX ix_student_group_id')
+            db.session.execute('ALTER TABLE student_model RENAME TO student_model_copy')
+            db.session.execute('CREATE TABLE student_model (student_id INTEGER REFERENCES student (id), '
+                               'course_id INTEGER REFERENCES course (id))')
+            db.session.execute('INSERT INTO student_model SELECT student_id, course_id FROM student_model_copy')
+            db.session.execute('INSERT INTO student_model SELECT student_id, course_id FROM student_model_copy')
+            db.session.execute('INSERT INTO student_model VALUES (1000000, 1)')
+            db.session.execute('DROP TABLE student_model_copy')
+            db.session.commit()
+
+        upgrade_tables(self.app)
+        upgrade_tables(self.app)
+
+        with self.app.app_context():
+            inspector = db.inspect(db.engine)
+            self.assertEqual(inspector.get_pk_constraint('student_model')['constrained_columns'],
+                             ['student_id', 'course_id'])
+            self.assertIn('ix_student_model_course_id_student_id',
+                          {index['name'] for index in inspector.get_indexes('student_model')})
+            self.assertIn('ix_student_group_id', {index['name'] for index in inspector.get_indexes('student')})
+
+            upgraded = [tuple(row) for row in db.session.execute(db.select([student_course.c.student_id,
+                                                                            student_course.c.course_id]))]
+            self.assertEqual(len(upgraded), len(enrollments))
+            self.assertEqual(set(upgraded), enrollments)
+
+    def test_upgrade_adds_student_count(self):
+        with self.app.app_context():
+            db.session.execute('DROP INDEX ix_group_student_count')
+            db.session.execute('ALTER TABLE "group" DROP COLUMN student_count')
+            db.session.commit()
+
+        upgrade_tables(self.app)
+
+        with self.app.app_context():
+            inspector = db.inspect(db.engine)
+            self.assertIn('student_count', {column['name'] for column in inspector.get_columns('group')})
+            self.assertIn('ix_group_student_count', {index['name'] for index in inspector.get_indexes('group')})
+        self.assertEqual(check_student_counts(self.app), [])
+
+    def test_upgrade_adds_updated_at(self):
+        with self.app.app_context():
+            db.session.execute('DROP INDEX ix_student_updated_at')
+            db.session.execute('ALTER TABLE student DROP COLUMN updated_at')
+            db.session.commit()
+
+        upgrade_tables(self.app)
+
+        with self.app.app_context():
+            inspector = db.inspect(db.engine)
+            self.assertIn('updated_at', {column['name'] for column in inspector.get_columns('student')})
+            self.assertIn('ix_student_updated_at', {index['name'] for index in inspector.get_indexes('student')})
+            self.assertEqual(db.session.query(StudentModel).filter(StudentModel.updated_at.is_(None)).count(), 0)
+            self.assertEqual(len({student.updated_at for student in StudentModel.query}), 1)
+
+
+class TestStudentCounts(BaseCase):
+    def test_check_and_rebuild(self):
+        self.assertEqual(check_student_counts(self.app), [])
+        with self.app.app_context():
+            db.session.execute('UPDATE "group" SET student_count = student_count + 7 WHERE id IN (2, 5)')
+            db.session.commit()
+
+        self.assertEqual([group_id for group_id, _, _ in check_student_counts(self.app)], [2, 5])
+        self.assertEqual(rebuild_student_counts(self.app), 2)
+        self.assertEqual(check_student_counts(self.app), [])
+
+    def test_upgrade_creates_search(self):
+        with self.app.app_context():
+            db.session.execute('DROP TABLE student_search')
+            for trigger in ('insert', 'delete', 'update'):
+                db.session.execute(f'DROP TRIGGER student_search_{trigger}')
+            db.session.execute('DROP INDEX ix_student_lower_first_name')
+            db.session.commit()
+
+        upgrade_tables(self.app)
+        upgrade_tables(self.app)
+
+        with self.app.app_context():
+            student = StudentModel.query.get(1)
+            # exact and substring matches, student 1 is the first of its rank
+            for q in (student.first_name, student.last_name[1:]):
+                self.assertIn(1, [item['id'] for item in self.client.get(f'api/v1/students?q={q}').json])
+            self.client.put('api/v1/students/1', json={'first_name': 'Zelda'})
+            self.assertEqual([item['id'] for item in self.client.get('api/v1/students?q=eld').json], [1])
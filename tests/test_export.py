@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from tests.BaseCase import BaseCase
+from school_api.exporter import parse_since, write_export
+from school_api.models.models import StudentModel, db
+
+
+class TestExport(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['STREAM_CHUNK_SIZE'], self.chunk_size = 7, self.app.config['STREAM_CHUNK_SIZE']
+
+    def tearDown(self):
+        self.app.config['STREAM_CHUNK_SIZE'] = self.chunk_size
+        super().tearDown()
+
+    def expected(self, student_ids=None):
+        query = StudentModel.query.order_by(StudentModel.id)
+        if student_ids is not None:
+            query = query.filter(StudentModel.id.in_(student_ids))
+        return [{'id': student.id,
+                 'first_name': student.first_name,
+                 'last_name': student.last_name,
+                 'group': student.group.name if student.group else None,
+                 'courses': sorted(course.id for course in student.courses)} for student in query]
+
+    def export(self, url='api/v1/students/export', **kwargs):
+        response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+        for record in records:
+            datetime.fromisoformat(record.pop('updated_at'))
+        return records
+
+    def test_export_ndjson_in_one_statement(self):
+        statements = []
+
+        def count(*args):
+            statements.append(args[2])
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                response = self.client.get('api/v1/students/export')
+                records = [json.loads(line) for line in response.data.decode().splitlines()]
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            self.assertEqual(len([statement for statement in statements if 'student' in statement]), 1)
+            for record in records:
+                del record['updated_at']
+            self.assertEqual(records, self.expected())
+
+    def test_export_csv(self):
+        with self.app.app_context():
+            for kwargs in ({'query_string': {'format': 'csv'}}, {'headers': {'Accept': 'text/csv'}}):
+                response = self.client.get('api/v1/students/export', **kwargs)
+                self.assertEqual(response.mimetype, 'text/csv')
+                rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+                self.assertEqual([{'id': int(row['id']),
+                                   'first_name': row['first_name'],
+                                   'last_name': row['last_name'],
+                                   'group': row['group'] or None,
+                                   'courses': [int(course_id) for course_id in row['courses'].split()]}
+                                  for row in rows], self.expected())
+
+    def test_export_since(self):
+        with self.app.app_context():
+            since = datetime.utcnow()
+            self.assertEqual(self.export(query_string={'since': since.isoformat()}), [])
+
+            unassigned = StudentModel.query.filter_by(group_id=None).first().id
+            renamed = StudentModel.query.filter(StudentModel.group_id == 2).all()
+            self.client.post('api/v1/students/1/courses', json={'courses': [9, 10]})
+            self.client.post('api/v1/courses/8/students', json={'students': [3]})
+            self.client.post('api/v1/groups/1/students', json={'students': [unassigned]})
+            self.client.put('api/v1/groups/2', json={'group_name': 'renamed'})
+            self.client.put('api/v1/students/4', json={'first_name': 'changed'})
+            changed = {1, 3, 4, unassigned, *(student.id for student in renamed)}
+
+            self.assertEqual(self.export(query_string={'since': since.isoformat()}), self.expected(changed))
+            # the same time in other zone
+            since = since.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))
+            self.assertEqual(self.export(query_string={'since': since.isoformat()}), self.expected(changed))
+
+            # manage.py export parses since the same way
+            file = io.StringIO()
+            write_export(file, since=parse_since(since.isoformat()), chunk_size=3)
+            self.assertEqual({json.loads(line)['id'] for line in file.getvalue().splitlines()}, changed)
+
+    def test_invalid_arguments(self):
+        with self.app.app_context():
+            self.assertEqual(self.client.get('api/v1/students/export?format=xml').status_code, 400)
+            self.assertEqual(self.client.get('api/v1/students/export?since=yesterday').status_code, 400)
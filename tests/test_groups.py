@@ -2,7 +2,9 @@ import unittest
 import json
 
 from tests.BaseCase import BaseCase
-from school_api.models.models import GroupModel, db
+from school_api.models.models import GroupModel, StudentModel, db
+from school_api.db import check_student_counts
+from school_api.services.services import query_group_with_less_students
 
 
 class TestGroups(BaseCase):
@@ -131,4 +133,166 @@ class TestGroups(BaseCase):
 
             for group in groups:
                 students_in_group = len(group['students'])
-                self.assertLess(students_in_group, number_of_students)
+                self.assertLessEqual(students_in_group, number_of_students)
+
+    def test_get_group_with_less_students_pagination(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/groups?max_students=20')
+            groups_all = response.json
+
+            response = self.client.get('api/v1/groups?max_students=20&limit=2')
+            self.assertEqual(response.status_code, 200)
+            groups = response.json
+            while 'Link' in response.headers:
+                response = self.client.get(response.headers['Link'].split(';')[0].strip('<>'))
+                groups.extend(response.json)
+
+            self.assertEqual(groups, groups_all)
+
+    def test_groups_query_budget(self):
+        with self.app.app_context(), self.query_budget(3):
+            self.assertEqual(self.client.get('api/v1/groups').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/groups?max_students=20').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/groups/1').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/groups/1/students').status_code, 200)
+
+    def test_add_students_to_group_report(self):
+        with self.app.app_context():
+            group_id = 1
+            in_group = [student.id for student in GroupModel.query.get(group_id).students]
+            others = [student_id for student_id, in (db.session.query(StudentModel.id)
+                                                     .filter(StudentModel.id.notin_(in_group))
+                                                     .limit(300))]
+
+            # group lookup, students lookup, one update for the whole cohort, one update of student counts
+            # and data version bump
+            with self.query_budget(5):
+                response = self.client.post(f'api/v1/groups/{group_id}/students',
+                                            data=json.dumps({'students': others + in_group[:1] + [1000000]}),
+                                            content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json, {'added': sorted(others),
+                                             'unknown': [1000000],
+                                             'already_in_group': in_group[:1]})
+
+            in_group_after = {student.id for student in GroupModel.query.get(group_id).students}
+            self.assertEqual(in_group_after, set(in_group) | set(others))
+
+    def test_remove_students_from_group_report(self):
+        with self.app.app_context():
+            group_id = 1
+            in_group = [student.id for student in GroupModel.query.get(group_id).students]
+            not_in_group = StudentModel.query.filter(StudentModel.group_id != group_id).first().id
+
+            response = self.client.delete(f'api/v1/groups/{group_id}/students',
+                                          data=json.dumps({'students': in_group[:2] + [not_in_group, 1000000]}),
+                                          content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {'removed': sorted(in_group[:2]),
+                                             'unknown': [1000000],
+                                             'not_in_group': [not_in_group]})
+
+    def test_transfer_group_students(self):
+        with self.app.app_context():
+            students_from = {student.id for student in GroupModel.query.get(1).students}
+            students_to = {student.id for student in GroupModel.query.get(2).students}
+
+            response = self.client.post('api/v1/groups/1/students/transfer',
+                                        data=json.dumps({'to_group_id': 2}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {'moved': len(students_from)})
+
+            self.assertEqual(GroupModel.query.get(1).students, [])
+            self.assertEqual({student.id for student in GroupModel.query.get(2).students},
+                             students_from | students_to)
+
+            response = self.client.post('api/v1/groups/2/students/transfer',
+                                        data=json.dumps({'to_group_id': 2}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post('api/v1/groups/2/students/transfer',
+                                        data=json.dumps({'to_group_id': 1000000}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 404)
+
+            for to_group_id in (True, False, '3'):
+                response = self.client.post('api/v1/groups/2/students/transfer', json={'to_group_id': to_group_id})
+                self.assertEqual(response.status_code, 400)
+            self.assertEqual(GroupModel.query.get(1).students, [])
+
+    def test_create_groups_bulk(self):
+        with self.app.app_context():
+            groups = [{'group_name': f'ЯЯ-{i}'} for i in range(10)]
+            response = self.client.post('api/v1/groups',
+                                        data=json.dumps(groups),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([group['name'] for group in response.json],
+                             [group['group_name'] for group in groups])
+            self.assertEqual(GroupModel.query.filter(GroupModel.name.like('ЯЯ-%')).count(), 10)
+
+    def test_create_groups_bulk_validation(self):
+        with self.app.app_context():
+            existing_name = GroupModel.query.get(1).name
+            groups = [{'group_name': 'ЯЯ-1'}, {'group_name': 'ЯЯ-1'}, {'group_name': existing_name}, {}]
+            response = self.client.post('api/v1/groups',
+                                        data=json.dumps(groups),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.json['errors']), {'3'})
+
+            response = self.client.post('api/v1/groups',
+                                        data=json.dumps(groups[:3]),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.json['errors']), {'1', '2'})
+            self.assertEqual(GroupModel.query.filter(GroupModel.name == 'ЯЯ-1').count(), 0)
+
+    def test_groups_sparse_fields(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/groups?fields=name&max_students=1000')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json), GroupModel.query.count())
+            for group in response.json:
+                self.assertEqual(set(group), {'name'})
+
+    def test_student_count_maintained(self):
+        with self.app.app_context():
+            empty_group = self.client.post('api/v1/groups', json=[{'group_name': 'empty'}]).json[0]
+            self.assertEqual(empty_group['student_count'], 0)
+
+            ungrouped = [student.id for student in StudentModel.query.filter(StudentModel.group_id.is_(None))]
+            requests = [('post', 'api/v1/groups/1/students', {'students': [1, 2, 3, 50, 100] + ungrouped[:2]}),
+                        ('delete', 'api/v1/groups/2/students', {'students': list(range(1, 200))}),
+                        ('post', 'api/v1/groups/3/students/transfer', {'to_group_id': 4}),
+                        ('put', 'api/v1/students/150', {'group_id': 5}),
+                        ('put', 'api/v1/students/151', {'group_id': 5}),
+                        ('delete', 'api/v1/students/152', None),
+                        ('post', 'api/v1/students', [{'first_name': 'a', 'last_name': 'b', 'group_id': 6},
+                                                     {'first_name': 'c', 'last_name': 'd', 'group_id': 6},
+                                                     {'first_name': 'e', 'last_name': 'f'}]),
+                        ('delete', 'api/v1/groups/7', None)]
+            for method, url, body in requests:
+                response = self.client.open(url, method=method.upper(), json=body)
+                self.assertLess(response.status_code, 300, f'{method} {url}')
+
+            self.assertEqual(check_student_counts(self.app), [])
+            for group in self.client.get('api/v1/groups').json:
+                self.assertEqual(group['student_count'], len(group['students']))
+
+    def test_less_students_includes_empty_groups(self):
+        with self.app.app_context():
+            empty_group = self.client.post('api/v1/groups', json=[{'group_name': 'empty'}]).json[0]
+
+            response = self.client.get('api/v1/groups?max_students=0')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(empty_group, response.json)
+            self.assertEqual({group['student_count'] for group in response.json}, {0})
+            self.assertEqual(self.client.get('api/v1/groups?max_students=0&q=empty').json, [empty_group])
+            self.assertEqual(self.client.get('api/v1/groups?max_students=0&q=CR').json, [])
+
+            plan = db.session.execute(f'EXPLAIN QUERY PLAN {query_group_with_less_students(20).statement}',
+                                      {'student_count_1': 20}).fetchall()
+            self.assertIn('ix_group_student_count', ' '.join(str(row) for row in plan))
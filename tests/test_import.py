@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import tempfile
+from tests.BaseCase import BaseCase
+from school_api.db import check_student_counts
+from school_api.importer import import_file, ImportFailed
+from school_api.models.models import StudentModel, GroupModel, CourseModel, JobModel, db
+
+
+class TestImport(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def ndjson(self, name, records):
+        return self.write(name, ''.join(json.dumps(record) + '\n' for record in records))
+
+    def test_import_every_kind(self):
+        groups = self.write('groups.csv', 'name\nZZ-01\nZZ-02\n')
+        courses = self.ndjson('courses.ndjson', [{'name': 'Astronomy', 'description': 'Stars'},
+                                                 {'name': 'Botany'}])
+        students = self.write('students.csv', 'id,first_name,last_name,group\n'
+                                              '1000,Ann,Lee,ZZ-01\n1001,Bob,Ray,\n,Cid,Fox,ZZ-02\n')
+        enrollments = self.ndjson('enrollments.ndjson', [{'student_id': 1000, 'course': 'Astronomy'},
+                                                         {'student_id': 1000, 'course': 'Botany'},
+                                                         {'student_id': 1001, 'course': 'Botany'}])
+
+        self.assertEqual(import_file(self.app, 'groups', groups), {'records': 2, 'imported': 2})
+        self.assertEqual(import_file(self.app, 'courses', courses), {'records': 2, 'imported': 2})
+        self.assertEqual(import_file(self.app, 'students', students, chunk_size=2), {'records': 3, 'imported': 3})
+        self.assertEqual(import_file(self.app, 'enrollments', enrollments), {'records': 3, 'imported': 3})
+
+        with self.app.app_context():
+            group = GroupModel.query.filter_by(name='ZZ-01').one()
+            self.assertEqual([student.id for student in group.students], [1000])
+            self.assertEqual(group.student_count, 1)
+            self.assertEqual(CourseModel.query.filter_by(name='Astronomy').one().description, 'Stars')
+            self.assertIsNone(StudentModel.query.get(1001).group_id)
+            self.assertEqual(StudentModel.query.filter_by(first_name='Cid').one().group.name, 'ZZ-02')
+            self.assertEqual(sorted(course.name for course in StudentModel.query.get(1000).courses),
+                             ['Astronomy', 'Botany'])
+            self.assertEqual({job.status for job in JobModel.query}, {'succeeded'})
+        self.assertEqual(check_student_counts(self.app), [])
+
+    def test_failed_import_resumes_after_last_chunk(self):
+        path = self.write('students.csv', 'first_name,last_name,group\n'
+                                          'A,A,\nB,B,\nC,C,NOPE\nD,D,\nE,E,\n')
+        with self.app.app_context():
+            students = StudentModel.query.count()
+
+        with self.assertRaisesRegex(ImportFailed, 'record 3: unknown group NOPE'):
+            import_file(self.app, 'students', path, chunk_size=2)
+        with self.app.app_context():
+            job = JobModel.query.filter_by(operation='import_students').one()
+            self.assertEqual((job.status, job.progress), ('failed', 2))
+            self.assertEqual(job.error['message'], 'record 3: unknown group NOPE')
+            self.assertEqual(StudentModel.query.count(), students + 2)
+
+        self.write('students.csv', 'first_name,last_name,group\nA,A,\nB,B,\nC,C,\nD,D,\nE,E,\n')
+        self.assertEqual(import_file(self.app, 'students', path, chunk_size=2), {'records': 5, 'imported': 3})
+        with self.app.app_context():
+            self.assertEqual(JobModel.query.filter_by(operation='import_students').one().status, 'succeeded')
+            self.assertEqual(sorted(student.first_name for student in StudentModel.query.filter(
+                StudentModel.first_name.in_('ABCDE'))), ['A', 'B', 'C', 'D', 'E'])
+
+    def test_restart_imports_whole_file_again(self):
+        path = self.ndjson('enrollments.ndjson', [{'student_id': 1, 'course': 'Zoology'}, {'not': 'valid'}])
+        with self.app.app_context():
+            db.session.add(CourseModel(name='Zoology'))
+            db.session.commit()
+
+        with self.assertRaisesRegex(ImportFailed, 'record 2: course is required'):
+            import_file(self.app, 'enrollments', path, chunk_size=1)
+        self.ndjson('enrollments.ndjson', [{'student_id': 1, 'course': 'Zoology'},
+                                           {'student_id': 2, 'course': 'Zoology'}])
+        self.assertEqual(import_file(self.app, 'enrollments', path, restart=True), {'records': 2, 'imported': 2})
+
+        with self.app.app_context():
+            self.assertEqual([job.status for job in JobModel.query.order_by(JobModel.id)], ['failed', 'succeeded'])
+            # enrollment imported before restart is not duplicated
+            self.assertEqual([student.id for student in CourseModel.query.filter_by(name='Zoology').one().students],
+                             [1, 2])
+
+    def test_invalid_file(self):
+        encoded = os.path.join(self.directory, 'groups.csv')
+        with open(encoded, 'wb') as file:
+            file.write('name\nZZ-01\nZZ-Ä\n'.encode('latin-1'))
+        oversized = self.write('courses.csv', f'name,description\nZoology,{"x" * 200000}\n')
+        for kind, path, error in (('groups', encoded, 'line 3: file has to be UTF-8'),
+                                  ('courses', oversized, 'record 1: invalid CSV, field larger than field limit')):
+            with self.subTest(path=path):
+                with self.assertRaisesRegex(ImportFailed, error):
+                    import_file(self.app, kind, path)
+                with self.app.app_context():
+                    job = JobModel.query.filter_by(operation=f'import_{kind}').one()
+                    self.assertEqual(job.status, 'failed')
+                    self.assertRegex(job.error['message'], error)
+
+        with self.app.app_context():
+            self.assertIsNone(GroupModel.query.filter_by(name='ZZ-01').one_or_none())
+
+    def test_invalid_ndjson(self):
+        path = self.write('groups.ndjson', '{"name": "ZZ-01"}\n{"name": \n')
+        with self.assertRaisesRegex(ImportFailed, 'line 2: invalid JSON'):
+            import_file(self.app, 'groups', path)
+        with self.app.app_context():
+            self.assertIsNone(GroupModel.query.filter_by(name='ZZ-01').one_or_none())
@@ -0,0 +1,59 @@
+import os
+from unittest import mock
+from tests.BaseCase import BaseCase
+from school_api.config import optional_float
+from school_api.instrumentation import slow_query_log
+
+
+class TestInstrumentation(BaseCase):
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response.headers['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/students')
+            self.assertEqual(response.status_code, 200)
+
+            metrics = self.server_timing(response)
+            self.assertEqual(set(metrics), {'db', 'serialize', 'total'})
+            # data versions for ETag, students with joined group and one select of their courses
+            self.assertEqual(metrics['db']['desc'], '"3 statements"')
+            self.assertGreater(float(metrics['serialize']['dur']), 0)
+            self.assertGreaterEqual(float(metrics['total']['dur']),
+                                    float(metrics['db']['dur']) + float(metrics['serialize']['dur']))
+
+    def test_server_timing_disabled(self):
+        self.app.config['SERVER_TIMING_ENABLED'] = False
+        try:
+            with self.app.app_context():
+                response = self.client.get('api/v1/students')
+                self.assertNotIn('Server-Timing', response.headers)
+        finally:
+            self.app.config['SERVER_TIMING_ENABLED'] = True
+
+    def test_slow_query_log(self):
+        threshold = self.app.config['SLOW_QUERY_THRESHOLD_MS']
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        try:
+            with self.app.app_context(), self.assertLogs(slow_query_log, 'WARNING') as logs:
+                self.client.get('api/v1/students?course_name=Math')
+            self.assertTrue(any('endpoint api_v1.students' in line and "'Math'" in line for line in logs.output))
+
+            self.app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+            with self.app.app_context(), self.assertRaises(AssertionError):
+                with self.assertLogs(slow_query_log, 'WARNING'):
+                    self.client.get('api/v1/students')
+        finally:
+            self.app.config['SLOW_QUERY_THRESHOLD_MS'] = threshold
+
+    def test_slow_query_threshold_from_environment(self):
+        for value, threshold in (('250', 250.0), ('', None), (' ', None)):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {'SLOW_QUERY_THRESHOLD_MS': value}):
+                self.assertEqual(optional_float('SLOW_QUERY_THRESHOLD_MS', 100), threshold)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('SLOW_QUERY_THRESHOLD_MS', None)
+            self.assertEqual(optional_float('SLOW_QUERY_THRESHOLD_MS', 100), 100.0)
@@ -0,0 +1,195 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from tests.BaseCase import BaseCase
+from school_api.app import create_app
+from school_api.db import create_tables, check_student_counts
+from school_api import data_generator, jobs
+from school_api.models.models import JobModel, StudentModel, student_course, db
+
+RESPOND_ASYNC = {'Prefer': 'respond-async'}
+
+
+class TestJobs(BaseCase):
+    def test_membership_job(self):
+        with self.app.app_context():
+            response = self.client.post('api/v1/groups/1/students', json={'students': [150, 151, 152, 100000]},
+                                        headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.headers['Preference-Applied'], 'respond-async')
+            job = self.client.get(response.headers['Location']).json
+            self.assertEqual(job['id'], response.json['id'])
+            self.assertEqual(job['operation'], 'add_students_to_group')
+            self.assertEqual(job['status'], 'succeeded')
+            self.assertEqual((job['progress'], job['total']), (4, 4))
+            self.assertEqual(job['result']['unknown'], [100000])
+            self.assertEqual({StudentModel.query.get(student_id).group_id for student_id in (150, 151, 152)}, {1})
+        self.assertEqual(check_student_counts(self.app), [])
+
+    def test_enrollment_job_runs_in_chunks(self):
+        self.app.config['JOB_CHUNK_SIZE'] = 3
+        try:
+            with self.app.app_context():
+                students = list(range(1, 11))
+                # job runs within the request when there are no workers,
+                # every chunk is a transaction with a savepoint of the service
+                with self.query_budget(60):
+                    response = self.client.post('api/v1/courses/1/students', json={'students': students},
+                                                headers=RESPOND_ASYNC)
+                job = response.json
+                self.assertEqual(job['status'], 'succeeded')
+                self.assertEqual(job['progress'], 10)
+                self.assertEqual(sorted(job['result']['added'] + job['result']['already_enrolled']), students)
+
+                with self.query_budget(30):
+                    response = self.client.delete('api/v1/students/1/courses', json={'courses': [1]},
+                                                  headers=RESPOND_ASYNC)
+                self.assertEqual(response.json['result'], {'removed': [1]})
+                enrolled = db.session.query(student_course).filter_by(student_id=1, course_id=1).first()
+                self.assertIsNone(enrolled)
+        finally:
+            self.app.config['JOB_CHUNK_SIZE'] = 1000
+
+    def test_chunk_is_committed_with_its_result(self):
+        self.app.config['JOB_CHUNK_SIZE'] = 3
+        try:
+            with self.app.app_context():
+                def enrolled():
+                    return {student_id for student_id, in (db.session.query(student_course.c.student_id)
+                                                           .filter(student_course.c.course_id == 1))}
+
+                before = enrolled()
+                merge, reports = jobs._merge_reports, []
+
+                def merge_until_second(merged, report):
+                    # the worker fails after the service of the second chunk committed its work
+                    reports.append(report)
+                    if len(reports) == 2:
+                        raise RuntimeError('lost worker')
+                    return merge(merged, report)
+
+                with mock.patch('school_api.jobs._merge_reports', merge_until_second), self.query_budget(60):
+                    response = self.client.post('api/v1/courses/1/students', json={'students': list(range(1, 11))},
+                                                headers=RESPOND_ASYNC)
+                self.assertEqual(response.json['status'], 'failed')
+
+                job = JobModel.query.get(response.json['id'])
+                self.assertEqual(job.progress, 3)
+                self.assertEqual(sorted(job.result['added'] + job.result['already_enrolled']), [1, 2, 3])
+                self.assertEqual(enrolled(), before | {1, 2, 3})
+        finally:
+            self.app.config['JOB_CHUNK_SIZE'] = 1000
+
+    def test_failed_job_reports_error(self):
+        with self.app.app_context():
+            response = self.client.post('api/v1/groups/1/students/transfer', json={'to_group_id': 1000},
+                                        headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json['status'], 'failed')
+            self.assertEqual(response.json['error']['status'], 404)
+
+            enrolled = {course_id for course_id, in (db.session.query(student_course.c.course_id)
+                                                     .filter(student_course.c.student_id == 1))}
+            not_enrolled = min(set(range(1, 11)) - enrolled)
+            # removal is checked before it is queued, as without the header
+            response = self.client.delete('api/v1/students/1/courses', json={'courses': [not_enrolled]},
+                                          headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json['message'], 'student with id=1 is not assigned to course')
+            response = self.client.delete('api/v1/courses/1/students', json={'students': [100000]},
+                                          headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(JobModel.query.filter(JobModel.operation.like('remove_%')).count(), 0)
+
+    def test_removal_job_is_all_or_nothing(self):
+        self.app.config['JOB_CHUNK_SIZE'] = 2
+        try:
+            with self.app.app_context():
+                enrolled = sorted(course_id for course_id, in (db.session.query(student_course.c.course_id)
+                                                               .filter(student_course.c.student_id == 2)))
+                not_enrolled = min(set(range(1, 11)) - set(enrolled))
+                courses = enrolled[:2] + [not_enrolled]
+                response = self.client.delete('api/v1/students/2/courses', json={'courses': courses},
+                                              headers=RESPOND_ASYNC)
+                self.assertEqual(response.status_code, 400)
+
+                # enrollment removed after the job was checked fails the job, not only its later chunks
+                job = JobModel(operation='remove_courses_from_student', arguments=[2, courses], total=3,
+                               status='queued', created_at=datetime.utcnow())
+                db.session.add(job)
+                db.session.commit()
+                self.app.extensions['job_queue'].run(job.id)
+                job = JobModel.query.get(job.id)
+                self.assertEqual((job.status, job.error['status']), ('failed', 400))
+
+                remaining = {course_id for course_id, in (db.session.query(student_course.c.course_id)
+                                                          .filter(student_course.c.student_id == 2))}
+                self.assertEqual(sorted(remaining), enrolled)
+        finally:
+            self.app.config['JOB_CHUNK_SIZE'] = 1000
+
+    def test_invalid_job_is_not_queued(self):
+        with self.app.app_context():
+            response = self.client.post('api/v1/groups/1/students', json={'students': 'all'}, headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post('api/v1/courses/1000/students', json={'students': [1]},
+                                        headers=RESPOND_ASYNC)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(JobModel.query.count(), 0)
+            self.assertEqual(self.client.get('api/v1/jobs/1').status_code, 404)
+
+
+class TestJobWorkers(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.app = create_app('test',
+                              SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(self.directory, "school.db")}',
+                              JOB_WORKERS=2, JOB_CHUNK_SIZE=2)
+        create_tables(self.app)
+        data_generator.test_db(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['job_queue'].shutdown()
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_job_runs_in_worker(self):
+        response = self.client.delete('api/v1/groups/2/students', json={'students': list(range(1, 201))},
+                                      headers=RESPOND_ASYNC)
+        self.assertEqual(response.status_code, 202)
+        self.assertIn(response.json['status'], ('queued', 'running', 'succeeded'))
+
+        self.app.extensions['job_queue'].shutdown()
+        job = self.client.get(response.headers['Location']).json
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['progress'], 200)
+        with self.app.app_context():
+            self.assertEqual(StudentModel.query.filter_by(group_id=2).count(), 0)
+        self.assertEqual(check_student_counts(self.app), [])
+
+    def test_lost_job_resumes_after_its_progress(self):
+        stale = datetime.utcnow() - timedelta(hours=1)
+        with self.app.app_context():
+            job = JobModel(operation='add_courses_to_student', arguments=[1, [1, 2, 3, 4, 5]], total=5,
+                           status='running', progress=2, created_at=stale, started_at=stale, heartbeat_at=stale)
+            db.session.add(job)
+            db.session.execute(student_course.delete().where(student_course.c.student_id == 1))
+            db.session.commit()
+            job_id = job.id
+
+        # the first request of new worker picks up jobs of the previous one
+        self.client.get('api/v1/internal/cache')
+        self.app.extensions['job_queue'].shutdown()
+
+        job = self.client.get(f'api/v1/jobs/{job_id}').json
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['added'], [3, 4, 5])
+        with self.app.app_context():
+            enrolled = {course_id for course_id, in (db.session.query(student_course.c.course_id)
+                                                     .filter(student_course.c.student_id == 1))}
+            self.assertEqual(enrolled, {3, 4, 5})
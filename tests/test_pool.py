@@ -0,0 +1,69 @@
+import os
+import tempfile
+import threading
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+from tests.BaseCase import BaseCase
+from school_api.config import ProductionConfig
+from school_api.pool import MeasuredQueuePool, engine_options, pool_stats
+
+
+class TestPoolConfig(unittest.TestCase):
+    def test_engine_options(self):
+        config = {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+        config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://user:pw@localhost/school'
+        options = engine_options(config)
+        self.assertIs(options['poolclass'], MeasuredQueuePool)
+        self.assertEqual(options['pool_size'], ProductionConfig.DB_POOL_SIZE)
+        self.assertEqual(options['max_overflow'], ProductionConfig.DB_MAX_OVERFLOW)
+        self.assertEqual(options['pool_timeout'], ProductionConfig.DB_POOL_TIMEOUT)
+        self.assertTrue(options['pool_pre_ping'])
+
+        config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.assertEqual(set(engine_options(config)), {'pool_pre_ping', 'pool_recycle'})
+
+
+class TestMeasuredQueuePool(unittest.TestCase):
+    def test_pool_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f'sqlite:///{os.path.join(directory, "pool.db")}', poolclass=MeasuredQueuePool,
+                                   pool_size=1, max_overflow=0, pool_timeout=0.05,
+                                   connect_args={'check_same_thread': False})
+            connection = engine.connect()
+            stats = pool_stats(engine)
+            self.assertEqual((stats['checked_out'], stats['overflow'], stats['checkouts']), (1, 0, 1))
+
+            # single connection is checked out, so the next checkout waits and times out
+            with self.assertRaises(TimeoutError):
+                engine.connect()
+            stats = pool_stats(engine)
+            self.assertEqual(stats['timeouts'], 1)
+            self.assertGreaterEqual(stats['wait_max_ms'], 50)
+
+            # connection returned while another thread waits is handed over
+            threading.Timer(0.01, connection.close).start()
+            engine.connect().close()
+            self.assertEqual(pool_stats(engine)['checkouts'], 3)
+            engine.dispose()
+
+
+class TestPoolEndpoint(BaseCase):
+    def test_pool_stats_endpoint(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/internal/pool')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['pool'], 'StaticPool')
+
+    def test_internal_endpoints_disabled(self):
+        self.app.config['INTERNAL_ENDPOINTS_ENABLED'] = False
+        try:
+            with self.app.app_context():
+                for path in ('api/v1/internal/pool', 'api/v1/internal/cache'):
+                    with self.subTest(path=path):
+                        self.assertEqual(self.client.get(path).status_code, 404)
+                # nor through a batch
+                response = self.client.post('api/v1/batch', json={'requests': [{'path': '/api/v1/internal/pool'}]})
+                self.assertEqual(response.json[0]['status'], 404)
+        finally:
+            self.app.config['INTERNAL_ENDPOINTS_ENABLED'] = True
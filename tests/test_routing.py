@@ -0,0 +1,89 @@
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from school_api.app import create_app
+from school_api.db import create_tables
+from school_api.exporter import write_export
+from school_api import data_generator
+from school_api.models.models import GroupModel
+from school_api.routing import read_only
+from school_api.services.services import add_group
+
+
+class TestReadReplicas(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        primary = os.path.join(self.directory, 'primary.db')
+        replicas = [os.path.join(self.directory, f'replica-{number}.db') for number in (1, 2)]
+        self.app = create_app('test',
+                              SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+                              SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{replica}' for replica in replicas],
+                              RESPONSE_CACHE_ENABLED=False)
+        create_tables(self.app)
+        data_generator.test_db(self.app)
+
+        # replicas are copies of primary, group 1 is renamed in them to tell where data came from
+        for number, replica in enumerate(replicas, 1):
+            shutil.copy(primary, replica)
+            with sqlite3.connect(replica) as connection:
+                connection.execute('UPDATE "group" SET name = ? WHERE id = 1', (f'replica-{number}',))
+        with sqlite3.connect(primary) as connection:
+            self.primary_name, = connection.execute('SELECT name FROM "group" WHERE id = 1').fetchone()
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            for engine in [self.app.extensions['sqlalchemy'].db.engine, *self.app.extensions['db_replicas'].engines]:
+                engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_get_requests_round_robin_replicas(self):
+        names = [self.client.get('api/v1/groups/1').json['name'] for _ in range(4)]
+        self.assertEqual(names, ['replica-1', 'replica-2', 'replica-1', 'replica-2'])
+
+    def test_writes_go_to_primary(self):
+        response = self.client.post('api/v1/groups', json=[{'group_name': 'new group'}])
+        self.assertEqual(response.status_code, 201)
+
+        with self.app.app_context():
+            self.assertEqual(read_only(GroupModel.query.filter_by(name='new group').count)(), 0)
+        for database in ('primary', 'replica-1'):
+            with sqlite3.connect(os.path.join(self.directory, f'{database}.db')) as connection:
+                created = connection.execute('SELECT count(*) FROM "group" WHERE name = ?', ('new group',))
+                self.assertEqual(created.fetchone()[0], 1 if database == 'primary' else 0)
+
+    def test_reads_after_write_stay_on_primary(self):
+        with self.app.app_context():
+            read_group_name = read_only(lambda: GroupModel.query.get(1).name)
+            self.assertTrue(read_group_name().startswith('replica-'))
+
+            add_group('written in this session')
+            self.assertEqual(read_group_name(), self.primary_name)
+            self.assertEqual(read_only(GroupModel.query.filter_by(name='written in this session').count)(), 1)
+
+    def test_not_read_only_work_uses_primary(self):
+        with self.app.app_context():
+            self.assertEqual(GroupModel.query.get(1).name, self.primary_name)
+
+    def test_batch_reads_after_write_stay_on_primary(self):
+        response = self.client.post('api/v1/batch', json={'requests': [
+            {'method': 'GET', 'path': '/api/v1/groups/1'},
+            {'method': 'POST', 'path': '/api/v1/groups', 'body': {'group_name': 'written in batch'}},
+            {'method': 'GET', 'path': '/api/v1/groups/1'},
+        ]})
+        names = [result['body']['name'] for result in response.json]
+        self.assertTrue(names[0].startswith('replica-'))
+        self.assertEqual(names[2], self.primary_name)
+
+    def test_export_reads_from_replica(self):
+        with self.app.app_context():
+            file = io.StringIO()
+            write_export(file)
+            groups = {json.loads(line)['group'] for line in file.getvalue().splitlines()}
+            self.assertIn('replica-1', groups)
+            self.assertNotIn(self.primary_name, groups)
@@ -0,0 +1,141 @@
+from unittest import mock
+from tests.BaseCase import BaseCase
+from school_api.db import create_tables, drop_tables
+from school_api.models.models import StudentModel, GroupModel, CourseModel, SEARCHED_COLUMNS, db
+
+MODELS = {'students': StudentModel, 'groups': GroupModel, 'courses': CourseModel}
+
+
+class TestSearch(BaseCase):
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            db.session.add_all([StudentModel(first_name=first_name, last_name=last_name) for first_name, last_name in (
+                ('Ann', 'Lee'), ('Anna', 'ANN'), ('Annabel', 'Ray'), ('Joanne', 'Hann'), ('Bob', 'Mann'), ('Ann', None),
+            )])
+            db.session.commit()
+
+    def expected(self, path, q):
+        """
+        Ids in order of (rank, id), rank of every word 0 when a name equals it, 1 when one starts with it, 2 otherwise.
+        """
+        model = MODELS[path]
+        columns = SEARCHED_COLUMNS[model.__table__]
+        ranked = []
+        for item in model.query:
+            names = [(getattr(item, column) or '').lower() for column in columns]
+            ranks = []
+            for word in q.lower().split():
+                if word in names:
+                    ranks.append(0)
+                elif any(name.startswith(word) for name in names):
+                    ranks.append(1)
+                elif len(word) >= 3 and any(word in name for name in names):
+                    ranks.append(2)
+                else:
+                    break
+            else:
+                ranked.append((sum(ranks), item.id))
+        return [item_id for _, item_id in sorted(ranked)]
+
+    def search(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.json)
+            url = response.headers.get('Link', '').split(';')[0].strip('<>')
+        return ids
+
+    def test_search_ranked(self):
+        with self.app.app_context():
+            for path, q in (('students', 'ann'), ('students', 'ANN'), ('students', 'an'), ('students', 'nn'),
+                            ('students', 'a'), ('students', 'ann lee'), ('students', 'nne an'), ('students', 'zzz'),
+                            ('groups', 'a'), ('groups', '-1'), ('courses', 'math'), ('courses', 'is')):
+                with self.subTest(path=path, q=q):
+                    expected = self.expected(path, q)
+                    self.assertEqual(self.search(f'api/v1/{path}?q={q}'), expected)
+                    self.assertEqual(self.search(f'api/v1/{path}?q={q}&limit=2'), expected)
+
+            # exact names first, then starting with the word, then containing it
+            added = {student.id: student.first_name for student in StudentModel.query.filter(StudentModel.id > 200)}
+            self.assertEqual([added[student_id] for student_id in self.search('api/v1/students?q=ann')
+                              if student_id in added], ['Ann', 'Anna', 'Ann', 'Annabel', 'Joanne', 'Bob'])
+
+    def test_search_past_merged_names(self):
+        with self.app.app_context(), mock.patch('school_api.services.search.MERGED_NAMES', 1):
+            for q in ('ann', 'a'):
+                with self.subTest(q=q):
+                    self.assertEqual(self.search(f'api/v1/students?q={q}&limit=2'), self.expected('students', q))
+
+    def test_search_with_other_criteria(self):
+        with self.app.app_context():
+            course = CourseModel.query.get(1)
+            enrolled = {student.id for student in course.students}
+            self.assertEqual(self.search(f'api/v1/students?q=a&course_name={course.name}&limit=2'),
+                             [student_id for student_id in self.expected('students', 'a') if student_id in enrolled])
+
+            small = {group.id for group in GroupModel.query.filter(GroupModel.student_count <= 20)}
+            self.assertEqual(self.search('api/v1/groups?q=a&max_students=20&limit=2'),
+                             [group_id for group_id in self.expected('groups', 'a') if group_id in small])
+
+    def test_search_follows_changes(self):
+        with self.app.app_context():
+            self.assertEqual(self.search('api/v1/students?q=zelda'), [])
+            response = self.client.post('api/v1/students', json={'first_name': 'Zelda', 'last_name': 'Fox'})
+            student_id = response.json['id']
+            self.assertEqual(self.search('api/v1/students?q=zelda'), [student_id])
+            self.assertEqual(self.search('api/v1/students?q=eld'), [student_id])
+
+            self.client.put(f'api/v1/students/{student_id}', json={'first_name': 'Zora'})
+            self.assertEqual(self.search('api/v1/students?q=eld'), [])
+            self.assertEqual(self.search('api/v1/students?q=zor'), [student_id])
+
+            self.client.delete(f'api/v1/students/{student_id}')
+            self.assertEqual(self.search('api/v1/students?q=zor'), [])
+
+    def test_search_non_ascii_names(self):
+        with self.app.app_context():
+            db.session.add_all([GroupModel(name='ЯЯ-1'), StudentModel(first_name='Яна', last_name='Ёлкина'),
+                                StudentModel(first_name='Ärger', last_name='ÖL')])
+            db.session.commit()
+            for path, q in (('groups', 'ЯЯ'), ('groups', 'яя'), ('groups', 'яя-1'), ('groups', 'я'),
+                            ('students', 'ЯНА'), ('students', 'яна ёлк'), ('students', 'лкин'), ('students', 'äRG'),
+                            ('students', 'öl')):
+                with self.subTest(path=path, q=q):
+                    expected = self.expected(path, q)
+                    self.assertTrue(expected)
+                    self.assertEqual(self.search(f'api/v1/{path}?q={q}'), expected)
+                    self.assertEqual(self.search(f'api/v1/{path}?q={q}&limit=1'), expected)
+
+    def test_search_without_trigrams(self):
+        with self.app.app_context(), mock.patch('school_api.models.models.SQLITE_TRIGRAMS', False), \
+                mock.patch('school_api.services.search.SQLITE_TRIGRAMS', False):
+            drop_tables(self.app)
+            create_tables(self.app)
+            self.assertNotIn('student_search', db.inspect(db.engine).get_table_names())
+            db.session.add_all([StudentModel(first_name=first_name, last_name=last_name) for first_name, last_name in (
+                ('Ann', 'Lee'), ('Joanne', 'Hann'), ('Annabel', 'Ray'), ('Bob', 'Mann'), ('Anna', 'Ann'),
+            )])
+            db.session.commit()
+
+            # words of any length match prefixes only
+            for q, expected in (('ann', [1, 5, 3]), ('ANN lee', [1]), ('nn', []), ('hann', [2]), ('ann ray', [3])):
+                with self.subTest(q=q):
+                    self.assertEqual(self.search(f'api/v1/students?q={q}'), expected)
+                    self.assertEqual(self.search(f'api/v1/students?q={q}&limit=1'), expected)
+
+    def test_search_query_budget(self):
+        with self.app.app_context(), self.query_budget(8):
+            # data versions, names of both columns, ids of three ranks, students and their courses
+            self.assertEqual(self.client.get('api/v1/students?q=ann&limit=100').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/students?q=ann lee').status_code, 200)
+
+    def test_search_invalid(self):
+        with self.app.app_context():
+            self.assertEqual(self.client.get(f'api/v1/students?q={"a" * 101}').status_code, 400)
+            self.assertEqual(self.client.get('api/v1/courses?q=math&after=not-a-cursor').status_code, 400)
+            # cursor of page without search has no rank
+            response = self.client.get('api/v1/groups?limit=1')
+            next_url = response.headers['Link'].split(';')[0].strip('<>')
+            self.assertEqual(self.client.get(next_url + '&q=a').status_code, 400)
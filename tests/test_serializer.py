@@ -0,0 +1,37 @@
+import json
+
+from tests.BaseCase import BaseCase
+from school_api.models.models import StudentModel, GroupModel, CourseModel, db
+from school_api.schema.school_schema import GroupSchema, StudentSchema, CourseSchema
+from school_api.schema.serializer import serializer
+
+
+class TestSerializer(BaseCase):
+    def assertSameDump(self, schema_cls, objects, only=None):
+        expected = json.dumps(schema_cls(only=only).dump(objects, many=True))
+        self.assertEqual(json.dumps(serializer(schema_cls, only).dump(objects, many=True)), expected)
+        for obj in objects:
+            self.assertEqual(json.dumps(serializer(schema_cls, only).dump(obj)), json.dumps(schema_cls(only=only).dump(obj)))
+
+    def test_same_output_as_schema(self):
+        with self.app.app_context():
+            self.assertSameDump(StudentSchema, StudentModel.query.all())
+            self.assertSameDump(GroupSchema, GroupModel.query.all())
+            self.assertSameDump(CourseSchema, CourseModel.query.all())
+
+    def test_same_output_with_only(self):
+        with self.app.app_context():
+            students = StudentModel.query.all()
+            self.assertSameDump(StudentSchema, students, ('first_name', 'id'))
+            self.assertSameDump(StudentSchema, students, ('courses', 'group'))
+            self.assertSameDump(CourseSchema, CourseModel.query.all(), ('description',))
+
+    def test_same_output_for_empty_and_unusual_values(self):
+        with self.app.app_context():
+            student = StudentModel(first_name=None, last_name=b'bytes')
+            db.session.add(student)
+            db.session.flush()
+            student.id = 2 ** 40
+            student.first_name = 42
+            self.assertSameDump(StudentSchema, [student, StudentModel(id=True)])
+            db.session.rollback()
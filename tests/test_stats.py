@@ -0,0 +1,46 @@
+from collections import Counter
+from tests.BaseCase import BaseCase
+from school_api.models.models import CourseModel, GroupModel, StudentModel, student_course, db
+
+
+class TestStats(BaseCase):
+    def test_stats_match_rosters(self):
+        with self.app.app_context():
+            with self.query_budget(5):
+                response = self.client.get('api/v1/stats')
+            self.assertEqual(response.status_code, 200)
+            stats = response.json
+
+            students = StudentModel.query.all()
+            self.assertEqual(stats['students'], len(students))
+            self.assertEqual(stats['groups'], GroupModel.query.count())
+            self.assertEqual(stats['courses'], CourseModel.query.count())
+            self.assertEqual(stats['students_without_group'],
+                             sum(1 for student in students if student.group_id is None))
+            self.assertEqual(stats['enrollments'], sum(len(student.courses) for student in students))
+
+            self.assertEqual({course['id']: course['students'] for course in stats['enrollment_per_course']},
+                             {course.id: len(course.students) for course in CourseModel.query})
+            self.assertEqual({size['students']: size['groups'] for size in stats['group_size_distribution']},
+                             dict(Counter(len(group.students) for group in GroupModel.query)))
+            self.assertEqual({number['courses']: number['students'] for number in stats['courses_per_student']},
+                             dict(Counter(len(student.courses) for student in students)))
+
+    def test_stats_cached_until_write(self):
+        with self.app.app_context():
+            stats = self.client.get('api/v1/stats').json
+            with self.query_budget(0):
+                response = self.client.get('api/v1/stats')
+            self.assertEqual(response.headers['X-Cache'], 'HIT')
+
+            self.client.post('api/v1/students', json=[{'first_name': 'new', 'last_name': 'student'}])
+            response = self.client.get('api/v1/stats')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(response.json['students'], stats['students'] + 1)
+            self.assertEqual(response.json['students_without_group'], stats['students_without_group'] + 1)
+
+            enrolled = db.session.query(student_course.c.student_id).filter(student_course.c.course_id == 1).all()
+            self.client.delete('api/v1/courses/1/students', json={'students': [enrolled[0][0]]})
+            response = self.client.get('api/v1/stats')
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(response.json['enrollments'], stats['enrollments'] - 1)
@@ -0,0 +1,60 @@
+import json
+
+from tests.BaseCase import BaseCase
+from school_api.models.models import CourseModel
+
+
+class TestStreaming(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['STREAM_CHUNK_SIZE'], self.chunk_size = 7, self.app.config['STREAM_CHUNK_SIZE']
+
+    def tearDown(self):
+        self.app.config['STREAM_CHUNK_SIZE'] = self.chunk_size
+        super().tearDown()
+
+    def test_stream_json_array(self):
+        with self.app.app_context():
+            students = self.client.get('api/v1/students').json
+
+            response = self.client.get('api/v1/students?stream=true')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.mimetype, 'application/json')
+            self.assertEqual(json.loads(response.data), students)
+
+    def test_stream_ndjson(self):
+        with self.app.app_context():
+            course = CourseModel.query.get(1)
+            students = self.client.get(f'api/v1/students?course_name={course.name}').json
+
+            response = self.client.get(f'api/v1/students?course_name={course.name}',
+                                       headers={'Accept': 'application/x-ndjson'})
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            lines = response.data.decode().splitlines()
+            self.assertEqual([json.loads(line) for line in lines], students)
+
+    def test_stream_rosters_and_empty_collection(self):
+        with self.app.app_context():
+            for url in ('api/v1/groups', 'api/v1/groups?max_students=20', 'api/v1/courses',
+                        'api/v1/groups/1/students', 'api/v1/courses/1/students', 'api/v1/students/1/courses'):
+                expected = self.client.get(url).json
+                separator = '&' if '?' in url else '?'
+                response = self.client.get(f'{url}{separator}stream=true')
+                self.assertEqual(json.loads(response.data), expected, url)
+
+            response = self.client.get('api/v1/groups/1000000/students?stream=true')
+            self.assertEqual(json.loads(response.data), [])
+
+    def test_stream_is_not_served_from_cache(self):
+        with self.app.app_context():
+            self.client.get('api/v1/courses')
+            response = self.client.get('api/v1/courses', headers={'Accept': 'application/x-ndjson'})
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            self.assertNotIn('X-Cache', response.headers)
+
+            etag = response.headers['ETag']
+            self.assertNotEqual(etag, self.client.get('api/v1/courses').headers['ETag'])
+            response = self.client.get('api/v1/courses', headers={'Accept': 'application/x-ndjson',
+                                                                  'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
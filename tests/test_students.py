@@ -1,5 +1,6 @@
 from tests.BaseCase import BaseCase
 from school_api.models.models import StudentModel, CourseModel, db
+from school_api.instrumentation import QueryBudgetExceeded
 import json
 
 
@@ -104,8 +105,7 @@ class TestStudents(BaseCase):
     def test_remove_courses_from_student(self):
         with self.app.app_context():
             student_id = 2
-            # course ids based on test db
-            courses_for_remove = {'courses': [7, 8, 9]}
+            courses_for_remove = {'courses': [course.id for course in StudentModel.query.get(student_id).courses]}
             response = self.client.delete(f'api/v1/students/{student_id}/courses',
                                           data=json.dumps(courses_for_remove),
                                           content_type='application/json')
@@ -129,3 +129,177 @@ class TestStudents(BaseCase):
             response = self.client.get(f'api/v1/courses/{course.id}/students')
             students_by_id = response.json
             self.assertEqual(students_by_name, students_by_id)
+
+    def test_students_pagination(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/students?limit=30')
+            self.assertEqual(response.status_code, 200)
+            students = response.json
+            self.assertEqual(len(students), 30)
+
+            while 'Link' in response.headers:
+                next_url = response.headers['Link'].split(';')[0].strip('<>')
+                response = self.client.get(next_url)
+                self.assertEqual(response.status_code, 200)
+                students.extend(response.json)
+
+            ids = [student['id'] for student in students]
+            self.assertEqual(ids, sorted(set(ids)))
+            # len 200 based on test data
+            self.assertEqual(len(ids), 200)
+
+    def test_students_by_course_name_pagination(self):
+        with self.app.app_context():
+            course = CourseModel.query.get(1)
+            response = self.client.get(f'api/v1/students?course_name={course.name}')
+            students_all = response.json
+
+            students = []
+            url = f'api/v1/students?course_name={course.name}&limit=5'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(response.json), 5)
+                students.extend(response.json)
+                url = response.headers.get('Link', '').split(';')[0].strip('<>')
+
+            self.assertEqual(students, students_all)
+
+    def test_students_invalid_cursor(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/students?after=not-a-cursor')
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get('api/v1/students?limit=0')
+            self.assertEqual(response.status_code, 400)
+
+    def test_students_query_budget(self):
+        with self.app.app_context(), self.query_budget(3):
+            # data versions for ETag, students with joined group and one select of their courses
+            self.assertEqual(self.client.get('api/v1/students').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/students?course_name=Math').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/students/1').status_code, 200)
+            self.assertEqual(self.client.get('api/v1/students/1/courses').status_code, 200)
+
+    def test_query_budget_exceeded(self):
+        with self.app.app_context(), self.query_budget(1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('api/v1/students')
+
+    def test_add_courses_to_student_report(self):
+        with self.app.app_context():
+            student_id = 2
+            assigned = [course.id for course in StudentModel.query.get(student_id).courses]
+            response = self.client.post(f'api/v1/students/{student_id}/courses',
+                                        data=json.dumps({'courses': list(range(1, 11)) + [42]}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json['added'], sorted(set(range(1, 11)) - set(assigned)))
+            self.assertEqual(response.json['already_enrolled'], sorted(assigned))
+            self.assertEqual(response.json['unknown'], [42])
+
+    def test_create_students_bulk(self):
+        with self.app.app_context():
+            students = [{'first_name': f'first{i}', 'last_name': f'last{i}', 'group_id': 1 if i % 2 else None}
+                        for i in range(50)]
+            response = self.client.post('api/v1/students',
+                                        data=json.dumps(students),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+
+            created = response.json
+            self.assertEqual([student['first_name'] for student in created],
+                             [student['first_name'] for student in students])
+            self.assertEqual([student['group'] for student in created],
+                             [student['group_id'] for student in students])
+            for student in created:
+                student_in_db = StudentModel.query.get(student['id'])
+                self.assertEqual(student['last_name'], student_in_db.last_name)
+
+    def test_create_students_bulk_validation(self):
+        with self.app.app_context():
+            students_before = StudentModel.query.count()
+            students = [{'first_name': 'foo', 'last_name': 'bar'},
+                        {'first_name': '', 'last_name': 'bar'},
+                        {'first_name': 'foo', 'last_name': 'bar', 'group_id': 1000000}]
+            response = self.client.post('api/v1/students',
+                                        data=json.dumps(students),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.json['errors']), {'1'})
+            self.assertIn('first_name', response.json['errors']['1'])
+            self.assertEqual(StudentModel.query.count(), students_before)
+
+            response = self.client.post('api/v1/students',
+                                        data=json.dumps(students[2:]),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('group_id', response.json['errors']['0'])
+
+            self.app.config['BULK_CREATE_MAX_ITEMS'], max_items = 2, self.app.config['BULK_CREATE_MAX_ITEMS']
+            try:
+                response = self.client.post('api/v1/students',
+                                            data=json.dumps([students[0]] * 3),
+                                            content_type='application/json')
+            finally:
+                self.app.config['BULK_CREATE_MAX_ITEMS'] = max_items
+            self.assertEqual(response.status_code, 413)
+
+    def test_students_sparse_fields(self):
+        with self.app.app_context(), self.query_budget(2):
+            # data versions for ETag and students only, courses and group are not loaded
+            response = self.client.get('api/v1/students?fields=id,first_name,last_name&limit=50')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json), 50)
+            for student in response.json:
+                self.assertEqual(set(student), {'id', 'first_name', 'last_name'})
+            self.assertIn('Link', response.headers)
+
+        with self.app.app_context(), self.query_budget(3):
+            response = self.client.get('api/v1/students/1?fields=courses')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(response.json), {'courses'})
+
+    def test_students_unknown_fields(self):
+        with self.app.app_context():
+            response = self.client.get('api/v1/students?fields=id,password')
+            self.assertEqual(response.status_code, 400)
+
+    def expected_ids(self, group_id=None, unassigned=False, courses=(), match=any):
+        return [student.id for student in StudentModel.query.order_by(StudentModel.id)
+                if (group_id is None or student.group_id == group_id)
+                and (not unassigned or student.group_id is None)
+                and (not courses or match(course in {course.id for course in student.courses} for course in courses))]
+
+    def test_students_filters(self):
+        with self.app.app_context():
+            math = CourseModel.query.filter_by(name='Math').one().id
+            for url, expected in (
+                    ('group_id=2', self.expected_ids(group_id=2)),
+                    ('unassigned=true', self.expected_ids(unassigned=True)),
+                    ('course_id=1&course_id=3', self.expected_ids(courses=[1, 3])),
+                    ('course_id=1&course_name=Math', self.expected_ids(courses=[1, math])),
+                    ('course_id=1&course_name=Math&course_match=all', self.expected_ids(courses=[1, math], match=all)),
+                    ('course_id=2&course_id=2&course_match=all', self.expected_ids(courses=[2])),
+                    ('group_id=3&course_id=1&course_id=4', self.expected_ids(group_id=3, courses=[1, 4])),
+                    ('unassigned=true&course_id=5', self.expected_ids(unassigned=True, courses=[5])),
+                    ('course_name=Nope', [])):
+                with self.subTest(url=url):
+                    response = self.client.get(f'api/v1/students?{url}&limit=500')
+                    self.assertEqual([student['id'] for student in response.json], expected)
+
+    def test_students_filters_in_one_statement(self):
+        with self.app.app_context(), self.query_budget(2):
+            # data versions for ETag and one select of students with every filter in it
+            for url in ('group_id=2&course_id=1&course_id=2&course_name=Math&course_match=all',
+                        'unassigned=true&course_name=Math&course_name=English',
+                        'group_id=3&course_id=1&q=a'):
+                with self.subTest(url=url):
+                    response = self.client.get(f'api/v1/students?{url}&fields=id,group&limit=5')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_students_invalid_filters(self):
+        with self.app.app_context():
+            for url in ('group_id=1&unassigned=true', 'course_id=x', 'course_match=some', 'unassigned=maybe'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(f'api/v1/students?{url}').status_code, 400)